@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
 from rest_framework import generics, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from .serializers import ChangePasswordSerializer
 
 User = get_user_model()
@@ -12,11 +15,12 @@ class CustomDiscardAuthToken(APIView):
     """
     API view to discard (delete) the user's authentication token.
     """
+    authentication_classes = [JWTAuthentication, TokenAuthentication] # Needs the user row
     permission_classes = [IsAuthenticated] # Ensure user is authenticated
 
     def post(self, request, *args, **kwargs):
-        # Delete user's auth token
-        request.user.auth_token.delete()
+        # Delete user's auth token; its cached copies are evicted on delete
+        Token.objects.filter(user=request.user).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -27,11 +31,13 @@ class ChangePasswordApiView(generics.GenericAPIView):
 
     serializer_class = ChangePasswordSerializer
     model = User
+    authentication_classes = [JWTAuthentication, TokenAuthentication] # Needs the user row
     permission_classes = [IsAuthenticated] # Ensure user is authenticated
 
     def get_object(self, queryset=None):
-        obj = self.request.user
-        return obj # Get the current user object
+        # Reload the user: the authenticated one may come from a cache, and
+        # its stale password hash must not be checked or written back
+        return User.objects.get(pk=self.request.user.pk)
 
     def put(self, request, *args, **kwargs):
         self.object = self.get_object()
@@ -45,7 +51,7 @@ class ChangePasswordApiView(generics.GenericAPIView):
                 )
             # Set and save the new password
             self.object.set_password(serializer.data.get("new_password"))
-            self.object.save()
+            self.object.save(update_fields=["password"])  # Evicts the cached tokens
             return Response(
                 {"detail": "password changed successfully"},
                 status=status.HTTP_200_OK,
@@ -0,0 +1,199 @@
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_KEY_PREFIX = 'account:token'
+TOKEN_VERSION_KEY = f'{TOKEN_KEY_PREFIX}:version'
+
+
+class CachedTokenUser:
+    """
+    The user of a token served from the cache. Only the id is cached: the
+    library views read ``request.user.id``, and views needing the user row
+    authenticate with ``TokenAuthentication``. Inactive users are never
+    cached, so the user is active.
+    """
+    is_active = True
+    is_anonymous = False
+    is_authenticated = True
+    is_staff = False
+    is_superuser = False
+
+    def __init__(self, user_id):
+        self.id = self.pk = user_id
+
+    def __str__(self):
+        return f"CachedTokenUser {self.id}"
+
+
+class TokenLRU:
+    """
+    Bounded in-process map of token key to ``(expires, user id)``, least
+    recently used first. Entries are valid under the shared token version
+    seen last, which is re-read at most every
+    ``LIBRARY_AUTH_TOKEN_VERSION_INTERVAL`` seconds: evictions in other
+    processes take that long to reach this one.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.version = None
+        self.version_checked = float('-inf')
+
+    def needs_version(self):
+        return time.monotonic() - self.version_checked >= settings.LIBRARY_AUTH_TOKEN_VERSION_INTERVAL
+
+    def set_version(self, version):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            self.version_checked = time.monotonic()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, user_id):
+        size = settings.LIBRARY_AUTH_TOKEN_LRU_SIZE
+        if not size:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + settings.LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT, user_id)
+            self.entries.move_to_end(key)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.version_checked = float('-inf')
+
+
+token_lru = TokenLRU()
+
+
+def token_cache_key(key):
+    # Token keys are credentials, so only their digest is stored
+    return f"{TOKEN_KEY_PREFIX}:{sha256(key.encode()).hexdigest()}"
+
+
+def get_token_version():
+    """
+    Return the version under which in-process entries are valid. Any
+    eviction gives it a new value, so every process drops its entries.
+    """
+    version = cache.get(TOKEN_VERSION_KEY)
+    if version is None:
+        cache.add(TOKEN_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(TOKEN_VERSION_KEY)
+    return version
+
+
+async def aget_token_version():
+    version = await cache.aget(TOKEN_VERSION_KEY)
+    if version is None:
+        await cache.aadd(TOKEN_VERSION_KEY, uuid4().hex, None)
+        version = await cache.aget(TOKEN_VERSION_KEY)
+    return version
+
+
+def get_cached_user_id(key):
+    """
+    Return the id of the active user owning token ``key`` from the
+    in-process LRU or the shared cache, or None on a miss.
+    """
+    if not settings.LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT:
+        return None
+    if token_lru.needs_version():
+        token_lru.set_version(get_token_version())
+    user_id = token_lru.get(key)
+    if user_id is None:
+        user_id = cache.get(token_cache_key(key))
+        if user_id is not None:
+            token_lru.set(key, user_id)
+    return user_id
+
+
+async def aget_cached_user_id(key):
+    """
+    Async ``get_cached_user_id``.
+    """
+    if not settings.LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT:
+        return None
+    if token_lru.needs_version():
+        token_lru.set_version(await aget_token_version())
+    user_id = token_lru.get(key)
+    if user_id is None:
+        user_id = await cache.aget(token_cache_key(key))
+        if user_id is not None:
+            token_lru.set(key, user_id)
+    return user_id
+
+
+def cache_user_id(key, user_id, version):
+    """
+    Cache the owner of token ``key``, read from the database under token
+    ``version``, for ``LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT`` seconds. When an
+    eviction ran since the read, the token may have been revoked, so the
+    entry is dropped again instead of outliving it.
+    """
+    cache_key = token_cache_key(key)
+    cache.add(cache_key, user_id, settings.LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT)
+    if get_token_version() != version:
+        cache.delete(cache_key)
+        return
+    token_lru.set(key, user_id)
+
+
+def evict_tokens(keys):
+    """
+    Drop the tokens ``keys`` from the shared cache and, through a new
+    version, from every process, so the next request sees the database.
+    Call it after deleting tokens, so no request can cache them again.
+    """
+    cache.delete_many([token_cache_key(key) for key in keys])
+    cache.set(TOKEN_VERSION_KEY, uuid4().hex, None)
+    token_lru.clear()
+
+
+def evict_user_tokens(user):
+    """
+    Drop the cached tokens of ``user``, e.g. after a password change.
+    """
+    evict_tokens(Token.objects.filter(user=user).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``TokenAuthentication`` that caches the user id of each token (see
+    ``get_cached_user_id``), so repeated requests with a token skip the
+    ``authtoken_token`` query. Cached requests get a ``CachedTokenUser``.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT:
+            return super().authenticate_credentials(key)
+        user_id = get_cached_user_id(key)
+        if user_id is not None:
+            return CachedTokenUser(user_id), Token(key=key, user_id=user_id)
+        # Read before the query, so an eviction racing it is noticed
+        version = get_token_version()
+        user, token = super().authenticate_credentials(key)
+        cache_user_id(key, user.pk, version)
+        return user, token
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from account.authentication import evict_tokens, evict_user_tokens
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    """
+    Evict a deleted token, wherever it is deleted from (logout, admin,
+    ORM), once the deletion commits, so no request can cache it again.
+    """
+    key = instance.key  # The key is the primary key, cleared after the delete
+    transaction.on_commit(lambda: evict_tokens([key]))
+
+
+@receiver(post_init, sender=User)
+def remember_credentials(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not loaded
+    instance._cached_credentials = (instance.__dict__.get('password'), instance.__dict__.get('is_active'))
+
+
+@receiver(post_save, sender=User)
+def evict_changed_user_tokens(sender, instance, created, **kwargs):
+    """
+    Evict the user's cached tokens once a change of their password or of
+    ``is_active`` commits, so a deactivated user or a changed password
+    stops authenticating at once.
+    """
+    credentials = (instance.password, instance.is_active)
+    if not created and credentials != instance._cached_credentials:
+        transaction.on_commit(lambda: evict_user_tokens(instance))
+    instance._cached_credentials = credentials
@@ -1,3 +1,138 @@
-from django.test import TestCase
+from uuid import uuid4
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from account.authentication import (
+    TOKEN_VERSION_KEY, cache_user_id, get_token_version, token_cache_key, token_lru,
+)
+
+User = get_user_model()
+
+
+class ChangePasswordTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', 'old-password')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def change_password(self, old_password, new_password):
+        return self.client.put(reverse('account:change-password'), {
+            'old_password': old_password, 'new_password': new_password, 'new_password1': new_password,
+        }, format='json')
+
+    def test_keeps_changes_made_after_the_token_was_cached(self):
+        # Caches the token and its user
+        self.assertEqual(self.client.get(reverse('library:book_list')).status_code, status.HTTP_200_OK)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True, is_superuser=True)
+
+        response = self.change_password('old-password', 'new-password-123')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_staff)
+        self.assertTrue(self.user.is_superuser)
+        self.assertTrue(self.user.check_password('new-password-123'))
+
+    def test_checks_the_current_password_not_a_cached_one(self):
+        self.client.get(reverse('library:book_list'))
+        self.assertEqual(self.change_password('old-password', 'new-password-123').status_code, status.HTTP_200_OK)
+
+        response = self.change_password('old-password', 'another-password-456')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'old_password': ['Wrong password.']})
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        token_lru.clear()
+        self.user = User.objects.create_user('reader', 'password')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def get_book_list(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('library:book_list'))
+        token_queries = [query for query in queries.captured_queries if 'authtoken_token' in query['sql']]
+        return response, len(token_queries)
+
+    def test_repeated_requests_skip_the_token_query(self):
+        response, token_queries = self.get_book_list()
+        self.assertEqual((response.status_code, token_queries), (status.HTTP_200_OK, 1))
+        response, token_queries = self.get_book_list()
+        self.assertEqual((response.status_code, token_queries), (status.HTTP_200_OK, 0))
+
+    def test_only_the_user_id_is_cached(self):
+        self.get_book_list()
+        self.assertEqual(cache.get(token_cache_key(self.token.key)), self.user.pk)
+
+    def test_inactive_users_are_rejected_and_not_cached(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response, _ = self.get_book_list()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
+
+    def test_logout_revokes_the_cached_token(self):
+        self.get_book_list()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('account:token_logout'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response, _ = self.get_book_list()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_tokens_deleted_outside_the_views_are_revoked(self):
+        self.get_book_list()
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.get(pk=self.token.pk).delete()
+        response, _ = self.get_book_list()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivating_the_user_revokes_the_cached_token(self):
+        self.get_book_list()
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        response, _ = self.get_book_list()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_user_changes_keep_the_cached_token(self):
+        self.get_book_list()
+        user = User.objects.get(pk=self.user.pk)
+        user.is_staff = True
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user.save()
+        self.assertEqual(callbacks, [])
+        response, token_queries = self.get_book_list()
+        self.assertEqual((response.status_code, token_queries), (status.HTTP_200_OK, 0))
+
+    def test_eviction_racing_the_database_read_is_not_undone(self):
+        version = get_token_version()
+        # A logout deletes the token and evicts it after it was read
+        cache.set(TOKEN_VERSION_KEY, uuid4().hex, None)
+        cache_user_id(self.token.key, self.user.pk, version)
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
+        self.assertIsNone(token_lru.get(self.token.key))
+
+    def test_evictions_from_other_processes_reach_the_lru(self):
+        self.get_book_list()
+        # Another process deletes the token and evicts it
+        Token.objects.filter(pk=self.token.pk).delete()
+        cache.delete(token_cache_key(self.token.key))
+        cache.set(TOKEN_VERSION_KEY, uuid4().hex, None)
+
+        with override_settings(LIBRARY_AUTH_TOKEN_VERSION_INTERVAL=3600):
+            self.assertEqual(self.get_book_list()[0].status_code, status.HTTP_200_OK)
+        with override_settings(LIBRARY_AUTH_TOKEN_VERSION_INTERVAL=0):
+            self.assertEqual(self.get_book_list()[0].status_code, status.HTTP_401_UNAUTHORIZED)
@@ -59,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'library.middleware.QueryInstrumentationMiddleware',
 ]
 if DEBUG:
     MIDDLEWARE += [
@@ -89,18 +90,69 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# PGDB_POOL takes connections from a psycopg_pool pool (library.backends.postgresql).
+# Under exhaustion a request waits PGDB_POOL_TIMEOUT seconds, then fails with an
+# OperationalError; with PGDB_POOL_MAX_WAITING clients queued it fails at once.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'library.backends.postgresql',
         'NAME': config('PGDB_NAME', default='postgres'),
         'USER': config('PGDB_USER', default='postgres'),
         'PASSWORD': config('PGDB_PASSWORD', default='postgres'),
         'HOST': config('PGDB_HOST', default='db'),
         'PORT': config('PGDB_PORT', cast=int, default=5432),
+        # Checks pooled connections before handing them out
+        'CONN_HEALTH_CHECKS': config('PGDB_HEALTH_CHECKS', cast=bool, default=True),
+        'OPTIONS': {
+            'pool': config('PGDB_POOL', cast=bool, default=True) and {
+                'min_size': config('PGDB_POOL_MIN_SIZE', cast=int, default=2),
+                'max_size': config('PGDB_POOL_MAX_SIZE', cast=int, default=10),
+                'timeout': config('PGDB_POOL_TIMEOUT', cast=float, default=5.0),
+                'max_lifetime': config('PGDB_POOL_MAX_LIFETIME', cast=float, default=3600.0),
+                'max_idle': config('PGDB_POOL_MAX_IDLE', cast=float, default=600.0),
+                'max_waiting': config('PGDB_POOL_MAX_WAITING', cast=int, default=0),
+            },
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory by default so nothing extra is needed in development and tests;
+# point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached in production.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
     }
 }
 
 
+# Logging
+# https://docs.djangoproject.com/en/4.2/topics/logging/
+# Per-request SQL cost from library.middleware goes to the console.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'library.sql': {
+            'handlers': ['console'],
+            'level': config('LIBRARY_SQL_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -153,8 +205,8 @@ INTERNAL_IPS = [
 # rest framework configurations
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.TokenAuthentication'
+        'library.api.v1.authentication.LibraryJWTAuthentication',
+        'account.authentication.CachedTokenAuthentication'
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -166,4 +218,79 @@ SPECTACULAR_SETTINGS = {
     'DESCRIPTION': 'Your project description',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
-}
\ No newline at end of file
+}
+
+
+# library configurations
+# Book list counts above this planner estimate are reported as estimates
+# instead of running an exact COUNT(*).
+LIBRARY_COUNT_EXACT_THRESHOLD = config(
+    'LIBRARY_COUNT_EXACT_THRESHOLD', cast=int, default=100000)
+# Seconds an exact book count stays cached.
+LIBRARY_COUNT_CACHE_TIMEOUT = config(
+    'LIBRARY_COUNT_CACHE_TIMEOUT', cast=int, default=300)
+# Neighbours kept per book in the co-rating graph.
+LIBRARY_BOOK_NEIGHBORS_TOP_K = config(
+    'LIBRARY_BOOK_NEIGHBORS_TOP_K', cast=int, default=50)
+# Precomputed related-user suggestions built by build_related_suggestions.
+LIBRARY_CF_PATH = config(
+    'LIBRARY_CF_PATH', default=str(BASE_DIR / 'var' / 'related_users.npz'))
+LIBRARY_CF_TOP_N = config('LIBRARY_CF_TOP_N', cast=int, default=100)
+# Cache alias and seconds suggestion results stay cached. Review writes bump
+# per-user versions, so the timeout only bounds memory, not staleness.
+LIBRARY_SUGGESTION_CACHE_ALIAS = config('LIBRARY_SUGGESTION_CACHE_ALIAS', default='default')
+LIBRARY_SUGGESTION_CACHE_TIMEOUT = config(
+    'LIBRARY_SUGGESTION_CACHE_TIMEOUT', cast=int, default=600)
+# Refuse to start with a local memory suggestion cache, whose versions only
+# reach the process that bumped them. Off in development so the local
+# memory default works with a single process.
+LIBRARY_SUGGESTION_CACHE_REQUIRE_SHARED = config(
+    'LIBRARY_SUGGESTION_CACHE_REQUIRE_SHARED', cast=bool, default=not DEBUG)
+# Upper bound on the number of suggestions a request can ask for.
+LIBRARY_SUGGESTION_MAX_LIMIT = config('LIBRARY_SUGGESTION_MAX_LIMIT', cast=int, default=100)
+# Suggestions computed and cached per user and strategy; pages are cut from these.
+LIBRARY_SUGGESTION_TOP_K = config('LIBRARY_SUGGESTION_TOP_K', cast=int, default=500)
+# Books kept per precomputed ranking (top rated, trending) and genre.
+LIBRARY_RANKING_TOP_K = config('LIBRARY_RANKING_TOP_K', cast=int, default=500)
+# Top-rated scores add this many reviews at the catalog's mean rating to each book.
+LIBRARY_TOP_RATED_PRIOR_WEIGHT = config('LIBRARY_TOP_RATED_PRIOR_WEIGHT', cast=float, default=10.0)
+# Trending counts the reviews of the last days, each halved every half-life hours.
+LIBRARY_TRENDING_WINDOW_DAYS = config('LIBRARY_TRENDING_WINDOW_DAYS', cast=int, default=7)
+LIBRARY_TRENDING_HALF_LIFE_HOURS = config('LIBRARY_TRENDING_HALF_LIFE_HOURS', cast=float, default=24.0)
+# Seconds between ranking refreshes of ``refresh_book_rankings --loop``.
+LIBRARY_RANKINGS_REFRESH_INTERVAL = config('LIBRARY_RANKINGS_REFRESH_INTERVAL', cast=int, default=600)
+# Build JWT-authenticated users from the token claims instead of loading the
+# user row on every request. Views needing the full user keep JWTAuthentication.
+LIBRARY_AUTH_STATELESS = config('LIBRARY_AUTH_STATELESS', cast=bool, default=False)
+# With stateless JWTs, still reject tokens of inactive or deleted users, caching
+# each user's is_active for this many seconds (0 queries on every request).
+LIBRARY_AUTH_CHECK_ACTIVE = config('LIBRARY_AUTH_CHECK_ACTIVE', cast=bool, default=True)
+LIBRARY_AUTH_ACTIVE_CACHE_TIMEOUT = config(
+    'LIBRARY_AUTH_ACTIVE_CACHE_TIMEOUT', cast=int, default=60)
+# Seconds a DRF token's user id stays cached, in process and in the shared
+# cache (0 disables caching). Logouts and password changes evict them at once.
+LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT = config(
+    'LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT', cast=int, default=300)
+# Tokens kept in each process's LRU (0 only uses the shared cache).
+LIBRARY_AUTH_TOKEN_LRU_SIZE = config('LIBRARY_AUTH_TOKEN_LRU_SIZE', cast=int, default=1024)
+# Seconds between checks of the shared eviction version by each process's LRU:
+# evictions made by other processes reach it within this delay.
+LIBRARY_AUTH_TOKEN_VERSION_INTERVAL = config(
+    'LIBRARY_AUTH_TOKEN_VERSION_INTERVAL', cast=float, default=1.0)
+# Rows upserted per transaction by the bulk review import.
+LIBRARY_IMPORT_BATCH_SIZE = config('LIBRARY_IMPORT_BATCH_SIZE', cast=int, default=1000)
+# Reviews accepted per review upsert request, all written in one transaction.
+LIBRARY_REVIEW_UPSERT_MAX_ITEMS = config('LIBRARY_REVIEW_UPSERT_MAX_ITEMS', cast=int, default=100)
+# psycopg AsyncConnections opened at most per event loop for the async views,
+# and seconds a request waits for one when all are in use.
+LIBRARY_ASYNC_DB_MAX_SIZE = config('LIBRARY_ASYNC_DB_MAX_SIZE', cast=int, default=10)
+LIBRARY_ASYNC_DB_TIMEOUT = config('LIBRARY_ASYNC_DB_TIMEOUT', cast=float, default=5.0)
+# Share of requests whose SQL cost is recorded (0 disables, 1 records all):
+# every request under DEBUG, a small sample otherwise.
+LIBRARY_SQL_SAMPLE_RATE = config('LIBRARY_SQL_SAMPLE_RATE', cast=float, default=1.0 if DEBUG else 0.01)
+# Add the recorded SQL cost as a Server-Timing header. Unless DEBUG, only
+# requests from INTERNAL_IPS get it, so clients never see query counts.
+LIBRARY_SQL_SERVER_TIMING = config('LIBRARY_SQL_SERVER_TIMING', cast=bool, default=DEBUG)
+# A recorded request is logged as a warning above these budgets.
+LIBRARY_SQL_ALERT_QUERIES = config('LIBRARY_SQL_ALERT_QUERIES', cast=int, default=20)
+LIBRARY_SQL_ALERT_ROWS = config('LIBRARY_SQL_ALERT_ROWS', cast=int, default=10000)
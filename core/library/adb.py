@@ -0,0 +1,136 @@
+"""
+psycopg3 ``AsyncConnection`` access for the async views.
+
+Django 4.2 has no async database backend, so async views talk to Postgres
+directly with the ``default`` database settings, through a
+``psycopg_pool.AsyncConnectionPool`` per event loop. Each pool opens at
+most ``LIBRARY_ASYNC_DB_MAX_SIZE`` autocommit connections, idle or in use;
+further requests wait up to ``LIBRARY_ASYNC_DB_TIMEOUT`` seconds for one to
+be returned, then fail with ``PoolTimeout``. A loop's pools are closed when
+the loop shuts down.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import connections
+from library.middleware import current_recorder
+from psycopg_pool import AsyncConnectionPool
+
+# Event loop -> {connection parameters: pool}. Pools are closed when their
+# loop shuts down (see ``_close_pools_at_shutdown``), and entries of closed
+# loops (such as the one ``async_to_sync`` runs a view in) are dropped on
+# the next use.
+_pools = {}
+# Event loop -> the ``_close_pools_at_shutdown`` generator watching it
+_watchers = {}
+
+
+def get_connection_kwargs(alias='default'):
+    """
+    Return ``AsyncConnection.connect`` arguments for a Django database alias.
+    """
+    settings_dict = connections[alias].settings_dict
+    kwargs = {
+        'dbname': settings_dict['NAME'],
+        'user': settings_dict['USER'],
+        'password': settings_dict['PASSWORD'],
+        'host': settings_dict['HOST'],
+        'port': settings_dict['PORT'],
+    }
+    kwargs = {key: value for key, value in kwargs.items() if value}
+    # The sync backend's pool options are not connection parameters
+    kwargs.update({key: value for key, value in settings_dict['OPTIONS'].items() if key != 'pool'})
+    return kwargs
+
+
+def get_pool():
+    """
+    Return the running event loop's pool for the current ``default``
+    database settings, creating it (unopened) when needed.
+    """
+    for loop in [loop for loop in _pools if loop.is_closed()]:
+        del _pools[loop]
+        _watchers.pop(loop, None)
+    kwargs = {**get_connection_kwargs(), 'autocommit': True}
+    pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    key = repr(sorted(kwargs.items()))
+    if key not in pools:
+        pools[key] = AsyncConnectionPool(
+            kwargs=kwargs,
+            min_size=0,
+            max_size=settings.LIBRARY_ASYNC_DB_MAX_SIZE,
+            timeout=settings.LIBRARY_ASYNC_DB_TIMEOUT,
+            open=False,
+        )
+    return pools[key]
+
+
+async def _close_pools_at_shutdown(pools):
+    """
+    Async generator closing ``pools`` once it is finalized. ``asyncio.run``
+    and ``async_to_sync`` finalize the async generators of their loop before
+    closing it, so a loop's pools never outlive it with open connections.
+    """
+    try:
+        yield
+    finally:
+        for pool in list(pools.values()):
+            await pool.close()
+
+
+@asynccontextmanager
+async def acquire():
+    """
+    Yield an autocommit ``AsyncConnection`` from the running event loop's
+    pool, waiting for one when ``LIBRARY_ASYNC_DB_MAX_SIZE`` are in use.
+    """
+    pool = get_pool()
+    if pool.closed:
+        loop = asyncio.get_running_loop()
+        if loop not in _watchers:
+            # Registered before awaiting, so concurrent first uses start one
+            _watchers[loop] = watcher = _close_pools_at_shutdown(_pools[loop])
+            await watcher.asend(None)
+        # Opening an open pool is a no-op, so concurrent first uses are safe
+        await pool.open()
+    async with pool.connection() as conn:
+        yield conn
+
+
+async def close_pool():
+    """
+    Close the pools of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    pools = _pools.pop(loop, {})
+    watcher = _watchers.pop(loop, None)
+    if watcher is not None:
+        await watcher.aclose()
+    for pool in pools.values():
+        await pool.close()
+
+
+async def fetch_all(query):
+    """
+    Run a ``(sql, params)`` pair from ``library.queries`` and return all rows.
+    Each call checks out its own connection, so independent statements can
+    run concurrently with ``asyncio.gather``.
+    """
+    sql, params = query
+    async with acquire() as conn:
+        async with conn.cursor() as cursor:
+            start = time.perf_counter()
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+            duration = time.perf_counter() - start
+    recorder = current_recorder.get()
+    if recorder is not None:
+        recorder.record(sql, duration, len(rows))
+    return rows
+
+
+async def fetch_one(query):
+    rows = await fetch_all(query)
+    return rows[0] if rows else None
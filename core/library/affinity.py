@@ -0,0 +1,64 @@
+from django.db import connection
+
+HIGH_RATING = 4
+
+
+def is_high_rating(rating):
+    return rating is not None and rating >= HIGH_RATING
+
+
+def update_user_affinity(cursor, user_id, book_id, old_rating, new_rating):
+    """
+    Patch the user's genre and author affinity after a review on ``book_id``
+    changes from ``old_rating`` to ``new_rating`` (None when the review is
+    created or deleted). Must run in the same transaction as the review write.
+    """
+    delta = int(is_high_rating(new_rating)) - int(is_high_rating(old_rating))
+    if delta == 0:
+        return
+    cursor.execute("""
+        INSERT INTO user_affinity (user_id, dimension, value, high_rating_count)
+        SELECT %s, dims.dimension, dims.value, GREATEST(%s, 0)
+        FROM books
+        CROSS JOIN LATERAL (
+            VALUES ('genre', books.genre), ('author', books.author)
+        ) AS dims (dimension, value)
+        WHERE books.id = %s
+        ON CONFLICT (user_id, dimension, value) DO UPDATE
+        SET high_rating_count = GREATEST(user_affinity.high_rating_count + %s, 0)
+    """, [user_id, delta, book_id, delta])
+
+
+AGGREGATE_SQL = """
+    INSERT INTO user_affinity (user_id, dimension, value, high_rating_count)
+    SELECT reviews.user_id, dims.dimension, dims.value, COUNT(*)
+    FROM reviews
+    JOIN books ON books.id = reviews.book_id
+    CROSS JOIN LATERAL (
+        VALUES ('genre', books.genre), ('author', books.author)
+    ) AS dims (dimension, value)
+    WHERE reviews.rating >= %s {user_filter}
+    GROUP BY reviews.user_id, dims.dimension, dims.value
+"""
+
+
+def refresh_user_affinity(cursor, user_ids):
+    """
+    Recompute the affinity of the given users from their reviews, for bulk
+    writes where patching review by review would cost a statement per row.
+    """
+    cursor.execute("DELETE FROM user_affinity WHERE user_id = ANY(%s)", [list(user_ids)])
+    cursor.execute(
+        AGGREGATE_SQL.format(user_filter="AND reviews.user_id = ANY(%s)"),
+        [HIGH_RATING, list(user_ids)])
+
+
+def rebuild_user_affinity():
+    """
+    Recompute the whole affinity table from ``reviews`` and return the
+    number of rows written.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM user_affinity")
+        cursor.execute(AGGREGATE_SQL.format(user_filter=""), [HIGH_RATING])
+        return cursor.rowcount
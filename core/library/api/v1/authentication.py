@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from account.authentication import aget_cached_user_id
+from library import adb
+
+USER_ACTIVE_KEY_PREFIX = 'library:auth:active'
+
+
+def user_active_key(user_id):
+    return f"{USER_ACTIVE_KEY_PREFIX}:{user_id}"
+
+
+def user_active_query(user_id):
+    return f"SELECT is_active FROM {get_user_model()._meta.db_table} WHERE id = %s", [user_id]
+
+
+def is_user_active(user_id):
+    """
+    Return whether the user exists and is active. The answer is cached for
+    ``LIBRARY_AUTH_ACTIVE_CACHE_TIMEOUT`` seconds (0 queries every time), so
+    deactivating a user takes up to that long to lock their tokens out.
+    """
+    timeout = settings.LIBRARY_AUTH_ACTIVE_CACHE_TIMEOUT
+    active = cache.get(user_active_key(user_id)) if timeout else None
+    if active is None:
+        with connection.cursor() as cursor:
+            cursor.execute(*user_active_query(user_id))
+            row = cursor.fetchone()
+        active = row is not None and row[0]
+        if timeout:
+            cache.set(user_active_key(user_id), active, timeout)
+    return active
+
+
+async def ais_user_active(user_id):
+    """
+    Async ``is_user_active``, querying on an async connection.
+    """
+    timeout = settings.LIBRARY_AUTH_ACTIVE_CACHE_TIMEOUT
+    active = await cache.aget(user_active_key(user_id)) if timeout else None
+    if active is None:
+        row = await adb.fetch_one(user_active_query(user_id))
+        active = row is not None and row[0]
+        if timeout:
+            await cache.aset(user_active_key(user_id), active, timeout)
+    return active
+
+
+class LibraryJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    ``JWTAuthentication`` that, with ``LIBRARY_AUTH_STATELESS``, builds the
+    user from the token claims (a simplejwt ``TokenUser``) instead of loading
+    the user row: the library views only read ``request.user.id``. With
+    ``LIBRARY_AUTH_CHECK_ACTIVE`` tokens of users deactivated or deleted
+    since they were issued are still rejected, through ``is_user_active``.
+
+    Views needing the full user (password changes, ``is_staff``
+    permissions) set ``JWTAuthentication`` explicitly.
+    """
+
+    def get_user(self, validated_token):
+        if not settings.LIBRARY_AUTH_STATELESS:
+            return JWTAuthentication.get_user(self, validated_token)
+        user = super().get_user(validated_token)
+        if settings.LIBRARY_AUTH_CHECK_ACTIVE and not is_user_active(user.id):
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+
+async def aauthenticate(request):
+    """
+    Return the id of the active user authenticated by the request's JWT
+    (``Bearer``) or DRF token (``Token``), or None without credentials.
+    Mirrors ``DEFAULT_AUTHENTICATION_CLASSES`` for the async views, with
+    the user lookup run on an async connection. DRF tokens are served from
+    the token cache when present; JWTs skip the lookup with
+    ``LIBRARY_AUTH_STATELESS``.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if not header:
+        return None
+    keyword = header[0]
+    if keyword in jwt_settings.AUTH_HEADER_TYPES:
+        auth = 'jwt'
+    elif keyword == TokenAuthentication.keyword:
+        auth = 'token'
+    else:
+        return None
+    if len(header) != 2:
+        raise AuthenticationFailed('Invalid token header.')
+
+    user_table = get_user_model()._meta.db_table
+    if auth == 'jwt':
+        authentication = JWTStatelessUserAuthentication()
+        token = authentication.get_validated_token(header[1].encode())
+        if settings.LIBRARY_AUTH_STATELESS:
+            user_id = authentication.get_user(token).id
+            if settings.LIBRARY_AUTH_CHECK_ACTIVE and not await ais_user_active(user_id):
+                raise AuthenticationFailed('User is inactive')
+            return user_id
+        row = await adb.fetch_one((
+            f"SELECT id FROM {user_table} WHERE id = %s AND is_active",
+            [token[jwt_settings.USER_ID_CLAIM]],
+        ))
+        if row is None:
+            raise AuthenticationFailed('User not found')
+    else:
+        user_id = await aget_cached_user_id(header[1])
+        if user_id is not None:
+            return user_id
+        row = await adb.fetch_one((f"""
+            SELECT {user_table}.id
+            FROM authtoken_token
+            JOIN {user_table} ON {user_table}.id = authtoken_token.user_id
+            WHERE authtoken_token.key = %s AND {user_table}.is_active
+        """, [header[1]]))
+        if row is None:
+            raise AuthenticationFailed('Invalid token.')
+    return row[0]
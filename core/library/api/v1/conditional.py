@@ -0,0 +1,44 @@
+from functools import wraps
+from hashlib import sha256
+
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from library.suggestion_cache import get_versions
+
+
+def versions_etag(request, user_id, versions):
+    """
+    Return a strong ETag for the response to ``request``. Its body only
+    changes with the catalog version, the user's version (bumped by their
+    review writes) and the versions of the shared data it shows (see
+    ``get_versions``), so hashing those with the URL and the negotiated
+    representation identifies it.
+    """
+    parts = [request.build_absolute_uri(), request.META.get('HTTP_ACCEPT', ''), str(user_id), *versions]
+    return f'"{sha256(chr(0).join(parts).encode()).hexdigest()[:32]}"'
+
+
+def conditional_get(get):
+    """
+    Decorate a view's ``get`` so a request whose ``If-None-Match`` holds
+    the current ETag is answered ``304 Not Modified`` before the view runs
+    any query. Successful and 304 responses carry the ETag. Views showing
+    data shared by every user list its scopes in ``conditional_scopes``
+    (e.g. ``('rankings',)``, so each refresh changes their ETag). Views
+    whose rows change with other users' writes return the cache keys of
+    their versions from ``get_conditional_version_keys()``.
+    """
+    @wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        user_id = request.user.id if request.user.is_authenticated else None
+        get_keys = getattr(self, 'get_conditional_version_keys', None)
+        versions = get_versions(
+            user_id, getattr(self, 'conditional_scopes', ()), get_keys() if get_keys else ())
+        etag = versions_etag(request, user_id, versions)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = get(self, request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+        return response
+    return wrapper
@@ -0,0 +1,264 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connection
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RawQueryList:
+    """
+    Lazy, sliceable wrapper around a raw SQL query.
+
+    Django's paginator only needs ``count()`` and slicing, so wrapping the
+    query lets ``PageNumberPagination`` push LIMIT/OFFSET into SQL instead of
+    fetching every row and slicing the page out in Python. ``counter`` returns
+    ``(count, exact)`` so the total may come from a cache or an estimate.
+    """
+
+    def __init__(self, query, params, counter):
+        self.query = query
+        self.params = params
+        self.counter = counter
+        self.count_exact = None
+
+    def count(self):
+        count, self.count_exact = self.counter()
+        return count
+
+    def __iter__(self):
+        with connection.cursor() as cursor:
+            cursor.execute(self.query, self.params)
+            return iter(cursor.fetchall())
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("RawQueryList only supports slicing")
+        offset = index.start or 0
+        limit = index.stop - offset
+        with connection.cursor() as cursor:
+            cursor.execute(f"{self.query} LIMIT %s OFFSET %s",
+                           self.params + [limit, offset])
+            return cursor.fetchall()
+
+
+class EstimatedCountPage(Page):
+    """
+    Page of an ``EstimatedCountPaginator`` over an estimated count, knowing
+    whether another page follows from the extra row fetched with it.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator over a ``RawQueryList`` whose count may be a planner estimate.
+    An estimate can be too low or too high, so page numbers are then not
+    checked against it: the page is fetched with one extra row telling
+    whether another follows, and only an empty page past the first is
+    rejected. Exact counts paginate as usual.
+    """
+
+    @property
+    def count_exact(self):
+        self.count  # Counting tells whether the count is exact
+        return getattr(self.object_list, 'count_exact', True)
+
+    def validate_number(self, number):
+        if self.count_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        if self.count_exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        offset = (number - 1) * self.per_page
+        rows = self.object_list[offset:offset + self.per_page + 1]
+        if number > 1 and not rows:
+            raise EmptyPage(_("That page contains no results"))
+        return EstimatedCountPage(rows[:self.per_page], number, self, len(rows) > self.per_page)
+
+
+class CountedPageNumberPagination(PageNumberPagination):
+    """
+    Page-number pagination that reports whether ``count`` is exact or a
+    planner estimate (see ``EstimatedCountPaginator``).
+    """
+    django_paginator_class = EstimatedCountPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        if page is not None and not self.page.paginator.count_exact:
+            # Page links need the number of pages, which an estimate does not give
+            self.display_page_controls = False
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_exact': self.page.paginator.count_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class KeysetCursorPagination:
+    """
+    Keyset (seek) pagination over a strictly increasing integer column.
+
+    The cursor is an opaque token holding the last seen key and the
+    direction, so each page is a ``WHERE key > %s ORDER BY key LIMIT %s``
+    seek and costs O(page_size) rows no matter how deep the client goes.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = api_settings.PAGE_SIZE
+
+    def decode_cursor(self, request):
+        """
+        Return ``(position, reverse)`` from the request's cursor token.
+        An empty token starts at the beginning of the list.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            position = int(tokens['p'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        tokens = {'p': position}
+        if reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_seek(self, request, column):
+        """
+        Return the seek predicate, its params and the ORDER BY direction
+        for the current cursor.
+        """
+        self.base_url = request.build_absolute_uri()
+        self.position, self.reverse = self.decode_cursor(request)
+        ordering = f"{column} DESC" if self.reverse else column
+        if self.position is None:
+            return [], [], ordering
+        operator = '<' if self.reverse else '>'
+        return [f"{column} {operator} %s"], [self.position], ordering
+
+    def paginate_rows(self, rows, key=lambda row: row[0]):
+        """
+        Trim the ``page_size + 1`` rows fetched by the seek query into a
+        page and work out the neighbouring cursors.
+        """
+        has_more = len(rows) > self.page_size
+        page = list(rows[:self.page_size])
+        if self.reverse:
+            page.reverse()
+            has_next, has_previous = self.position is not None, has_more
+        else:
+            has_next, has_previous = has_more, self.position is not None
+
+        self.next_url = None
+        self.previous_url = None
+        if page and has_next:
+            self.next_url = self.encode_cursor(key(page[-1]), False)
+        elif not page and self.reverse:
+            # Nothing before the cursor, so point back at the first page.
+            self.next_url = replace_query_param(
+                self.base_url, self.cursor_query_param, '')
+        if page and has_previous:
+            self.previous_url = self.encode_cursor(key(page[0]), True)
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_url,
+            'previous': self.previous_url,
+            'results': data,
+        })
+
+
+class RankedListCursorPagination:
+    """
+    Cursor pagination over an already ranked, bounded list such as cached
+    suggestions. The cursor holds the position of the page's first item and
+    ``limit`` sets the page size, capped at ``LIBRARY_SUGGESTION_MAX_LIMIT``.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    invalid_cursor_message = 'Invalid cursor'
+    default_limit = api_settings.PAGE_SIZE
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit < 1:
+            return self.default_limit
+        return min(limit, settings.LIBRARY_SUGGESTION_MAX_LIMIT)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return 0
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            position = int(parse.parse_qs(querystring)['o'][0])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if position < 0:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        if not position:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        encoded = b64encode(parse.urlencode({'o': position}).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_list(self, rows, request):
+        self.base_url = request.build_absolute_uri()
+        limit = self.get_limit(request)
+        position = self.decode_cursor(request)
+        self.next_url = None
+        self.previous_url = None
+        if position + limit < len(rows):
+            self.next_url = self.encode_cursor(position + limit)
+        if position:
+            self.previous_url = self.encode_cursor(max(position - limit, 0))
+        return rows[position:position + limit]
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_url,
+            'previous': self.previous_url,
+            'results': data,
+        })
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class RowStreamRenderer(BaseRenderer):
+    """
+    Base for renderers that can encode tuple rows chunk by chunk, so views
+    can stream large results through ``StreamingHttpResponse``.
+    ``render`` handles regular responses such as errors and plain lists.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        objects = data if isinstance(data, list) else [data]
+        if not objects:
+            return b''
+        columns = list(objects[0])
+        rows = [[obj.get(column) for column in columns] for obj in objects]
+        return (self.encode_header(columns) + self.encode_rows(columns, rows)).encode(self.charset)
+
+    def encode_header(self, columns):
+        return ''
+
+    def encode_rows(self, columns, rows):
+        raise NotImplementedError('encode_rows() must be implemented.')
+
+
+class NDJSONRenderer(RowStreamRenderer):
+    """
+    Newline-delimited JSON, one object per row.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def encode_rows(self, columns, rows):
+        return ''.join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+
+
+class CSVRenderer(RowStreamRenderer):
+    """
+    CSV with a header row of column names.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def encode_header(self, columns):
+        return self.encode_rows(columns, [columns])
+
+    def encode_rows(self, columns, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` encoding with orjson when it is installed, producing
+    the same bytes for compact, non-ASCII-escaped output. Types orjson
+    formats differently (dates, times) go through DRF's encoder. Floats
+    below 1e-4 or from 1e16 up differ in exponent notation, so only use it
+    for payloads whose floats stay in between, such as rating averages.
+    Indented output (the browsable API) and missing orjson fall back to
+    ``JSONRenderer``.
+    """
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        # Same strict javascript subset escaping as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -1,7 +1,28 @@
 from rest_framework import serializers
+from library.ratings import RATING_COLUMNS
 
 
-class BookSerializer(serializers.Serializer):
+class RowSerializerMixin:
+    """
+    Represent tuple rows from raw SQL as dicts keyed by ``columns``, the
+    names of the rows' leading columns in SELECT order.
+    """
+    columns = ()
+
+    def to_representation(self, instance):
+        return dict(zip(self.columns, instance))
+
+    @classmethod
+    def serialize_rows(cls, rows):
+        """
+        Fast path for ``cls(rows, many=True).data``: the same dicts, without
+        a ListSerializer or a method call per row.
+        """
+        columns = cls.columns
+        return [dict(zip(columns, row)) for row in rows]
+
+
+class BookSerializer(RowSerializerMixin, serializers.Serializer):
     """
     Serializer for book details.
     """
@@ -10,18 +31,10 @@ class BookSerializer(serializers.Serializer):
     author = serializers.CharField(max_length=200)
     genre = serializers.CharField(max_length=50)
     rating = serializers.IntegerField(required=False)
-
-    def to_representation(self, instance):
-        # Custom representation of book data.
-        return {
-            'id': instance[0],
-            'title': instance[1],
-            'author': instance[2],
-            'genre': instance[3],
-        }
+    columns = ('id', 'title', 'author', 'genre')
 
 
-class BookRatingSerializer(serializers.Serializer):
+class BookRatingSerializer(RowSerializerMixin, serializers.Serializer):
     """
     Serializer for book details and user rating.
     """
@@ -30,13 +43,33 @@ class BookRatingSerializer(serializers.Serializer):
     author = serializers.CharField(max_length=200)
     genre = serializers.CharField(max_length=50)
     rating = serializers.IntegerField(required=False)
+    columns = ('id', 'title', 'author', 'genre', 'rating')
 
-    def to_representation(self, instance):
-        # Custom representation of book and rating data.
-        return {
-            'id': instance[0],
-            'title': instance[1],
-            'author': instance[2],
-            'genre': instance[3],
-            'rating': instance[4],
-        }
+
+class BookListSerializer(BookSerializer):
+    """
+    Serializer for book list rows: book details and rating aggregates.
+    """
+    rating_count = serializers.IntegerField()
+    rating_avg = serializers.FloatField(allow_null=True)
+    rating_1 = serializers.IntegerField()
+    rating_2 = serializers.IntegerField()
+    rating_3 = serializers.IntegerField()
+    rating_4 = serializers.IntegerField()
+    rating_5 = serializers.IntegerField()
+    columns = BookSerializer.columns + RATING_COLUMNS
+
+
+class BookListRatingSerializer(BookListSerializer):
+    """
+    Serializer for book list rows with the user's rating.
+    """
+    columns = BookListSerializer.columns + ('rating',)
+
+
+class RankedBookSerializer(BookSerializer):
+    """
+    Serializer for book ranking rows: book details and ranking score.
+    """
+    score = serializers.FloatField()
+    columns = BookSerializer.columns + ('score',)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.db import connection
 
 
@@ -36,3 +37,33 @@ class ReviewUpdateSerializer(serializers.Serializer):
         if value < 1 or value > 5:
             raise serializers.ValidationError("Rating must be between 1 and 5")
         return value
+
+
+class ReviewUpsertSerializer(serializers.Serializer):
+    """
+    Serializer for one review of an upsert. Whether the book exists is
+    checked by the upsert statement itself.
+    """
+    book_id = serializers.IntegerField()
+    rating = serializers.IntegerField()
+
+    def validate_rating(self, value):
+        # Validate if the rating is between 1 and 5.
+        if value < 1 or value > 5:
+            raise serializers.ValidationError("Rating must be between 1 and 5")
+        return value
+
+
+class ReviewUpsertListSerializer(serializers.Serializer):
+    """
+    Serializer for an upsert request. Items are validated one by one with
+    ``ReviewUpsertSerializer`` so each gets its own result.
+    """
+    reviews = serializers.ListField(allow_empty=False)
+
+    def validate_reviews(self, value):
+        # Validate the number of reviews written in one transaction.
+        if len(value) > settings.LIBRARY_REVIEW_UPSERT_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"At most {settings.LIBRARY_REVIEW_UPSERT_MAX_ITEMS} reviews per request")
+        return value
@@ -3,4 +3,6 @@ from django.urls import path, include
 urlpatterns = [
     path('', include('library.api.v1.urls.books')),
     path('', include('library.api.v1.urls.reviews')),
+    path('', include('library.api.v1.urls.stats')),
+    path('async/', include('library.api.v1.urls.async_books')),
 ]
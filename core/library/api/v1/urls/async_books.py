@@ -0,0 +1,11 @@
+from django.urls import path
+from .. import views
+
+urlpatterns = [
+    path('book/list/', views.AsyncBookListView.as_view(), name='async_book_list'),
+    path('suggest-by-genre/', views.AsyncGenreBasedBookSuggestionView.as_view(), name='async-suggest-by-genre'),
+    path('suggest-by-author/', views.AsyncAuthorBasedBookSuggestionView.as_view(), name='async-suggest-by-author'),
+    path('suggest-by-related-users/', views.AsyncRelatedUsersBookSuggestionView.as_view(), name='async-suggest-by-related-users'),
+    path('top-rated/', views.AsyncTopRatedBooksView.as_view(), name='async-top-rated'),
+    path('trending/', views.AsyncTrendingBooksView.as_view(), name='async-trending'),
+]
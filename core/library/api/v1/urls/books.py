@@ -3,7 +3,11 @@ from .. import views
 
 urlpatterns = [
     path('book/list/', views.BookListAPIView.as_view(), name='book_list'),
+    path('book/export/', views.BookExportAPIView.as_view(), name='book_export'),
     path('suggest-by-genre/', views.GenreBasedBookSuggestionAPIView.as_view(), name='suggest-by-genre'),
     path('suggest-by-author/', views.AuthorBasedBookSuggestionAPIView.as_view(), name='suggest-by-author'),
     path('suggest-by-related-users/', views.RelatedUsersBookSuggestionAPIView.as_view(), name='suggest-by-related-users'),
+    path('suggestions/', views.SuggestionsAPIView.as_view(), name='suggestions'),
+    path('top-rated/', views.TopRatedBooksAPIView.as_view(), name='top-rated'),
+    path('trending/', views.TrendingBooksAPIView.as_view(), name='trending'),
 ]
@@ -1,8 +1,12 @@
 from django.urls import path
-from ..views import AddReviewAPIView, UpdateReviewAPIView, DeleteReviewAPIView
+from ..views import (
+    AddReviewAPIView, UpdateReviewAPIView, UpsertReviewsAPIView, DeleteReviewAPIView, BulkReviewAPIView,
+)
 
 urlpatterns = [
     path('review/add/', AddReviewAPIView.as_view(), name='add_review'),
     path('review/update/', UpdateReviewAPIView.as_view(), name='update_review'),
+    path('review/upsert/', UpsertReviewsAPIView.as_view(), name='upsert_reviews'),
     path('review/delete/<int:review_id>/', DeleteReviewAPIView.as_view(), name='delete_review'),
+    path('review/bulk/', BulkReviewAPIView.as_view(), name='bulk_review'),
 ]
@@ -0,0 +1,6 @@
+from django.urls import path
+from .. import views
+
+urlpatterns = [
+    path('stats/db-pool/', views.DatabasePoolStatsAPIView.as_view(), name='db_pool_stats'),
+]
@@ -1,2 +1,4 @@
 from .books import *
-from .reviews import *
\ No newline at end of file
+from .reviews import *
+from .async_books import *
+from .stats import *
\ No newline at end of file
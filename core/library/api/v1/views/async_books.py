@@ -0,0 +1,247 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from library import adb
+from library.cf import get_precomputed_related_books
+from library.counts import get_book_count
+from library.models import UserAffinity
+from library.queries import (
+    books_by_affinity_query, books_in_order_query, neighbor_books_query, ranked_books_query,
+    related_users_books_query,
+)
+from library.rankings import aget_ranked_books
+from library.suggestion_cache import aget_cached_suggestions, aget_versions
+from ..authentication import aauthenticate
+from ..conditional import versions_etag
+from ..serializers import BookListRatingSerializer, BookListSerializer, BookSerializer
+from ..paginations import KeysetCursorPagination, RankedListCursorPagination
+from .books import (
+    AuthorBasedBookSuggestionAPIView, BookListAPIView, GenreBasedBookSuggestionAPIView,
+    RelatedUsersBookSuggestionAPIView, TopRatedBooksAPIView, TrendingBooksAPIView,
+)
+
+
+class AsyncAPIView(View):
+    """
+    Base for the async (ASGI) versions of the book views. Authenticates the
+    request without blocking, answers conditional GETs like
+    ``conditional_get`` and renders API errors the way DRF does.
+    """
+    authentication_required = False
+    conditional_scopes = ()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user_id = await aauthenticate(request)
+            if self.authentication_required and request.user_id is None:
+                raise NotAuthenticated()
+            if request.method not in ('GET', 'HEAD'):
+                return await super().dispatch(request, *args, **kwargs)
+            etag = versions_etag(request, request.user_id, await aget_versions(
+                request.user_id, self.conditional_scopes, self.get_conditional_version_keys()))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await super().dispatch(request, *args, **kwargs)
+            if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+                response['ETag'] = etag
+            return response
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return JsonResponse(data, status=exc.status_code, safe=False)
+
+    def get_conditional_version_keys(self):
+        return ()
+
+
+class AsyncBookListView(AsyncAPIView):
+    """
+    Async version of ``BookListAPIView``. The page and its count are
+    independent, so they are fetched at the same time.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_query_param = 'page'
+    cursor_pagination_class = KeysetCursorPagination
+
+    def get_conditional_version_keys(self):
+        books = BookListAPIView()
+        books.request = self.request
+        return books.get_conditional_version_keys()
+
+    async def get(self, request):
+        """
+        Handle GET request to retrieve a list of books, optionally filtered by genre.
+        """
+        user_id = request.user_id
+        # The sync view builds the filters and the query
+        books = BookListAPIView()
+        books.request = request
+        filters, params = books._get_filters_and_params(user_id)
+        serializer_class = BookListRatingSerializer if user_id else BookListSerializer
+
+        if self.cursor_pagination_class.cursor_query_param in request.GET:
+            books._check_cursor_ordering()
+            paginator = self.cursor_pagination_class()
+            drf_request = Request(request)
+            seek_filters, seek_params, ordering = paginator.get_seek(drf_request, 'books.id')
+            query = books._get_query(filters + seek_filters, user_id, ordering)
+            rows = await adb.fetch_all((
+                f"{query} LIMIT %s",
+                [user_id] + params + seek_params + [paginator.page_size + 1],
+            ))
+            data = serializer_class.serialize_rows(paginator.paginate_rows(rows))
+            return JsonResponse(paginator.get_paginated_response(data).data)
+
+        try:
+            page = int(request.GET.get(self.page_query_param, 1))
+            if page < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound('Invalid page.')
+        ordering, ordering_params = books._get_ordering()
+        (count, exact), rows = await asyncio.gather(
+            sync_to_async(get_book_count)(filters, params, books._get_filter_values(user_id)),
+            # One extra row tells whether another page follows, as the count
+            # may be an estimate
+            adb.fetch_all((
+                f"{books._get_query(filters, user_id, ordering)} LIMIT %s OFFSET %s",
+                [user_id] + params + ordering_params + [self.page_size + 1, (page - 1) * self.page_size],
+            )),
+        )
+        if page > 1 and not rows:
+            raise NotFound('Invalid page.')
+
+        url = request.build_absolute_uri()
+        next_url = previous_url = None
+        if len(rows) > self.page_size:
+            next_url = replace_query_param(url, self.page_query_param, page + 1)
+        if page == 2:
+            previous_url = remove_query_param(url, self.page_query_param)
+        elif page > 2:
+            previous_url = replace_query_param(url, self.page_query_param, page - 1)
+        return JsonResponse({
+            'count': count,
+            'count_exact': exact,
+            'next': next_url,
+            'previous': previous_url,
+            'results': serializer_class.serialize_rows(rows[:self.page_size]),
+        })
+
+
+class AsyncSuggestionView(AsyncAPIView):
+    """
+    Base for the async suggestion views, sharing cache entries with the
+    sync ones.
+    """
+    authentication_required = True
+    pagination_class = RankedListCursorPagination
+    serializer_class = BookSerializer
+    empty_message = "No suggestions available"
+    fallback_ranking = None
+
+    def get_suggestions_response(self, rows, request):
+        if not rows:
+            return JsonResponse({"message": self.empty_message}, status=status.HTTP_200_OK)
+        paginator = self.pagination_class()
+        page = paginator.paginate_list(rows, Request(request))
+        return JsonResponse(paginator.get_paginated_response(self.serializer_class.serialize_rows(page)).data)
+
+    async def _get_fallback_books(self, user_id):
+        if self.fallback_ranking is None:
+            return []
+        return await adb.fetch_all(ranked_books_query(
+            self.fallback_ranking, user_id=user_id, limit=settings.LIBRARY_SUGGESTION_TOP_K))
+
+
+class AsyncGenreBasedBookSuggestionView(AsyncSuggestionView):
+    """
+    Async version of ``GenreBasedBookSuggestionAPIView``.
+    """
+    dimension = UserAffinity.DIMENSION_GENRE
+    fallback_ranking = GenreBasedBookSuggestionAPIView.fallback_ranking
+    conditional_scopes = GenreBasedBookSuggestionAPIView.conditional_scopes
+
+    async def get(self, request):
+        user_id = request.user_id
+        rows = await aget_cached_suggestions(
+            user_id, self.dimension,
+            lambda: adb.fetch_all(books_by_affinity_query(
+                user_id, self.dimension, settings.LIBRARY_SUGGESTION_TOP_K)))
+        if not rows:
+            rows = await self._get_fallback_books(user_id)
+        return self.get_suggestions_response(rows, request)
+
+
+class AsyncAuthorBasedBookSuggestionView(AsyncGenreBasedBookSuggestionView):
+    """
+    Async version of ``AuthorBasedBookSuggestionAPIView``.
+    """
+    dimension = UserAffinity.DIMENSION_AUTHOR
+    fallback_ranking = AuthorBasedBookSuggestionAPIView.fallback_ranking
+    conditional_scopes = AuthorBasedBookSuggestionAPIView.conditional_scopes
+
+
+class AsyncRelatedUsersBookSuggestionView(AsyncSuggestionView):
+    """
+    Async version of ``RelatedUsersBookSuggestionAPIView``.
+    """
+    available_modes = RelatedUsersBookSuggestionAPIView.available_modes
+    conditional_scopes = RelatedUsersBookSuggestionAPIView.conditional_scopes
+
+    async def get(self, request):
+        user_id = request.user_id
+        mode = request.GET.get('mode', 'live')
+        if mode not in self.available_modes:
+            return JsonResponse({"error": f"mode must be one of {', '.join(self.available_modes)}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        if mode == 'neighbors':
+            compute = lambda: adb.fetch_all(neighbor_books_query(user_id, settings.LIBRARY_SUGGESTION_TOP_K))
+        elif mode == 'precomputed':
+            compute = lambda: self._get_precomputed_books(user_id)
+        else:
+            compute = lambda: adb.fetch_all(
+                related_users_books_query(user_id, settings.LIBRARY_SUGGESTION_TOP_K))
+        rows = await aget_cached_suggestions(
+            user_id, f'related:{mode}', compute, self.conditional_scopes)
+        return self.get_suggestions_response(rows, request)
+
+    async def _get_precomputed_books(self, user_id):
+        ranked = await sync_to_async(get_precomputed_related_books)(user_id)
+        if ranked is None:
+            return await adb.fetch_all(
+                related_users_books_query(user_id, settings.LIBRARY_SUGGESTION_TOP_K))
+        book_ids = [book_id for book_id, _ in ranked[:settings.LIBRARY_SUGGESTION_TOP_K]]
+        return await adb.fetch_all(books_in_order_query(book_ids, user_id))
+
+
+class AsyncTopRatedBooksView(AsyncSuggestionView):
+    """
+    Async version of ``TopRatedBooksAPIView``.
+    """
+    authentication_required = False
+    serializer_class = TopRatedBooksAPIView.serializer_class
+    empty_message = TopRatedBooksAPIView.empty_message
+    conditional_scopes = TopRatedBooksAPIView.conditional_scopes
+    ranking = TopRatedBooksAPIView.ranking
+    genre_query_param = TopRatedBooksAPIView.genre_query_param
+
+    async def get(self, request):
+        genre = request.GET.get(self.genre_query_param, '') if self.genre_query_param else ''
+        return self.get_suggestions_response(await aget_ranked_books(self.ranking, genre), request)
+
+
+class AsyncTrendingBooksView(AsyncTopRatedBooksView):
+    """
+    Async version of ``TrendingBooksAPIView``.
+    """
+    ranking = TrendingBooksAPIView.ranking
+    genre_query_param = TrendingBooksAPIView.genre_query_param
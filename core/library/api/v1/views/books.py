@@ -1,10 +1,34 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.settings import api_settings
 from rest_framework import status
-from django.db import connection
-from ..serializers import BookSerializer, BookRatingSerializer
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from functools import partial
+from math import isfinite
+from library.cf import get_precomputed_related_books
+from library.counts import get_book_count
+from library.models import BookRanking, UserAffinity
+from library.queries import (
+    BOOK_SEARCH_FILTER, BOOK_SEARCH_RANK, SUGGESTION_STRATEGIES, blended_suggestions_query,
+    book_search_tsquery, combined_suggestions_query, fetch_all, get_books_by_affinity,
+    get_books_in_order, get_neighbor_books, get_ranked_books_for_user, get_related_users_books,
+)
+from library.rankings import get_ranked_books
+from library.ratings import RATING_COLUMNS
+from library.suggestion_cache import get_cached_suggestions, ratings_version_keys
+from ..conditional import conditional_get
+from ..filters import BookFilterCompiler
+from ..serializers import BookListRatingSerializer, BookListSerializer, BookSerializer, RankedBookSerializer
+from ..paginations import (
+    RawQueryList, CountedPageNumberPagination, KeysetCursorPagination, RankedListCursorPagination,
+)
+from ..renderers import CSVRenderer, NDJSONRenderer, ORJSONRenderer
 
 
 # def dictfetchall(cursor):
@@ -17,248 +41,496 @@ class BookListAPIView(APIView):
     """
     API view to handle fetching and filtering a list of books.
     """
-    available_filters = ['genre']  # Define available filters for books
-
+    filter_compiler_class = BookFilterCompiler
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+    search_query_param = 'q'
+    ordering_query_param = 'ordering'
+    # ``ordering`` values and their ORDER BY clauses. Ties go by id in the
+    # same direction, so books_rating_avg_idx and books_rating_count_idx
+    # return the rows in order; ascending average is sorted.
+    ordering_fields = {
+        '-rating_avg': 'books.rating_avg DESC NULLS LAST, books.id DESC',
+        'rating_avg': 'books.rating_avg ASC NULLS LAST, books.id',
+        '-rating_count': 'books.rating_count DESC, books.id DESC',
+        'rating_count': 'books.rating_count, books.id',
+    }
+    cursor_pagination_class = KeysetCursorPagination
+
+    @conditional_get
     def get(self, request):
         """
-        Handle GET request to retrieve a list of books, optionally filtered by genre.
+        Handle GET request to retrieve a list of books, optionally filtered
+        (see ``BookFilterCompiler``). ``q`` searches words of titles and
+        authors by prefix, best matches first. ``ordering`` sorts by
+        ``rating_avg`` or ``rating_count`` instead (``-`` for descending).
+        Passing a ``cursor`` query parameter (empty for the first page) switches
+        from page-number to keyset pagination, which keeps the ``books.id`` order
+        and rejects ``ordering``.
         """
         user_id = request.user.id if request.user.is_authenticated else None
-        filters, params = self._get_filters_and_params()
-        query = self._get_query(filters, user_id)
-        with connection.cursor() as cursor:
-            cursor.execute(query, [user_id] + params)
-            books = cursor.fetchall()  # Fetch all books based on the query
+        filters, params = self._get_filters_and_params(user_id)
+        if self.cursor_pagination_class.cursor_query_param in request.GET:
+            return self._get_cursor_paginated_response(filters, params, user_id, request)
+        # Rows are only fetched for the requested page
+        ordering, ordering_params = self._get_ordering()
+        counter = partial(get_book_count, filters, params, self._get_filter_values(user_id))
+        books = RawQueryList(self._get_query(filters, user_id, ordering),
+                             [user_id] + params + ordering_params, counter)
         return self._get_paginated_response(books, request)
 
-    def _get_filters_and_params(self):
+    def get_conditional_version_keys(self):
+        """
+        Return the cache keys of the rating aggregates versions the rows
+        depend on: those of the filtered genres, so writes to books of other
+        genres keep the ETag, or the catalog-wide one.
+        """
+        return ratings_version_keys(self.filter_compiler_class(self.request.GET).get_genres())
+
+    def _check_cursor_ordering(self):
+        """
+        Reject ``ordering`` in keyset pagination: pages seek on ``books.id``,
+        so they could not keep any other order.
+        """
+        if self.request.GET.get(self.ordering_query_param):
+            raise ValidationError({self.ordering_query_param: [
+                f"Cannot be combined with {self.cursor_pagination_class.cursor_query_param}, "
+                "which pages in id order."]})
+
+    def _get_filters_and_params(self, user_id=None):
         """
         Build SQL filters and parameters based on query parameters.
         """
-        filters = []
-        params = []
-        for key_filter in self.available_filters:
-            # Get filter value from request
-            val_filter = self.request.GET.get(key_filter)
-            if val_filter:
-                filters.append(f"books.{key_filter} = %s")
-                params.append(val_filter)
+        filters, params = self.filter_compiler_class(self.request.GET, user_id).compile()
+        search = self._get_search()
+        if search:
+            filters.append(BOOK_SEARCH_FILTER)
+            params.append(search)
         return filters, params
 
-    def _get_query(self, filters, user_id):
+    def _get_search(self):
+        return book_search_tsquery(self.request.GET.get(self.search_query_param, ''))
+
+    def _get_ordering(self):
         """
-        Construct SQL query for fetching books with optional filters and user's rating.
+        Return the ORDER BY clause and its parameters: by the ``ordering``
+        field when given, by relevance to the search terms when searching,
+        by ``books.id`` otherwise.
         """
-        base_query = """
-            SELECT books.id, books.title, books.author, books.genre, reviews.rating
+        ordering = self.request.GET.get(self.ordering_query_param)
+        if ordering:
+            if ordering not in self.ordering_fields:
+                raise ValidationError({self.ordering_query_param: [
+                    f"Must be one of {', '.join(self.ordering_fields)}."]})
+            return self.ordering_fields[ordering], []
+        search = self._get_search()
+        if not search:
+            return 'books.id', []
+        return f"{BOOK_SEARCH_RANK} DESC, books.id", [search]
+
+    def _get_query(self, filters, user_id, ordering='books.id'):
+        """
+        Construct SQL query for fetching books with optional filters, rating
+        aggregates and user's rating, in ``BookListRatingSerializer.columns`` order.
+        """
+        base_query = f"""
+            SELECT books.id, books.title, books.author, books.genre,
+                   {', '.join(f'books.{column}' for column in RATING_COLUMNS)}, reviews.rating
             FROM books
             LEFT JOIN reviews ON books.id = reviews.book_id AND reviews.user_id = %s
         """
         if not filters:
-            return base_query  # Return base query if no filters
-        query = f"{base_query} WHERE {' AND '.join(filters)}"
+            return f"{base_query} ORDER BY {ordering}"
+        query = f"{base_query} WHERE {' AND '.join(filters)} ORDER BY {ordering}"
         return query
 
+    def _get_filter_values(self, user_id=None):
+        """
+        Return the applied filter values, used to key the cached book counts,
+        or None when the count is specific to the user.
+        """
+        values = self.filter_compiler_class(self.request.GET, user_id).get_cache_values()
+        search = self._get_search()
+        if values is not None and search:
+            values[self.search_query_param] = search
+        return values
+
     def _get_paginated_response(self, books, request):
         """
         Return a paginated response for the list of books.
         """
         serializer_class = self._get_serializer_class()
-        paginator = PageNumberPagination()
+        paginator = CountedPageNumberPagination()
         page = paginator.paginate_queryset(books, request)
         if page is not None:
-            serializer = serializer_class(page, many=True)
-            return paginator.get_paginated_response(serializer.data)
-        serializer = serializer_class(books, many=True)
-        return Response(serializer.data)
+            return paginator.get_paginated_response(serializer_class.serialize_rows(page))
+        return Response(serializer_class.serialize_rows(books))
+
+    def _get_cursor_paginated_response(self, filters, params, user_id, request):
+        """
+        Return a keyset-paginated response, seeking on books.id so only one
+        page of rows is read regardless of how deep the cursor is.
+        """
+        self._check_cursor_ordering()
+        paginator = self.cursor_pagination_class()
+        seek_filters, seek_params, ordering = paginator.get_seek(request, 'books.id')
+        query = self._get_query(filters + seek_filters, user_id, ordering)
+        with connection.cursor() as cursor:
+            # Fetch one extra row to know whether another page follows
+            cursor.execute(f"{query} LIMIT %s",
+                           [user_id] + params + seek_params + [paginator.page_size + 1])
+            books = paginator.paginate_rows(cursor.fetchall())
+        return paginator.get_paginated_response(self._get_serializer_class().serialize_rows(books))
 
     def _get_serializer_class(self):
         if self.request.user.is_authenticated:
-            return BookRatingSerializer
-        return BookSerializer
+            return BookListRatingSerializer
+        return BookListSerializer
 
 
-class GenreBasedBookSuggestionAPIView(APIView):
+class BookExportAPIView(BookListAPIView):
     """
-    API view to suggest books based on user's most reviewed genres.
+    API view to stream the whole (optionally filtered) book list as
+    NDJSON or CSV, chosen with ``?format=`` or the Accept header.
     """
-    permission_classes = [IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    chunk_size = 2000  # Rows fetched from the server-side cursor per chunk
 
     def get(self, request):
         """
-        Handle GET request to suggest books based on genre.
+        Handle GET request to export the book list with the user's rating.
         """
-        user_id = request.user.id
-        favorite_genres = self._get_favorite_genres(user_id)
+        user_id = request.user.id if request.user.is_authenticated else None
+        filters, params = self._get_filters_and_params(user_id)
+        ordering, ordering_params = self._get_ordering()
+        query = self._get_query(filters, user_id, ordering)
+        columns = list(self._get_serializer_class().columns)
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            self._stream_rows(query, [user_id] + params + ordering_params, columns, renderer),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        response['Content-Disposition'] = f'attachment; filename="books.{renderer.format}"'
+        return response
+
+    def _stream_rows(self, query, params, columns, renderer):
+        """
+        Yield the encoded rows chunk by chunk from a server-side (named)
+        cursor, so memory stays constant regardless of catalog size. The
+        cursor is read in a transaction: in autocommit mode Django declares
+        it ``WITH HOLD``, and Postgres would materialize the whole result
+        before the first row is sent.
+        """
+        yield renderer.encode_header(columns)
+        with transaction.atomic(), connection.chunked_cursor() as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                yield renderer.encode_rows(columns, [row[:len(columns)] for row in rows])
 
-        if favorite_genres:
-            suggested_books = self._get_books_by_genres(
-                favorite_genres, user_id)
-            serializer = BookSerializer(suggested_books, many=True)
-            return Response(serializer.data)
 
-        return Response({"message": "No suggestions available"}, status=status.HTTP_200_OK)
+class BookSuggestionAPIView(APIView):
+    """
+    Base for the suggestion views. Each strategy ranks at most
+    ``LIBRARY_SUGGESTION_TOP_K`` books in SQL; the cached list is served a
+    page at a time with ``cursor`` and ``limit`` query parameters.
 
-    def _get_favorite_genres(self, user_id):
-        """
-        Get the user's most reviewed genres ordered by the count.
+    Users without suggestions yet (no reviews, or none rated highly) get
+    the stored ``fallback_ranking`` instead, minus the books they reviewed.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = RankedListCursorPagination
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+    serializer_class = BookSerializer
+    empty_message = "No suggestions available"
+    fallback_ranking = None
+
+    def get_suggestions_response(self, rows, request):
+        if not rows:
+            return Response({"message": self.empty_message}, status=status.HTTP_200_OK)
+        paginator = self.pagination_class()
+        page = paginator.paginate_list(rows, request)
+        return paginator.get_paginated_response(self.serializer_class.serialize_rows(page))
+
+    def _get_fallback_books(self, user_id):
         """
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT genre
-                FROM books
-                JOIN reviews ON books.id = reviews.book_id
-                WHERE reviews.user_id = %s AND reviews.rating >= 4
-                GROUP BY genre
-                ORDER BY COUNT(*) DESC
-            """, [user_id])
-            return [row[0] for row in cursor.fetchall()]
-
-    def _get_books_by_genres(self, genres, user_id):
+        Get the fallback ranking's books the user has not reviewed, read in
+        order from book_rankings without aggregating reviews.
         """
-        Get books from the user's favorite genres, excluding books already reviewed by the user.
+        if self.fallback_ranking is None:
+            return []
+        return get_ranked_books_for_user(self.fallback_ranking, user_id, settings.LIBRARY_SUGGESTION_TOP_K)
+
+
+class GenreBasedBookSuggestionAPIView(BookSuggestionAPIView):
+    """
+    API view to suggest books based on user's most reviewed genres.
+    """
+    fallback_ranking = BookRanking.RANKING_TOP_RATED
+    conditional_scopes = ('rankings',)  # The fallback changes with each refresh
+
+    @conditional_get
+    def get(self, request):
         """
-        placeholders = ', '.join(['%s'] * len(genres))
-        query = f"""
-            SELECT id, title, author, genre
-            FROM books
-            WHERE genre IN ({placeholders}) AND id NOT IN (
-                SELECT book_id FROM reviews WHERE user_id = %s
-            )
-            ORDER BY CASE genre
+        Handle GET request to suggest books based on genre.
         """
-        for idx, genre in enumerate(genres):
-            query += f" WHEN %s THEN {idx}"
-        query += " END"
-
-        params = genres + [user_id] + genres
+        user_id = request.user.id
+        suggested_books = get_cached_suggestions(
+            user_id, 'genre', partial(self._get_books_by_genres, user_id)) or self._get_fallback_books(user_id)
+        return self.get_suggestions_response(suggested_books, request)
 
-        with connection.cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchall()
+    def _get_books_by_genres(self, user_id):
+        """
+        Get books from the user's favorite genres, excluding books already reviewed by the user.
+        """
+        return get_books_by_affinity(
+            user_id, UserAffinity.DIMENSION_GENRE, settings.LIBRARY_SUGGESTION_TOP_K)
 
 
-class AuthorBasedBookSuggestionAPIView(APIView):
+class AuthorBasedBookSuggestionAPIView(BookSuggestionAPIView):
     """
     API view to suggest books based on user's most reviewed authors.
     """
-    permission_classes = [IsAuthenticated]
+    fallback_ranking = BookRanking.RANKING_TOP_RATED
+    conditional_scopes = ('rankings',)  # The fallback changes with each refresh
 
+    @conditional_get
     def get(self, request):
         """
         Handle GET request to suggest books based on author.
         """
         user_id = request.user.id
-        favorite_authors = self._get_favorite_authors(user_id)
+        suggested_books = get_cached_suggestions(
+            user_id, 'author', partial(self._get_books_by_authors, user_id)) or self._get_fallback_books(user_id)
+        return self.get_suggestions_response(suggested_books, request)
+
+    def _get_books_by_authors(self, user_id):
+        """
+        Get books from the user's favorite authors, excluding books already reviewed by the user.
+        """
+        return get_books_by_affinity(
+            user_id, UserAffinity.DIMENSION_AUTHOR, settings.LIBRARY_SUGGESTION_TOP_K)
 
-        if favorite_authors:
-            suggested_books = self._get_books_by_authors(
-                favorite_authors, user_id)
-            serializer = BookSerializer(suggested_books, many=True)
-            return Response(serializer.data)
 
-        return Response({"message": "No suggestions available"}, status=status.HTTP_200_OK)
+class RelatedUsersBookSuggestionAPIView(BookSuggestionAPIView):
+    """
+    API view to suggest books based on related users' ratings.
+    """
+    available_modes = ['live', 'neighbors', 'precomputed']  # ``mode`` query parameter values
+    conditional_scopes = ('builds',)  # ``neighbors`` and ``precomputed`` change with each build
 
-    def _get_favorite_authors(self, user_id):
+    @conditional_get
+    def get(self, request):
         """
-        Get the user's most reviewed authors ordered by the count.
+        Handle GET request to suggest books based on related users' ratings.
+        ``mode=neighbors`` reads from the precomputed co-rating graph and
+        ``mode=precomputed`` from the nightly matrix build, instead of
+        aggregating related users' reviews live.
         """
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT author
-                FROM books
-                JOIN reviews ON books.id = reviews.book_id
-                WHERE reviews.user_id = %s AND reviews.rating >= 4
-                GROUP BY author
-                ORDER BY COUNT(*) DESC
-            """, [user_id])
-            return [row[0] for row in cursor.fetchall()]
-
-    def _get_books_by_authors(self, authors, user_id):
+        user_id = request.user.id
+        mode = request.GET.get('mode', 'live')
+        if mode not in self.available_modes:
+            return Response({"error": f"mode must be one of {', '.join(self.available_modes)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if mode == 'neighbors':
+            compute = self._get_neighbor_books
+        elif mode == 'precomputed':
+            compute = self._get_precomputed_books
+        else:
+            compute = self._get_related_users_books
+        related_users_books = get_cached_suggestions(
+            user_id, f'related:{mode}', partial(compute, user_id), self.conditional_scopes)
+        return self.get_suggestions_response(related_users_books, request)
+
+    def _get_neighbor_books(self, user_id):
         """
-        Get books from the user's favorite authors, excluding books already reviewed by the user.
+        Get books co-rated highly with the user's highly rated books from the book_neighbors graph.
         """
-        placeholders = ', '.join(['%s'] * len(authors))
-        query = f"""
-            SELECT id, title, author, genre
-            FROM books
-            WHERE author IN ({placeholders}) AND id NOT IN (
-                SELECT book_id FROM reviews WHERE user_id = %s
-            )
-            ORDER BY CASE author
+        return get_neighbor_books(user_id, settings.LIBRARY_SUGGESTION_TOP_K)
+
+    def _get_precomputed_books(self, user_id):
         """
-        for idx, author in enumerate(authors):
-            query += f" WHEN %s THEN {idx}"
-        query += " END"
+        Get the user's suggestions from the precomputed build, dropping books
+        reviewed since. Users who are not in the build use the live query.
+        """
+        ranked = get_precomputed_related_books(user_id)
+        if ranked is None:
+            return self._get_related_users_books(user_id)
+        return get_books_in_order(
+            [book_id for book_id, _ in ranked[:settings.LIBRARY_SUGGESTION_TOP_K]], user_id)
 
-        params = authors + [user_id] + authors
+    def _get_related_users_books(self, user_id):
+        """
+        Get books rated highly by users related to the current user, ordered by the count of related users who rated each book.
+        """
+        return get_related_users_books(user_id, settings.LIBRARY_SUGGESTION_TOP_K)
 
-        with connection.cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchall()
+
+class BookRankingAPIView(BookSuggestionAPIView):
+    """
+    Base for the views serving a stored ranking (see ``library.rankings``),
+    recomputed on a schedule by ``refresh_book_rankings`` instead of
+    aggregated per request. Open to anonymous users.
+    """
+    permission_classes = [AllowAny]
+    serializer_class = RankedBookSerializer
+    empty_message = "No ranking available"
+    conditional_scopes = ('rankings',)
+    ranking = None
+    genre_query_param = None  # Selects a per-genre ranking when set
+
+    @conditional_get
+    def get(self, request):
+        genre = request.GET.get(self.genre_query_param, '') if self.genre_query_param else ''
+        return self.get_suggestions_response(get_ranked_books(self.ranking, genre), request)
 
 
-class RelatedUsersBookSuggestionAPIView(APIView):
+class TopRatedBooksAPIView(BookRankingAPIView):
     """
-    API view to suggest books based on related users' ratings.
+    API view to list books by Bayesian average rating, overall or within
+    the ``genre`` query parameter's genre.
+    """
+    ranking = BookRanking.RANKING_TOP_RATED
+    genre_query_param = 'genre'
+
+
+class TrendingBooksAPIView(BookRankingAPIView):
+    """
+    API view to list books by time-decayed review velocity.
+    """
+    ranking = BookRanking.RANKING_TRENDING
+
+
+class SuggestionsAPIView(APIView):
+    """
+    API view to return the genre, author and related-users suggestions
+    together, computed by one statement that reads the user's reviews once.
+
+    Query parameters: ``strategies`` (comma separated, default all),
+    ``limit`` per strategy and ``limits`` overrides such as
+    ``genre:5,related:20``, ``page``, and ``blend=true`` to merge the
+    strategies into one ranked list weighted by ``weights`` such as
+    ``genre:1,author:0.5,related:2``. As in the single-strategy views, each
+    strategy ranks at most ``LIBRARY_SUGGESTION_TOP_K`` books, and pages
+    starting past them are rejected.
     """
     permission_classes = [IsAuthenticated]
+    available_strategies = SUGGESTION_STRATEGIES
 
+    @conditional_get
     def get(self, request):
         """
-        Handle GET request to suggest books based on related users' ratings.
+        Handle GET request to suggest books with every strategy at once.
         """
         user_id = request.user.id
-        related_users_books = self._get_related_users_books(user_id)
-
-        if related_users_books:
-            serializer = BookSerializer(related_users_books, many=True)
-            return Response(serializer.data)
+        try:
+            strategies = self._get_strategies()
+            limit = self._get_limit(request.GET.get('limit'))
+            page = self._get_positive_int(request.GET.get('page'), 'page', 1)
+            blend = request.GET.get('blend', '').lower() in ('1', 'true', 'yes')
+            if blend:
+                weights = self._get_strategy_values('weights', strategies, self._get_weight, 1.0)
+                weights = {strategy: weight for strategy, weight in weights.items() if weight}
+                if not weights:
+                    raise ValueError("At least one strategy needs a positive weight")
+                options = sorted(weights.items())
+                page_size = limit
+            else:
+                limits = self._get_strategy_values('limits', strategies, self._get_limit, limit)
+                options = sorted(limits.items())
+                page_size = min(limits.values())  # The shortest page reaches deepest
+            if (page - 1) * page_size >= settings.LIBRARY_SUGGESTION_TOP_K:
+                raise ValueError(f"page is past the first {settings.LIBRARY_SUGGESTION_TOP_K} suggestions")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        options = ','.join(f'{strategy}={value}' for strategy, value in options)
+        key = f"combined:{'blend' if blend else 'split'}:{options}:{limit}:{page}"
+        if blend:
+            rows = get_cached_suggestions(user_id, key, partial(
+                fetch_all, blended_suggestions_query(
+                    user_id, weights, (page - 1) * limit, limit, settings.LIBRARY_SUGGESTION_TOP_K)))
+            has_more = len(rows) > limit
+            results = [
+                dict(zip(BookSerializer.columns, row), score=row[4], strategies=row[5])
+                for row in rows[:limit]
+            ]
+        else:
+            windows = {strategy: ((page - 1) * limits[strategy], limits[strategy])
+                       for strategy in strategies}
+            rows = get_cached_suggestions(user_id, key, partial(
+                fetch_all, combined_suggestions_query(user_id, windows, settings.LIBRARY_SUGGESTION_TOP_K)))
+            results = {strategy: [] for strategy in strategies}
+            for row in rows:
+                results[row[0]].append(row[1:])
+            has_more = any(len(results[strategy]) > limits[strategy] for strategy in strategies)
+            results = {
+                strategy: BookSerializer.serialize_rows(books[:limits[strategy]])
+                for strategy, books in results.items()
+            }
+
+        url = request.build_absolute_uri()
+        previous_url = None
+        if page == 2:
+            previous_url = remove_query_param(url, 'page')
+        elif page > 2:
+            previous_url = replace_query_param(url, 'page', page - 1)
+        return Response({
+            'next': replace_query_param(url, 'page', page + 1) if has_more else None,
+            'previous': previous_url,
+            'results': results,
+        })
+
+    def _get_strategies(self):
+        value = self.request.GET.get('strategies')
+        if not value:
+            return list(self.available_strategies)
+        strategies = [strategy.strip() for strategy in value.split(',') if strategy.strip()]
+        unknown = [strategy for strategy in strategies if strategy not in self.available_strategies]
+        if unknown or not strategies:
+            raise ValueError(f"strategies must be among {', '.join(self.available_strategies)}")
+        return list(dict.fromkeys(strategies))
+
+    def _get_positive_int(self, value, name, default):
+        if value in (None, ''):
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            number = 0
+        if number < 1:
+            raise ValueError(f"{name} must be a positive integer")
+        return number
+
+    def _get_limit(self, value):
+        """
+        Return the requested number of suggestions, capped server side.
+        """
+        limit = self._get_positive_int(value, 'limit', api_settings.PAGE_SIZE)
+        return min(limit, settings.LIBRARY_SUGGESTION_MAX_LIMIT)
 
-        return Response({"message": "No suggestions available"}, status=status.HTTP_200_OK)
+    def _get_weight(self, value):
+        weight = float(value)
+        if not isfinite(weight):
+            raise ValueError
+        return weight
 
-    def _get_related_users_books(self, user_id):
+    def _get_strategy_values(self, name, strategies, cast, default):
         """
-        Get books rated highly by users related to the current user, ordered by the count of related users who rated each book.
+        Parse a ``strategy:value,...`` parameter into a value per strategy.
         """
-        with connection.cursor() as cursor:
-            # Find books the current user rated 4 or higher
-            cursor.execute("""
-                SELECT book_id
-                FROM reviews
-                WHERE user_id = %s AND rating >= 4
-            """, [user_id])
-            user_high_rated_books = [row[0] for row in cursor.fetchall()]
-
-            if not user_high_rated_books:
-                return []
-
-            placeholders = ', '.join(['%s'] * len(user_high_rated_books))
-
-            # Find other users who rated these books 4 or higher
-            cursor.execute(f"""
-                SELECT DISTINCT user_id
-                FROM reviews
-                WHERE book_id IN ({placeholders}) AND rating >= 4 AND user_id != %s
-            """, user_high_rated_books + [user_id])
-            related_user_ids = [row[0] for row in cursor.fetchall()]
-
-            if not related_user_ids:
-                return []
-
-            placeholders = ', '.join(['%s'] * len(related_user_ids))
-
-            # Find books these related users rated 4 or higher that the current user hasn't rated,
-            # and order by the count of related users who rated each book
-            cursor.execute(f"""
-                SELECT books.id, books.title, books.author, books.genre, COUNT(reviews.user_id) as related_user_count
-                FROM books
-                JOIN reviews ON books.id = reviews.book_id
-                WHERE reviews.user_id IN ({placeholders}) AND reviews.rating >= 4
-                AND books.id NOT IN (
-                    SELECT book_id FROM reviews WHERE user_id = %s
-                )
-                GROUP BY books.id, books.title, books.author, books.genre
-                ORDER BY related_user_count DESC
-            """, related_user_ids + [user_id])
-            return cursor.fetchall()
+        values = dict.fromkeys(strategies, default)
+        for item in filter(None, self.request.GET.get(name, '').split(',')):
+            strategy, _, value = item.partition(':')
+            if strategy.strip() not in values:
+                raise ValueError(f"{name} must use strategies among {', '.join(strategies)}")
+            try:
+                values[strategy.strip()] = cast(value.strip())
+            except ValueError:
+                raise ValueError(f"Invalid {name} value for {strategy.strip()}")
+            if values[strategy.strip()] < 0:
+                raise ValueError(f"{name} must not be negative")
+        return values
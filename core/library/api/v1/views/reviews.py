@@ -2,9 +2,13 @@ from rest_framework.views import APIView
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import connection, IntegrityError
+from django.db import connection, transaction, IntegrityError
 from rest_framework.permissions import IsAuthenticated
-from ..serializers import ReviewAddSerializer, ReviewUpdateSerializer
+from library.ingest import import_reviews, parse_csv, parse_ndjson, upsert_reviews
+from library.review_hooks import on_review_changed
+from ..serializers import (
+    ReviewAddSerializer, ReviewUpdateSerializer, ReviewUpsertListSerializer, ReviewUpsertSerializer,
+)
 
 
 class AddReviewAPIView(GenericAPIView):
@@ -22,12 +26,13 @@ class AddReviewAPIView(GenericAPIView):
             rating = serializer.validated_data['rating']
 
             try:
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     # Insert new review into the database
                     cursor.execute(
                         "INSERT INTO reviews (book_id, user_id, rating) VALUES (%s, %s, %s)",
                         [book_id, user_id, rating]
                     )
+                    on_review_changed(cursor, user_id, book_id, None, rating)
                 return Response({"message": "Review added"}, status=status.HTTP_201_CREATED)
             except IntegrityError as e:
                 # Handle case where review already exists
@@ -50,17 +55,27 @@ class UpdateReviewAPIView(GenericAPIView):
             rating = serializer.validated_data['rating']
             user_id = request.user.id
 
-            with connection.cursor() as cursor:
-                # Update review in the database
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Update review in the database, returning the previous rating
                 cursor.execute(
                     """
+                    WITH old AS (
+                        SELECT id, rating FROM reviews
+                        WHERE id = %s AND user_id = %s
+                        FOR UPDATE
+                    )
                     UPDATE reviews
                     SET rating = %s
-                    WHERE id = %s AND user_id = %s
+                    FROM old
+                    WHERE reviews.id = old.id
+                    RETURNING reviews.book_id, old.rating
                     """,
-                    [rating, review_id, user_id]
+                    [review_id, user_id, rating]
                 )
                 rows_affected = cursor.rowcount
+                if rows_affected:
+                    book_id, old_rating = cursor.fetchone()
+                    on_review_changed(cursor, user_id, book_id, old_rating, rating)
 
             # Check if the review was updated
             if rows_affected == 0:
@@ -71,6 +86,56 @@ class UpdateReviewAPIView(GenericAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class UpsertReviewsAPIView(GenericAPIView):
+    """
+    API view for creating or updating a list of the user's reviews, keyed
+    on the book, in one transaction (see ``upsert_reviews``).
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ReviewUpsertListSerializer
+    statuses = ('created', 'updated', 'unchanged', 'superseded', 'rejected')
+
+    def post(self, request):
+        """
+        Handle POST request with ``{"reviews": [{"book_id", "rating"}, ...]}``.
+        Every item gets a result in request order: invalid items and unknown
+        books are rejected without failing the others, and a later item for
+        the same book supersedes an earlier one.
+        """
+        serializer = ReviewUpsertListSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        latest = {}  # book_id -> index of its last valid item
+        for index, item in enumerate(serializer.validated_data['reviews']):
+            item_serializer = ReviewUpsertSerializer(data=item)
+            if not item_serializer.is_valid():
+                results.append({'status': 'rejected', 'errors': item_serializer.errors})
+                continue
+            book_id = item_serializer.validated_data['book_id']
+            if book_id in latest:
+                results[latest[book_id]]['status'] = 'superseded'
+            latest[book_id] = index
+            results.append({'book_id': book_id, 'rating': item_serializer.validated_data['rating']})
+
+        written = upsert_reviews(
+            request.user.id, {book_id: results[index]['rating'] for book_id, index in latest.items()})
+        for book_id, index in latest.items():
+            exists, old_rating, new_rating = written[book_id]
+            if not exists:
+                results[index].update(status='rejected', errors={'book_id': ["Book does not exist"]})
+            elif new_rating is None:
+                results[index]['status'] = 'unchanged'
+            else:
+                results[index]['status'] = 'created' if old_rating is None else 'updated'
+
+        totals = {name: 0 for name in self.statuses}
+        for result in results:
+            totals[result['status']] += 1
+        return Response({"results": results, "totals": totals}, status=status.HTTP_200_OK)
+
+
 class DeleteReviewAPIView(APIView):
     """
     API view for deleting a review.
@@ -80,19 +145,52 @@ class DeleteReviewAPIView(APIView):
     def delete(self, request, review_id):
         user_id = request.user.id
 
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             # Delete review from the database
             cursor.execute(
                 """
                 DELETE FROM reviews
                 WHERE id = %s AND user_id = %s
+                RETURNING book_id, rating
                 """,
                 [review_id, user_id]
             )
             rows_affected = cursor.rowcount
+            if rows_affected:
+                book_id, old_rating = cursor.fetchone()
+                on_review_changed(cursor, user_id, book_id, old_rating, None)
 
         # Check if the review was deleted
         if rows_affected == 0:
             return Response({"error": "Review not found or not owned by user"}, status=status.HTTP_404_NOT_FOUND)
 
         return Response({"message": "Review deleted"}, status=status.HTTP_200_OK)
+
+
+class BulkReviewAPIView(APIView):
+    """
+    API view for importing many of the user's reviews in one request.
+    The body is streamed as NDJSON (``application/x-ndjson``) or CSV
+    (``text/csv``) rows with ``book_id`` and ``rating`` and imported in
+    batches, each upserted in a single transaction.
+    """
+    permission_classes = [IsAuthenticated]
+    input_formats = {
+        'application/x-ndjson': parse_ndjson,
+        'text/csv': parse_csv,
+    }
+
+    def post(self, request):
+        content_type = request.content_type.split(';')[0].strip()
+        parse = self.input_formats.get(content_type)
+        if parse is None:
+            return Response({"error": f"Content type must be one of {', '.join(self.input_formats)}"},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        records = parse(request.stream or [], user_id=request.user.id)
+        batches = list(import_reviews(records))
+        totals = {
+            key: sum(batch[key] for batch in batches)
+            for key in ('inserted', 'updated', 'unchanged', 'rejected')
+        }
+        return Response({"batches": batches, "totals": totals}, status=status.HTTP_200_OK)
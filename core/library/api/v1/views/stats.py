@@ -0,0 +1,27 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.permissions import IsAdminUser
+from django.db import connections
+
+
+class DatabasePoolStatsAPIView(APIView):
+    """
+    API view to report the connection pool counters of the serving process.
+    """
+    authentication_classes = [JWTAuthentication, TokenAuthentication]  # is_staff comes from the user row
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Handle GET request to return the pool stats per database alias.
+        Aliases without a pool are omitted.
+        """
+        stats = {}
+        for alias in connections:
+            get_pool_stats = getattr(connections[alias], 'get_pool_stats', None)
+            pool_stats = get_pool_stats() if get_pool_stats else None
+            if pool_stats is not None:
+                stats[alias] = pool_stats
+        return Response(stats)
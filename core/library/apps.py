@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LibraryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'library'
+
+    def ready(self):
+        from library.suggestion_cache import check_shared_cache
+        check_shared_cache()
@@ -0,0 +1,139 @@
+"""
+PostgreSQL backend with a psycopg_pool connection pool.
+
+Django 4.2 opens a new connection per request (``CONN_MAX_AGE = 0``) or
+keeps one per thread. With ``OPTIONS['pool']`` set, connections are taken
+from a per-process ``psycopg_pool.ConnectionPool`` instead and handed back
+when Django closes them at the end of the request. The dict is passed to
+``ConnectionPool`` (``min_size``, ``max_size``, ``timeout``,
+``max_lifetime``, ``max_idle``, ``max_waiting``); ``CONN_HEALTH_CHECKS``
+checks each connection before it is handed out.
+
+Under exhaustion a request waits up to ``timeout`` seconds for a connection
+to be returned, then fails with ``OperationalError`` (a 500). When
+``max_waiting`` clients are already queued, further requests fail
+immediately instead of queueing.
+
+Pools are keyed by alias and connection parameters, so a settings change
+(such as the test runner switching to the test database) gets a new pool.
+They are closed before a test database is dropped and at process exit.
+"""
+import atexit
+from threading import Lock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError as e:
+    raise ImproperlyConfigured(f"Error loading psycopg_pool module: {e}")
+from .creation import DatabaseCreation
+
+
+def close_pools(alias=None):
+    """
+    Close the pools of ``alias``, or every pool. Connections still checked
+    out are closed when they are returned.
+    """
+    with DatabaseWrapper._pools_lock:
+        keys = [key for key in DatabaseWrapper._connection_pools if alias is None or key[0] == alias]
+        pools = [DatabaseWrapper._connection_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pools)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    # Pools shared by the connections of every thread, keyed by alias and
+    # connection parameters
+    _connection_pools = {}
+    _pools_lock = Lock()
+
+    @property
+    def pool(self):
+        pool_options = self.settings_dict['OPTIONS'].get('pool')
+        if self.alias == NO_DB_ALIAS or not pool_options:
+            return None
+        connect_kwargs = self.get_connection_params()
+        # Django sets the autocommit mode itself after checkout
+        connect_kwargs['autocommit'] = True
+        key = (self.alias, repr(sorted(connect_kwargs.items())), repr(pool_options))
+        pool = self._connection_pools.get(key)
+        if pool is not None:
+            return pool
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured("Pooled connections need CONN_MAX_AGE = 0.")
+        with self._pools_lock:
+            if key not in self._connection_pools:
+                # The alias's connection parameters changed: the old pools
+                # point at a database that is no longer used
+                stale = [other for other in self._connection_pools if other[0] == self.alias]
+                for other in stale:
+                    self._connection_pools.pop(other).close()
+                self._connection_pools[key] = ConnectionPool(
+                    kwargs=connect_kwargs,
+                    name=self.alias,
+                    # Opened on first use, not at import or startup
+                    open=False,
+                    check=ConnectionPool.check_connection if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+                    **({} if pool_options is True else pool_options),
+                )
+            return self._connection_pools[key]
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        # Same isolation level handling as the parent, around a checkout
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = base.IsolationLevel(options['isolation_level'])
+        except KeyError:
+            self.isolation_level = base.IsolationLevel.READ_COMMITTED
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {options['isolation_level']} specified.")
+        pool.open()
+        connection = pool.getconn()
+        if 'isolation_level' in options:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is not None and self.pool is not None:
+            with self.wrap_database_errors:
+                self.connection._pool.putconn(self.connection)
+                self.connection = None
+        else:
+            return super()._close()
+
+    def get_pool_stats(self):
+        """
+        Return the pool's counters, or None when pooling is off. Includes
+        ``requests_waiting`` (clients queued right now) and the mean
+        ``checkout_wait_ms`` over all checkouts so far.
+        """
+        if self.pool is None:
+            return None
+        stats = self.pool.get_stats()
+        requests = stats.get('requests_num', 0)
+        stats['checkout_wait_ms'] = round(stats.get('requests_wait_ms', 0) / requests, 3) if requests else 0
+        return stats
+
+    def close_pool(self):
+        """
+        Close every pool of this alias, e.g. before its database is dropped.
+        """
+        close_pools(self.alias)
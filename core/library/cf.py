@@ -0,0 +1,144 @@
+"""
+Batch collaborative-filtering engine for related-user suggestions.
+
+Reviews are loaded into sparse user x book matrices and every user's
+suggestions are scored with sparse matrix products, using the same
+semantics as ``RelatedUsersBookSuggestionAPIView._get_related_users_books``:
+a book's score is the number of related users (users who rated 4 or higher
+any book the user rated 4 or higher) who rated it 4 or higher, and books the
+user already reviewed are excluded. The top-N results per user are saved to
+an ``.npz`` file that the endpoint serves from.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from library.affinity import HIGH_RATING
+from library.suggestion_cache import bump_suggestion_builds_version
+
+FETCH_SIZE = 100000
+
+_loaded = {'mtime': None, 'data': None}
+
+
+def load_reviews():
+    """
+    Return ``(user_ids, book_ids, ratings)`` arrays for every review.
+    """
+    import numpy as np
+
+    user_ids, book_ids, ratings = [], [], []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT user_id, book_id, rating FROM reviews")
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            chunk = np.array(rows, dtype=np.int64).reshape(-1, 3)
+            user_ids.append(chunk[:, 0])
+            book_ids.append(chunk[:, 1])
+            ratings.append(chunk[:, 2])
+    if not user_ids:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(user_ids), np.concatenate(book_ids), np.concatenate(ratings)
+
+
+def compute_related_users_suggestions(user_ids, book_ids, ratings, top_n, batch_size=1024):
+    """
+    Score suggestions for every reviewing user and return them in CSR form as
+    ``(users, indptr, books, scores)``: the suggestions of ``users[i]`` are
+    ``books[indptr[i]:indptr[i + 1]]``, best first, ties broken by book id.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    users, user_idx = np.unique(user_ids, return_inverse=True)
+    books, book_idx = np.unique(book_ids, return_inverse=True)
+    shape = (len(users), len(books))
+
+    reviewed = sparse.csr_matrix(
+        (np.ones(len(user_idx), dtype=np.int32), (user_idx, book_idx)), shape=shape)
+    high = ratings >= HIGH_RATING
+    high_rated = sparse.csr_matrix(
+        (np.ones(high.sum(), dtype=np.int32), (user_idx[high], book_idx[high])), shape=shape)
+    high_rated_t = high_rated.T.tocsr()
+
+    indptr = [0]
+    result_books, result_scores = [], []
+    for start in range(0, len(users), batch_size):
+        stop = min(start + batch_size, len(users))
+        # Users sharing at least one highly rated book, minus the user themselves
+        related = (high_rated[start:stop] @ high_rated_t).tocoo()
+        keep = related.col != related.row + start
+        related = sparse.csr_matrix(
+            (np.ones(keep.sum(), dtype=np.int32), (related.row[keep], related.col[keep])),
+            shape=(stop - start, len(users)))
+
+        scores = (related @ high_rated).tocsr()
+        scores = (scores - scores.multiply(reviewed[start:stop])).tocsr()
+        scores.eliminate_zeros()
+
+        for row in range(stop - start):
+            cols = scores.indices[scores.indptr[row]:scores.indptr[row + 1]]
+            data = scores.data[scores.indptr[row]:scores.indptr[row + 1]]
+            order = np.lexsort((books[cols], -data))[:top_n]
+            result_books.append(books[cols[order]])
+            result_scores.append(data[order])
+            indptr.append(indptr[-1] + len(order))
+
+    return (
+        users,
+        np.array(indptr, dtype=np.int64),
+        np.concatenate(result_books) if result_books else np.empty(0, dtype=np.int64),
+        np.concatenate(result_scores).astype(np.int32) if result_scores else np.empty(0, dtype=np.int32),
+    )
+
+
+def build_related_users_suggestions(path=None, top_n=None, batch_size=1024):
+    """
+    Rebuild the precomputed suggestions file from ``reviews`` and return the
+    number of users it covers. The file is replaced atomically, then the
+    suggestion builds version is incremented.
+    """
+    import numpy as np
+
+    path = path or settings.LIBRARY_CF_PATH
+    top_n = top_n or settings.LIBRARY_CF_TOP_N
+    users, indptr, books, scores = compute_related_users_suggestions(
+        *load_reviews(), top_n=top_n, batch_size=batch_size)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, suffix='.npz', delete=False) as tmp:
+        np.savez(tmp, users=users, indptr=indptr, books=books, scores=scores)
+    os.replace(tmp.name, path)
+    with connection.cursor() as cursor:
+        bump_suggestion_builds_version(cursor)
+    return len(users)
+
+
+def get_precomputed_related_books(user_id, path=None):
+    """
+    Return the user's precomputed ``[(book_id, score), ...]``, or None when
+    there is no build or the user had no reviews when it was made.
+    """
+    path = path or settings.LIBRARY_CF_PATH
+    try:
+        import numpy as np
+        mtime = os.path.getmtime(path)
+    except (ImportError, OSError):
+        return None
+
+    if _loaded['mtime'] != mtime:
+        with np.load(path) as archive:
+            _loaded['data'] = {key: archive[key] for key in archive.files}
+        _loaded['mtime'] = mtime
+    data = _loaded['data']
+
+    position = np.searchsorted(data['users'], user_id)
+    if position >= len(data['users']) or data['users'][position] != user_id:
+        return None
+    start, stop = data['indptr'][position], data['indptr'][position + 1]
+    return list(zip(data['books'][start:stop].tolist(), data['scores'][start:stop].tolist()))
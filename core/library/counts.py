@@ -0,0 +1,68 @@
+import json
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from library.suggestion_cache import get_versions
+
+BOOK_COUNT_KEY_PREFIX = 'library:book_count'
+
+
+def book_count_key(filter_values):
+    """
+    Build the cache key holding the exact count for a set of filter values,
+    under the catalog version, so ``bump_catalog_version`` orphans the
+    counts of every filter at once.
+    """
+    catalog_version = get_versions(None)[0]
+    return f"{BOOK_COUNT_KEY_PREFIX}:{catalog_version}:{urlencode(sorted(filter_values.items()))}"
+
+
+def get_book_count(filters, params, filter_values):
+    """
+    Return ``(count, exact)`` for the books matching ``filters``.
+
+    Exact counts are served from the cache when present. Otherwise the
+    planner's estimate is used as-is above ``LIBRARY_COUNT_EXACT_THRESHOLD``
+    and a real ``COUNT(*)`` is only run (and cached) below it. Counts for
+    ``filter_values=None`` (filters that depend on the user) are not cached.
+    """
+    key = book_count_key(filter_values) if filter_values is not None else None
+    count = cache.get(key) if key else None
+    if count is not None:
+        return count, True
+
+    estimate = estimate_book_count(filters, params)
+    if estimate is not None and estimate > settings.LIBRARY_COUNT_EXACT_THRESHOLD:
+        return estimate, False
+
+    where = f" WHERE {' AND '.join(filters)}" if filters else ""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM books{where}", params)
+        count = cursor.fetchone()[0]
+    if key:
+        cache.set(key, count, settings.LIBRARY_COUNT_CACHE_TIMEOUT)
+    return count, True
+
+
+def estimate_book_count(filters, params):
+    """
+    Return Postgres' row estimate for the books matching ``filters``, or
+    None if the table has not been analyzed yet.
+    """
+    with connection.cursor() as cursor:
+        if not filters:
+            # pg_class.reltuples is -1 until the first VACUUM/ANALYZE
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = 'books'::regclass")
+            estimate = cursor.fetchone()[0]
+            return estimate if estimate >= 0 else None
+        cursor.execute(
+            f"EXPLAIN (FORMAT JSON) SELECT 1 FROM books WHERE {' AND '.join(filters)}",
+            params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
@@ -0,0 +1,248 @@
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from library.review_hooks import on_reviews_changed
+
+MAX_ERRORS_PER_BATCH = 100
+
+
+def _decode(lines):
+    for line in lines:
+        yield line.decode('utf-8') if isinstance(line, bytes) else line
+
+
+def parse_ndjson(lines, user_id=None):
+    """
+    Yield ``(line_number, record)`` from NDJSON lines, each an object with
+    ``book_id`` and ``rating`` (and ``user_id`` unless ``user_id`` is given).
+    Unparsable lines yield an error string instead of a record.
+    """
+    for line_number, line in enumerate(_decode(lines), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, "Invalid JSON"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, "Expected a JSON object"
+            continue
+        if user_id is not None:
+            record['user_id'] = user_id
+        yield line_number, record
+
+
+def parse_csv(lines, user_id=None):
+    """
+    Yield ``(line_number, record)`` from CSV lines with a header row naming
+    ``book_id`` and ``rating`` (and ``user_id`` unless ``user_id`` is given).
+    """
+    reader = csv.DictReader(_decode(lines))
+    for record in reader:
+        if user_id is not None:
+            record['user_id'] = user_id
+        yield reader.line_num, record
+
+
+def clean_record(record):
+    """
+    Return ``(user_id, book_id, rating)`` for a parsed record, or raise
+    ValueError with the reason it is rejected.
+    """
+    try:
+        user_id, book_id, rating = (
+            int(record[key]) for key in ('user_id', 'book_id', 'rating'))
+    except KeyError as e:
+        raise ValueError(f"Missing {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("user_id, book_id and rating must be integers")
+    if rating < 1 or rating > 5:
+        raise ValueError("Rating must be between 1 and 5")
+    return user_id, book_id, rating
+
+
+def _existing_ids(cursor, table, ids):
+    table = connection.ops.quote_name(table)
+    cursor.execute(f"SELECT id FROM {table} WHERE id = ANY(%s)", [list(ids)])
+    return {row[0] for row in cursor.fetchall()}
+
+
+MERGE_REVIEWS_SQL = """
+    WITH source AS ({source}), old AS (
+        SELECT reviews.user_id, reviews.book_id, reviews.rating
+        FROM reviews
+        JOIN source USING (user_id, book_id)
+        ORDER BY reviews.user_id, reviews.book_id
+        FOR UPDATE OF reviews
+    ), updated AS (
+        UPDATE reviews SET rating = source.rating
+        FROM old
+        JOIN source USING (user_id, book_id)
+        WHERE reviews.user_id = old.user_id AND reviews.book_id = old.book_id
+        AND reviews.rating <> source.rating
+        RETURNING reviews.user_id, reviews.book_id, reviews.rating
+    ), inserted AS (
+        INSERT INTO reviews (user_id, book_id, rating)
+        SELECT user_id, book_id, rating
+        FROM source
+        WHERE NOT EXISTS (
+            SELECT 1 FROM old WHERE old.user_id = source.user_id AND old.book_id = source.book_id
+        )
+        ORDER BY user_id, book_id
+        ON CONFLICT (user_id, book_id) DO NOTHING
+        RETURNING user_id, book_id, rating
+    )
+    SELECT source.user_id, source.book_id, old.rating, COALESCE(updated.rating, inserted.rating),
+           old.user_id IS NOT NULL OR inserted.user_id IS NOT NULL
+    FROM source
+    LEFT JOIN old USING (user_id, book_id)
+    LEFT JOIN updated USING (user_id, book_id)
+    LEFT JOIN inserted USING (user_id, book_id)
+"""
+
+
+def merge_reviews(cursor, source, params=()):
+    """
+    Write the ``(user_id, book_id, rating)`` rows selected by the ``source``
+    query, unique per user and book, into ``reviews`` and return
+    ``{(user_id, book_id): (old_rating, new_rating)}``, with a None
+    ``new_rating`` for unchanged ratings. Must run in a transaction.
+
+    Existing reviews are locked with ``FOR UPDATE`` in user and book order
+    before they are read, as ``UpdateReviewAPIView`` does, so a concurrent
+    write waits instead of changing the rating between the read and the
+    update, and the returned old ratings stay exact. A review inserted by
+    another transaction after the statement started is not overwritten: its
+    row is written again by a new statement, which sees and locks it.
+    """
+    results = {}
+    pending = True
+    while pending:
+        pending = False
+        cursor.execute(MERGE_REVIEWS_SQL.format(source=source), params)
+        for user_id, book_id, old, new, written in cursor.fetchall():
+            if not written:
+                pending = True
+            else:
+                # Rows written by an earlier pass now read as unchanged
+                results.setdefault((user_id, book_id), (old, new))
+    return results
+
+
+def import_batch(records):
+    """
+    Validate and upsert a list of ``(line_number, record)`` pairs in a
+    single transaction and return its report.
+
+    Book and user ids are checked with one query each, the batch is loaded
+    with COPY into a temporary table and merged into ``reviews`` with
+    ``merge_reviews``. A later line for the same user and book replaces an
+    earlier one.
+    """
+    report = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'rejected': 0, 'errors': []}
+
+    def reject(line_number, error):
+        report['rejected'] += 1
+        if len(report['errors']) < MAX_ERRORS_PER_BATCH:
+            report['errors'].append({'line': line_number, 'error': error})
+
+    cleaned = []
+    for line_number, record in records:
+        if isinstance(record, str):
+            reject(line_number, record)
+            continue
+        try:
+            cleaned.append((line_number,) + clean_record(record))
+        except ValueError as e:
+            reject(line_number, str(e))
+    if not cleaned:
+        return report
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        books = _existing_ids(cursor, 'books', {row[2] for row in cleaned})
+        users = _existing_ids(cursor, get_user_model()._meta.db_table, {row[1] for row in cleaned})
+        latest = {}
+        for line_number, user_id, book_id, rating in cleaned:
+            if book_id not in books:
+                reject(line_number, "Book does not exist")
+            elif user_id not in users:
+                reject(line_number, "User does not exist")
+            else:
+                latest[(user_id, book_id)] = rating
+        if not latest:
+            return report
+
+        cursor.execute("""
+            CREATE TEMPORARY TABLE review_import (
+                user_id bigint NOT NULL,
+                book_id bigint NOT NULL,
+                rating smallint NOT NULL
+            ) ON COMMIT DROP
+        """)
+        with cursor.copy("COPY review_import (user_id, book_id, rating) FROM STDIN") as copy:
+            for (user_id, book_id), rating in latest.items():
+                copy.write_row((user_id, book_id, rating))
+
+        merged = merge_reviews(cursor, "SELECT user_id, book_id, rating FROM review_import")
+        changes = [(user_id, book_id, old, new)
+                   for (user_id, book_id), (old, new) in merged.items() if new is not None]
+        on_reviews_changed(cursor, changes)
+
+    report['inserted'] = sum(1 for change in changes if change[2] is None)
+    report['updated'] = len(changes) - report['inserted']
+    # Same rating as stored, or superseded by a later line in the batch
+    report['unchanged'] = len(records) - report['rejected'] - len(changes)
+    return report
+
+
+def upsert_reviews(user_id, ratings):
+    """
+    Write the user's ``{book_id: rating}`` reviews and return ``{book_id:
+    (book_exists, old_rating, new_rating)}``, with a None ``new_rating`` for
+    books that do not exist or whose rating is unchanged.
+
+    The books are checked and the reviews written by one ``merge_reviews``
+    statement, so an existing review is updated instead of raising. The
+    derived data is then updated by ``on_reviews_changed``, which runs its
+    own statements.
+    """
+    if not ratings:
+        return {}
+    book_ids, new_ratings = zip(*sorted(ratings.items()))
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Books are key-share locked so none is deleted under the insert
+        merged = merge_reviews(cursor, """
+            SELECT %s::bigint AS user_id, input.book_id, input.rating
+            FROM unnest(%s::bigint[], %s::smallint[]) AS input (book_id, rating)
+            JOIN books ON books.id = input.book_id
+            ORDER BY input.book_id
+            FOR KEY SHARE OF books
+        """, [user_id, list(book_ids), list(new_ratings)])
+        results = {}
+        for book_id in book_ids:
+            old, new = merged.get((user_id, book_id), (None, None))
+            results[book_id] = ((user_id, book_id) in merged, old, new)
+        on_reviews_changed(cursor, [
+            (user_id, book_id, old, new) for book_id, (_, old, new) in results.items() if new is not None])
+    return results
+
+
+def import_reviews(records, batch_size=None):
+    """
+    Import ``(line_number, record)`` pairs in batches, yielding a report per
+    batch so callers can stream progress for inputs of any size.
+    """
+    batch_size = batch_size or settings.LIBRARY_IMPORT_BATCH_SIZE
+    records = iter(records)
+    number = 0
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        number += 1
+        yield dict(batch=number, **import_batch(batch))
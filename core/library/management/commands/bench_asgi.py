@@ -0,0 +1,201 @@
+import asyncio
+import io
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment
+from django.utils.module_loading import import_string
+from library import adb
+from rest_framework_simplejwt.tokens import AccessToken
+
+# Sync endpoints and their async counterparts under /library/api/v1/async/
+ENDPOINTS = [
+    'book/list/',
+    'book/list/?genre={genre}',
+    'suggest-by-genre/',
+    'suggest-by-author/',
+    'suggest-by-related-users/',
+]
+API_PREFIX = '/library/api/v1/'
+
+
+def run_wsgi(path, authorization, requests, concurrency):
+    """
+    Send ``requests`` GETs through Django's WSGI handler from
+    ``concurrency`` threads, as a threaded WSGI server would.
+    """
+    handler = WSGIHandler()
+    url_path, _, query_string = path.partition('?')
+
+    def request():
+        statuses = []
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': url_path,
+            'QUERY_STRING': query_string,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_AUTHORIZATION': authorization,
+            'wsgi.input': io.BytesIO(),
+            'wsgi.url_scheme': 'http',
+        }
+        start = time.perf_counter()
+        response = handler(environ, lambda status, headers: statuses.append(status))
+        b''.join(response)
+        response.close()
+        return time.perf_counter() - start, int(statuses[0].split()[0])
+
+    def worker(count):
+        try:
+            return [request() for _ in range(count)]
+        finally:
+            connections.close_all()
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = [result for chunk in executor.map(worker, shares) for result in chunk]
+    return time.perf_counter() - start, results
+
+
+async def run_asgi(path, authorization, requests, concurrency):
+    """
+    Send ``requests`` GETs through Django's ASGI handler with
+    ``concurrency`` requests in flight on one event loop.
+    """
+    handler = ASGIHandler()
+    url_path, _, query_string = path.partition('?')
+
+    async def request():
+        statuses = []
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url_path,
+            'raw_path': url_path.encode(),
+            'query_string': query_string.encode(),
+            'headers': [(b'host', b'testserver'), (b'authorization', authorization.encode())],
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 0),
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        start = time.perf_counter()
+        await handler(scope, receive, send)
+        return time.perf_counter() - start, statuses[0]
+
+    results = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            results.append(await request())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await adb.close_pool()
+    return elapsed, results
+
+
+def summarize(elapsed, results):
+    timings = [timing for timing, _ in results]
+    return {
+        'requests_per_second': round(len(results) / elapsed, 1),
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(statistics.quantiles(timings, n=20, method='inclusive')[18] * 1000, 3),
+        'statuses': sorted({status for _, status in results}),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Compare requests per second of the sync views served through WSGI with
+    the async views served through ASGI, in process, against the current
+    data. WSGI concurrency uses threads (one database connection each);
+    ASGI concurrency uses tasks on a single event loop.
+    """
+    help = "Compare WSGI (sync views) and ASGI (async views) throughput in process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per endpoint, concurrency level and deployment.")
+        parser.add_argument('--concurrency', default='1,8,32',
+                            help="Comma separated numbers of requests in flight.")
+        parser.add_argument('--user-id', type=int,
+                            help="User to authenticate as (defaults to the top reviewer).")
+        parser.add_argument('--output', help="Write the results as JSON to this file (- for stdout).")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError("--requests must be at least 2")
+        concurrency_levels = [int(value) for value in options['concurrency'].split(',')]
+        sync_only = [
+            path for path in settings.MIDDLEWARE
+            if not getattr(import_string(path), 'async_capable', False)
+        ]
+        if sync_only:
+            self.stderr.write(self.style.WARNING(
+                f"Sync-only middleware forces async views onto threads: {', '.join(sync_only)}"))
+
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT user_id FROM reviews GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1
+            """)
+            row = cursor.fetchone()
+            cursor.execute("SELECT genre FROM books GROUP BY genre ORDER BY COUNT(*) DESC LIMIT 1")
+            genre_row = cursor.fetchone()
+        user_id = options['user_id'] or (row[0] if row else None)
+        if user_id is None or genre_row is None:
+            raise CommandError("No books or reviews to benchmark against")
+        authorization = f"Bearer {AccessToken.for_user(get_user_model().objects.get(pk=user_id))}"
+        connections.close_all()
+
+        # Lets the requests through ALLOWED_HOSTS, as the test runner does
+        setup_test_environment()
+        results = []
+        for endpoint in ENDPOINTS:
+            endpoint = endpoint.format(genre=quote(genre_row[0]))
+            for concurrency in concurrency_levels:
+                wsgi = summarize(*run_wsgi(
+                    API_PREFIX + endpoint, authorization, options['requests'], concurrency))
+                asgi = summarize(*asyncio.run(run_asgi(
+                    f"{API_PREFIX}async/{endpoint}", authorization, options['requests'], concurrency)))
+                results.append({'endpoint': endpoint, 'concurrency': concurrency,
+                                'wsgi': wsgi, 'asgi': asgi})
+                self.stdout.write(
+                    f"{endpoint:<32} c={concurrency:<4} "
+                    f"wsgi {wsgi['requests_per_second']:8.1f} req/s p50 {wsgi['p50_ms']:8.2f} ms  "
+                    f"asgi {asgi['requests_per_second']:8.1f} req/s p50 {asgi['p50_ms']:8.2f} ms  "
+                    f"status {wsgi['statuses']}/{asgi['statuses']}")
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
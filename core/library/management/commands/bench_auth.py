@@ -0,0 +1,103 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment
+from django.urls import reverse
+from account.authentication import evict_tokens
+from library.api.v1.authentication import user_active_key
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .bench_library import QueryStats, percentile
+
+# (name, credentials, settings) for each authentication mode measured
+MODES = [
+    ('jwt database', 'jwt', dict(LIBRARY_AUTH_STATELESS=False)),
+    ('jwt stateless', 'jwt', dict(LIBRARY_AUTH_STATELESS=True, LIBRARY_AUTH_CHECK_ACTIVE=False)),
+    ('jwt stateless, is_active uncached', 'jwt', dict(
+        LIBRARY_AUTH_STATELESS=True, LIBRARY_AUTH_CHECK_ACTIVE=True, LIBRARY_AUTH_ACTIVE_CACHE_TIMEOUT=0)),
+    ('jwt stateless, is_active cached', 'jwt', dict(
+        LIBRARY_AUTH_STATELESS=True, LIBRARY_AUTH_CHECK_ACTIVE=True, LIBRARY_AUTH_ACTIVE_CACHE_TIMEOUT=60)),
+    ('token', 'token', dict(LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT=0)),
+    ('token cached', 'token', dict(LIBRARY_AUTH_TOKEN_CACHE_TIMEOUT=300)),
+]
+
+
+class Command(BaseCommand):
+    """
+    Measure what authentication costs per request in each mode, on a
+    conditional ``library:suggestions`` GET answered ``304 Not Modified``:
+    its ETag only reads cached versions, so the view runs no query of its
+    own and every statement counted is the authentication's. Creates a DRF
+    token for the user when they have none.
+    """
+    help = "Benchmark the per-request cost of each authentication mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per mode.")
+        parser.add_argument('--username', help="User to authenticate as (default: the first active user).")
+        parser.add_argument('--output', help="Write the results as JSON to this file (- for stdout).")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError("--requests must be at least 2")
+        users = get_user_model().objects.filter(is_active=True).order_by('pk')
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.first()
+        if user is None:
+            raise CommandError("No active user to authenticate as")
+        credentials = {
+            'jwt': f"Bearer {AccessToken.for_user(user)}",
+            'token': f"Token {Token.objects.get_or_create(user=user)[0].key}",
+        }
+
+        # Lets the test client through ALLOWED_HOSTS, as the test runner does
+        setup_test_environment()
+        results = []
+        for name, auth, mode_settings in MODES:
+            with override_settings(**mode_settings):
+                cache.delete(user_active_key(user.pk))
+                evict_tokens([credentials['token'].split()[1]])
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=credentials[auth])
+                path = reverse('library:suggestions')
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f"{name}: GET {path} returned {response.status_code}")
+                etag = response['ETag']
+
+                timings, stats, statuses = [], QueryStats(), set()
+                for _ in range(options['requests']):
+                    with connection.execute_wrapper(stats):
+                        start = time.perf_counter()
+                        response = client.get(path, HTTP_IF_NONE_MATCH=etag)
+                        timings.append(time.perf_counter() - start)
+                    statuses.add(response.status_code)
+            if statuses != {304}:
+                raise CommandError(f"{name}: conditional GET {path} returned {sorted(statuses)}")
+
+            quantiles = statistics.quantiles(timings, n=100, method='inclusive')
+            result = {
+                'mode': name,
+                'p50_ms': percentile(quantiles, 50),
+                'p95_ms': percentile(quantiles, 95),
+                'queries_per_request': stats.queries / len(timings),
+                'statuses': sorted(statuses),
+            }
+            results.append(result)
+            self.stdout.write(
+                f"{name:<36} p50 {result['p50_ms']:7.3f} ms  p95 {result['p95_ms']:7.3f} ms  "
+                f"queries {result['queries_per_request']:5.2f}  status {result['statuses']}")
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,308 @@
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from base64 import b64encode
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment
+from django.urls import reverse
+from library.cf import build_related_users_suggestions
+from library.seeding import SEED_USERNAME_PREFIX, flush_library, seed_library
+from library.suggestion_cache import bump_user_versions
+from rest_framework.test import APIClient
+
+# Data sets the endpoints are measured against, smallest first
+SCALES = {
+    'small': dict(users=100, books=1000, genres=10, authors=200, reviews_per_user=20),
+    'medium': dict(users=1000, books=10000, genres=30, authors=2000, reviews_per_user=50),
+    'large': dict(users=10000, books=100000, genres=50, authors=20000, reviews_per_user=100),
+}
+
+
+class QueryStats:
+    """
+    ``connection.execute_wrapper`` hook counting statements and the rows
+    they returned or affected.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.queries += 1
+        # Named (server-side) cursors report -1 until rows are fetched
+        self.rows += max(context['cursor'].rowcount, 0)
+        return result
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1] * 1000, 3)
+
+
+def isolated_caches():
+    """
+    Settings giving every cache a key prefix of its own, so the entries
+    written for the seeded data (book counts, suggestions, versions) never
+    mix with the served ones.
+    """
+    prefix = f"bench-{uuid4().hex}"
+    return override_settings(CACHES={
+        alias: {**config, 'KEY_PREFIX': f"{prefix}{config.get('KEY_PREFIX', '')}"}
+        for alias, config in settings.CACHES.items()
+    })
+
+
+class Scenarios:
+    """
+    The requests to measure. Each scenario prepares its request outside the
+    timed section and returns ``(method, path, kwargs)`` for the client.
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.added = []
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT MIN(id), MAX(id), COUNT(*) FROM books")
+            self.min_book_id, self.max_book_id, self.book_count = cursor.fetchone()
+            cursor.execute("SELECT genre FROM books GROUP BY genre ORDER BY COUNT(*) DESC LIMIT 1")
+            self.top_genre = cursor.fetchone()[0]
+            cursor.execute("SELECT title FROM books ORDER BY id LIMIT 50")
+            self.titles = [row[0] for row in cursor.fetchall()]
+
+    def all(self):
+        return [
+            ('book list', self.book_list),
+            ('book list ?genre=', self.book_list_genre),
+            ('book list ?q=', self.book_list_search),
+            ('book list ?ordering=-rating_avg', self.book_list_top_rated),
+            ('book list deep ?page=', self.book_list_deep_page),
+            ('book list deep ?cursor=', self.book_list_deep_cursor),
+            ('book export', self.book_export),
+            ('suggest-by-genre', self.path_for('library:suggest-by-genre')),
+            ('suggest-by-author', self.path_for('library:suggest-by-author')),
+            ('suggest-by-related-users', self.path_for('library:suggest-by-related-users')),
+            ('suggest-by-related-users ?mode=neighbors',
+             self.path_for('library:suggest-by-related-users', '?mode=neighbors')),
+            ('suggest-by-related-users ?mode=precomputed',
+             self.path_for('library:suggest-by-related-users', '?mode=precomputed')),
+            ('suggestions', self.path_for('library:suggestions')),
+            ('suggestions ?blend=true', self.path_for('library:suggestions', '?blend=true')),
+            ('top-rated', self.path_for('library:top-rated')),
+            ('top-rated ?genre=', self.top_rated_genre),
+            ('trending', self.path_for('library:trending')),
+            ('review add', self.review_add),
+            ('review update', self.review_update),
+            ('review delete', self.review_delete),
+            ('review bulk', self.review_bulk),
+            ('review upsert', self.review_upsert),
+        ]
+
+    def path_for(self, name, query=''):
+        return lambda user_id: ('get', reverse(name) + query, {})
+
+    def book_list(self, user_id):
+        return 'get', reverse('library:book_list'), {}
+
+    def book_list_genre(self, user_id):
+        return 'get', reverse('library:book_list'), {'data': {'genre': self.top_genre}}
+
+    def book_list_search(self, user_id):
+        return 'get', reverse('library:book_list'), {'data': {'q': self.rng.choice(self.titles)}}
+
+    def book_list_top_rated(self, user_id):
+        return 'get', reverse('library:book_list'), {'data': {'ordering': '-rating_avg'}}
+
+    def book_list_deep_page(self, user_id):
+        page = max(self.book_count // settings.REST_FRAMEWORK['PAGE_SIZE'] // 2, 1)
+        return 'get', reverse('library:book_list'), {'data': {'page': page}}
+
+    def book_list_deep_cursor(self, user_id):
+        position = (self.min_book_id + self.max_book_id) // 2
+        cursor = b64encode(f"p={position}".encode('ascii')).decode('ascii')
+        return 'get', reverse('library:book_list'), {'data': {'cursor': cursor}}
+
+    def top_rated_genre(self, user_id):
+        return 'get', reverse('library:top-rated'), {'data': {'genre': self.top_genre}}
+
+    def book_export(self, user_id):
+        return 'get', reverse('library:book_export'), {'data': {'format': 'ndjson'}}
+
+    def review_add(self, user_id):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT id FROM books
+                WHERE id >= %s AND NOT EXISTS (
+                    SELECT 1 FROM reviews WHERE reviews.book_id = books.id AND user_id = %s
+                )
+                ORDER BY id LIMIT 1
+            """, [self.rng.randint(self.min_book_id, self.max_book_id), user_id])
+            row = cursor.fetchone()
+        if row is None:
+            return self.book_list(user_id)
+        self.added.append((user_id, row[0]))
+        return 'post', reverse('library:add_review'), {
+            'data': {'book_id': row[0], 'rating': self.rng.randint(1, 5)}, 'format': 'json'}
+
+    def review_update(self, user_id):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, rating FROM reviews WHERE user_id = %s ORDER BY id LIMIT 1
+            """, [user_id])
+            review_id, rating = cursor.fetchone()
+        # Alternate across the high rating threshold to exercise every hook
+        return 'put', reverse('library:update_review'), {
+            'data': {'id': review_id, 'rating': 2 if rating >= 4 else 5}, 'format': 'json'}
+
+    def review_delete(self, user_id):
+        # Deletes the reviews created by the add scenario, oldest first
+        if not self.added:
+            return self.book_list(user_id)
+        owner_id, book_id = self.added.pop(0)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT id FROM reviews WHERE user_id = %s AND book_id = %s
+            """, [owner_id, book_id])
+            review_id = cursor.fetchone()[0]
+        return 'delete', reverse('library:delete_review', args=[review_id]), {'user_id': owner_id}
+
+    def review_bulk(self, user_id):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT book_id, rating FROM reviews WHERE user_id = %s ORDER BY book_id LIMIT 20
+            """, [user_id])
+            rows = cursor.fetchall()
+        body = ''.join(
+            json.dumps({'book_id': book_id, 'rating': 6 - rating}) + '\n' for book_id, rating in rows)
+        return 'post', reverse('library:bulk_review'), {
+            'data': body, 'content_type': 'application/x-ndjson'}
+
+    def review_upsert(self, user_id):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT book_id, rating FROM reviews WHERE user_id = %s ORDER BY book_id LIMIT 19
+            """, [user_id])
+            rows = cursor.fetchall()
+        # Flips existing ratings and adds one review, like a client syncing its changes
+        reviews = [{'book_id': book_id, 'rating': 6 - rating} for book_id, rating in rows]
+        reviews.append({'book_id': self.rng.randint(self.min_book_id, self.max_book_id), 'rating': 4})
+        return 'post', reverse('library:upsert_reviews'), {'data': {'reviews': reviews}, 'format': 'json'}
+
+
+class Command(BaseCommand):
+    """
+    Seed a throwaway test database, created and dropped like the test
+    runner's, at several data scales and measure every ``/library/``
+    endpoint through the test client: latency percentiles, statements per
+    request and rows fetched. The configured database and the precomputed
+    suggestions file are never written. The JSON output is meant to be committed or diffed between revisions.
+    """
+    help = "Benchmark the library endpoints against seeded data sets in a test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='small,medium',
+                            help=f"Comma separated data scales among {', '.join(SCALES)}.")
+        parser.add_argument('--requests', type=int, default=50,
+                            help="Requests per endpoint and scale.")
+        parser.add_argument('--only', help="Only run endpoints whose name contains this text.")
+        parser.add_argument('--warm-cache', action='store_true',
+                            help="Keep cached suggestions between requests instead of "
+                                 "measuring a cache miss every time.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed.")
+        parser.add_argument('--output', help="Write the results as JSON to this file (- for stdout).")
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help="Delete a test database left by an earlier run without asking.")
+
+    def handle(self, *args, **options):
+        scales = options['scales'].split(',')
+        unknown = set(scales) - set(SCALES)
+        if unknown:
+            raise CommandError(f"Unknown scales: {', '.join(sorted(unknown))}")
+        if options['requests'] < 2:
+            raise CommandError("--requests must be at least 2")
+
+        # Lets the test client through ALLOWED_HOSTS, as the test runner does
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=options['verbosity'], autoclobber=not options['interactive'], serialize=False)
+        try:
+            # The suggestions built from the seeded data go to a file of their own
+            with isolated_caches(), tempfile.TemporaryDirectory() as directory, \
+                    override_settings(LIBRARY_CF_PATH=os.path.join(directory, 'related_users.npz')):
+                results = self.run_scales(scales, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, options['verbosity'])
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run_scales(self, scales, options):
+        results = {'requests': options['requests'], 'warm_cache': options['warm_cache'], 'scales': []}
+        for scale in scales:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Scale {scale}: {SCALES[scale]}"))
+            flush_library()
+            counts = seed_library(**SCALES[scale], seed=options['seed'])
+            build_related_users_suggestions()
+            results['scales'].append({
+                'scale': scale,
+                'rows': counts,
+                'endpoints': self.run_scale(options),
+            })
+        return results
+
+    def run_scale(self, options):
+        rng = random.Random(options['seed'])
+        User = get_user_model()
+        users = {user.pk: user for user in User.objects.filter(username__startswith=SEED_USERNAME_PREFIX)}
+        user_ids = sorted(users)
+        client = APIClient()
+
+        endpoints = []
+        for name, prepare in Scenarios(rng).all():
+            if options['only'] and options['only'] not in name:
+                continue
+            timings, stats, statuses = [], QueryStats(), set()
+            for _ in range(options['requests']):
+                user_id = rng.choice(user_ids)
+                method, path, kwargs = prepare(user_id)
+                user_id = kwargs.pop('user_id', user_id)
+                client.force_authenticate(users[user_id])
+                if not options['warm_cache']:
+                    bump_user_versions([user_id])
+                with connection.execute_wrapper(stats):
+                    start = time.perf_counter()
+                    response = getattr(client, method)(path, **kwargs)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    timings.append(time.perf_counter() - start)
+                statuses.add(response.status_code)
+
+            quantiles = statistics.quantiles(timings, n=100, method='inclusive')
+            result = {
+                'endpoint': name,
+                'p50_ms': percentile(quantiles, 50),
+                'p95_ms': percentile(quantiles, 95),
+                'p99_ms': percentile(quantiles, 99),
+                'queries_per_request': stats.queries / len(timings),
+                'rows_per_request': stats.rows / len(timings),
+                'statuses': sorted(statuses),
+            }
+            endpoints.append(result)
+            self.stdout.write(
+                f"{name:<45} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+                f"p99 {result['p99_ms']:9.2f} ms  queries {result['queries_per_request']:6.2f}  "
+                f"rows {result['rows_per_request']:10.1f}  status {result['statuses']}")
+        return endpoints
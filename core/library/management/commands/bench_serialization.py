@@ -0,0 +1,124 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from library.api.v1 import renderers
+from library.api.v1.serializers import BookListRatingSerializer, BookListSerializer
+from library.api.v1.views import BookListAPIView
+
+# Titles exercising the escaping rules: quotes, control characters,
+# non-ASCII text and the line separators JSONRenderer escapes.
+AWKWARD_TITLES = [
+    'Plain title',
+    'Quotes "and" \\ backslashes',
+    'Tabs\tand\nnewlines\x01',
+    'Ünïcödé — 漢字 📚',
+    'Line and paragraph separators',
+]
+
+
+def make_rows(count):
+    """
+    Return ``count`` synthetic book list rows ``(id, title, author, genre,
+    rating_count, rating_avg, rating_1, ..., rating_5, rating)``, with a
+    NULL rating for one book in three and no reviews for one in seven.
+    """
+    rows = []
+    for i in range(1, count + 1):
+        histogram = [0] * 5 if i % 7 == 0 else [(i * k) % 13 for k in range(1, 6)]
+        rating_count = sum(histogram)
+        rating_sum = sum(k * n for k, n in enumerate(histogram, 1))
+        rows.append((
+            i, f"{AWKWARD_TITLES[i % len(AWKWARD_TITLES)]} {i}", f"Author {i % 997}", f"Genre {i % 31}",
+            rating_count, rating_sum / rating_count if rating_count else None, *histogram,
+            None if i % 3 == 0 else i % 5 + 1,
+        ))
+    return rows
+
+
+class Command(BaseCommand):
+    """
+    Measure the per-row cost of turning raw SQL rows into a JSON response
+    body: DRF serializers with ``many=True`` and ``JSONRenderer`` against
+    ``serialize_rows`` with ``JSONRenderer`` and with ``ORJSONRenderer``.
+    Fails unless every path produces byte-identical output, and unless the
+    serializers' columns match the book list query's ``cursor.description``.
+    """
+    help = "Compare serialization and rendering paths for large book lists."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Rows per response.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per path.")
+        parser.add_argument('--output', help="Write the results as JSON to this file (- for stdout).")
+
+    def handle(self, *args, **options):
+        self.check_columns()
+        rows = make_rows(options['rows'])
+        paths = [
+            ('drf', lambda cls: cls(rows, many=True).data, JSONRenderer()),
+            ('rows', lambda cls: cls.serialize_rows(rows), JSONRenderer()),
+        ]
+        if renderers.orjson is not None:
+            paths.append(('rows+orjson', lambda cls: cls.serialize_rows(rows), renderers.ORJSONRenderer()))
+        else:
+            self.stderr.write(self.style.WARNING("orjson is not installed; skipping ORJSONRenderer"))
+
+        results = []
+        for serializer_class in (BookListSerializer, BookListRatingSerializer):
+            expected = None
+            for label, serialize, renderer in paths:
+                serialize_times, render_times = [], []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    data = {'count': len(rows), 'next': None, 'previous': None,
+                            'results': serialize(serializer_class)}
+                    serialized = time.perf_counter()
+                    body = renderer.render(data, 'application/json')
+                    serialize_times.append(serialized - start)
+                    render_times.append(time.perf_counter() - serialized)
+                if expected is None:
+                    expected = body
+                elif body != expected:
+                    raise CommandError(f"{serializer_class.__name__} {label}: output differs from drf")
+
+                result = {
+                    'serializer': serializer_class.__name__,
+                    'path': label,
+                    'serialize_us_per_row': round(statistics.median(serialize_times) / len(rows) * 1e6, 3),
+                    'render_us_per_row': round(statistics.median(render_times) / len(rows) * 1e6, 3),
+                    'bytes': len(body),
+                }
+                result['total_ms'] = round(
+                    (result['serialize_us_per_row'] + result['render_us_per_row']) * len(rows) / 1000, 3)
+                results.append(result)
+                self.stdout.write(
+                    f"{result['serializer']:<26} {label:<12} "
+                    f"serialize {result['serialize_us_per_row']:7.3f} us/row  "
+                    f"render {result['render_us_per_row']:7.3f} us/row  "
+                    f"total {result['total_ms']:8.2f} ms")
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        self.stdout.write(self.style.SUCCESS(f"All paths produce identical output for {len(rows)} rows"))
+
+    def check_columns(self):
+        """
+        The fast path maps rows by position, so the serializers' columns
+        must name the book list query's leading columns in order.
+        """
+        query = BookListAPIView()._get_query([], None)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{query} LIMIT 0", [None])
+            names = tuple(column.name for column in cursor.description)
+        for serializer_class in (BookListSerializer, BookListRatingSerializer):
+            if names[:len(serializer_class.columns)] != serializer_class.columns:
+                raise CommandError(
+                    f"{serializer_class.__name__}.columns {serializer_class.columns} "
+                    f"do not match the query columns {names}")
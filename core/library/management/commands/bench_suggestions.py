@@ -0,0 +1,193 @@
+import statistics
+import time
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from library.models import UserAffinity
+from library.queries import get_books_by_affinity, get_related_users_books
+
+
+def legacy_books_by_affinity(user_id, dimension):
+    """
+    The original two-step suggestion: aggregate the user's favourite values,
+    then paste them back as parameters with an ``ORDER BY CASE`` chain.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT {dimension}
+            FROM books
+            JOIN reviews ON books.id = reviews.book_id
+            WHERE reviews.user_id = %s AND reviews.rating >= 4
+            GROUP BY {dimension}
+            ORDER BY COUNT(*) DESC
+        """, [user_id])
+        values = [row[0] for row in cursor.fetchall()]
+        if not values:
+            return []
+        placeholders = ', '.join(['%s'] * len(values))
+        query = f"""
+            SELECT id, title, author, genre
+            FROM books
+            WHERE {dimension} IN ({placeholders}) AND id NOT IN (
+                SELECT book_id FROM reviews WHERE user_id = %s
+            )
+            ORDER BY CASE {dimension}
+        """
+        for idx, value in enumerate(values):
+            query += f" WHEN %s THEN {idx}"
+        query += " END"
+        cursor.execute(query, values + [user_id] + values)
+        return cursor.fetchall()
+
+
+def legacy_related_users_books(user_id):
+    """
+    The original three round trip related-users suggestion.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT book_id FROM reviews WHERE user_id = %s AND rating >= 4
+        """, [user_id])
+        liked = [row[0] for row in cursor.fetchall()]
+        if not liked:
+            return []
+        placeholders = ', '.join(['%s'] * len(liked))
+        cursor.execute(f"""
+            SELECT DISTINCT user_id FROM reviews
+            WHERE book_id IN ({placeholders}) AND rating >= 4 AND user_id != %s
+        """, liked + [user_id])
+        related = [row[0] for row in cursor.fetchall()]
+        if not related:
+            return []
+        placeholders = ', '.join(['%s'] * len(related))
+        cursor.execute(f"""
+            SELECT books.id, books.title, books.author, books.genre, COUNT(reviews.user_id) as related_user_count
+            FROM books
+            JOIN reviews ON books.id = reviews.book_id
+            WHERE reviews.user_id IN ({placeholders}) AND reviews.rating >= 4
+            AND books.id NOT IN (
+                SELECT book_id FROM reviews WHERE user_id = %s
+            )
+            GROUP BY books.id, books.title, books.author, books.genre
+            ORDER BY related_user_count DESC
+        """, related + [user_id])
+        return cursor.fetchall()
+
+
+def affinity_scorer(user_id, dimension):
+    """
+    Return a function scoring a book row by the user's high rating count for
+    its genre or author, which is the key both implementations order by.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT value, high_rating_count FROM user_affinity
+            WHERE user_id = %s AND dimension = %s
+        """, [user_id, dimension])
+        scores = dict(cursor.fetchall())
+    column = 3 if dimension == UserAffinity.DIMENSION_GENRE else 2
+    return lambda row: scores.get(row[column], 0)
+
+
+def related_users_scorer(user_id):
+    return lambda row: row[4]
+
+
+def same_ranking(expected, actual, score):
+    """
+    True when both lists hold the same books and both are ordered by a
+    non-increasing ``score``. Order among equal scores is unspecified in the
+    legacy queries, so it is not compared.
+    """
+    expected_scores = [score(row) for row in expected]
+    actual_scores = [score(row) for row in actual]
+    return (
+        sorted(row[0] for row in expected) == sorted(row[0] for row in actual)
+        and expected_scores == sorted(expected_scores, reverse=True)
+        and actual_scores == sorted(actual_scores, reverse=True)
+    )
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the single-statement suggestion queries against the original
+    multi-query implementations and check that they rank books the same way.
+    """
+    help = "Compare latency, round trips and ordering of the suggestion queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100,
+                            help="Number of reviewing users to sample.")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Timed runs per user and implementation.")
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT user_id FROM reviews ORDER BY user_id LIMIT %s
+            """, [options['users']])
+            user_ids = [row[0] for row in cursor.fetchall()]
+        if not user_ids:
+            raise CommandError("No reviews to benchmark against")
+
+        suites = [
+            (
+                f"suggest-by-{dimension}",
+                partial(legacy_books_by_affinity, dimension=dimension),
+                partial(get_books_by_affinity, dimension=dimension),
+                partial(affinity_scorer, dimension=dimension),
+            )
+            for dimension in (UserAffinity.DIMENSION_GENRE, UserAffinity.DIMENSION_AUTHOR)
+        ]
+        suites.append((
+            "suggest-by-related-users",
+            legacy_related_users_books,
+            get_related_users_books,
+            related_users_scorer,
+        ))
+
+        mismatches = 0
+        for name, legacy, current, scorer in suites:
+            timings = {'legacy': [], 'cte': []}
+            queries = {'legacy': 0, 'cte': 0}
+            for user_id in user_ids:
+                results = {}
+                for label, func in (('legacy', legacy), ('cte', current)):
+                    for _ in range(options['repeat']):
+                        counter = QueryCounter()
+                        with connection.execute_wrapper(counter):
+                            start = time.perf_counter()
+                            results[label] = func(user_id)
+                            timings[label].append(time.perf_counter() - start)
+                        queries[label] += counter.count
+                if not same_ranking(results['legacy'], results['cte'], scorer(user_id)):
+                    mismatches += 1
+                    self.stderr.write(f"{name}: ranking differs for user {user_id}")
+
+            runs = len(user_ids) * options['repeat']
+            for label in ('legacy', 'cte'):
+                self.stdout.write(
+                    f"{name:<26} {label:<7} "
+                    f"mean {statistics.mean(timings[label]) * 1000:8.2f} ms  "
+                    f"p50 {statistics.median(timings[label]) * 1000:8.2f} ms  "
+                    f"queries/request {queries[label] / runs:.2f}"
+                )
+
+        if mismatches:
+            raise CommandError(f"{mismatches} rankings differ from the legacy queries")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rankings match the legacy queries for {len(user_ids)} users"))
+
+
+class QueryCounter:
+    """
+    ``connection.execute_wrapper`` hook counting executed statements.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
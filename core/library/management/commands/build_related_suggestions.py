@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from library.cf import build_related_users_suggestions
+
+
+class Command(BaseCommand):
+    """
+    Precompute related-user suggestions for every user with the sparse
+    matrix engine in library.cf.
+    """
+    help = "Rebuild the precomputed related-user suggestions file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', help="Output file (defaults to LIBRARY_CF_PATH).")
+        parser.add_argument(
+            '--top-n', type=int,
+            help="Suggestions kept per user (defaults to LIBRARY_CF_TOP_N).")
+        parser.add_argument(
+            '--batch-size', type=int, default=1024,
+            help="Users scored per sparse matrix product.")
+
+    def handle(self, *args, **options):
+        try:
+            users = build_related_users_suggestions(
+                options['path'], options['top_n'], options['batch_size'])
+        except ImportError as e:
+            raise CommandError(f"numpy and scipy are required: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Built suggestions for {users} users"))
@@ -0,0 +1,194 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from library.api.v1.paginations import RawQueryList
+from library.api.v1.views import BookListAPIView
+from library.models import BookRanking, UserAffinity
+from library.queries import (
+    fetch_all, get_books_by_affinity, get_ranked_books_for_user, get_related_users_books, ranked_books_query,
+)
+
+# Tables the hot queries must never scan sequentially
+INDEXED_TABLES = {'books', 'reviews', 'user_affinity', 'book_rankings'}
+
+
+class PlanCollector:
+    """
+    ``connection.execute_wrapper`` hook that runs ``EXPLAIN`` instead of each
+    statement and keeps the resulting plans.
+    """
+
+    def __init__(self):
+        self.plans = []
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(f"EXPLAIN (FORMAT JSON) {sql}", params, many, context)
+        plan = context['cursor'].fetchone()[0]
+        self.plans.append(json.loads(plan) if isinstance(plan, str) else plan)
+        return result
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk_plan(child)
+
+
+def scans(plans):
+    """
+    Return the index names used and the tables scanned sequentially.
+    """
+    indexes, seq_scans = set(), set()
+    for plan in plans:
+        for node in walk_plan(plan[0]['Plan']):
+            if 'Index Name' in node:
+                indexes.add(node['Index Name'])
+            if node['Node Type'] == 'Seq Scan':
+                seq_scans.add(node['Relation Name'])
+    return indexes, seq_scans
+
+
+def get_probes(user_id, genres, authors):
+    """
+    Return ``(label, run, expected_indexes)`` for each view query. ``run``
+    executes the query exactly as the view builds it.
+    """
+    genre, author = genres[0], authors[0]
+
+    def book_list(query_params):
+        def run():
+            view = BookListAPIView()
+            view.request = RequestFactory().get('/', query_params)
+            filters, params = view._get_filters_and_params(user_id)
+            ordering, ordering_params = view._get_ordering()
+            query = view._get_query(filters, user_id, ordering)
+            RawQueryList(query, [user_id] + params + ordering_params, None)[0:10]
+        return run
+
+    def book_list_cursor():
+        query = BookListAPIView()._get_query(['books.id > %s'], user_id)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{query} LIMIT %s", [user_id, 0, 11])
+
+    return [
+        ('book list ?genre=', book_list({'genre': genre}),
+         {'books_genre_id_idx', 'reviews_user_book_uniq'}),
+        ('book list ?genre__in=', book_list({'genre__in': ','.join(genres)}),
+         {'reviews_user_book_uniq'}),
+        ('book list ?author=', book_list({'author': author}),
+         {'books_author_id_idx', 'reviews_user_book_uniq'}),
+        ('book list ?author__in=', book_list({'author__in': ','.join(authors)}),
+         {'reviews_user_book_uniq'}),
+        ('book list ?rated=true', book_list({'rated': 'true'}),
+         {'reviews_user_book_uniq'}),
+        ('book list ?rated=false', book_list({'rated': 'false'}),
+         {'reviews_user_book_uniq'}),
+        ('book list ?rating__gte=', book_list({'rating__gte': '4'}),
+         {'reviews_user_book_uniq'}),
+        ('book list ?id__gt=', book_list({'id__gt': '0'}),
+         {'books_pkey', 'reviews_user_book_uniq'}),
+        ('book list ?genre__in=&rated=false&id__gt=',
+         book_list({'genre__in': genre, 'rated': 'false', 'id__gt': '0'}),
+         {'books_genre_id_idx', 'reviews_user_book_uniq'}),
+        ('book list ?q=', book_list({'q': author}),
+         {'books_search_idx', 'reviews_user_book_uniq'}),
+        ('book list ?ordering=-rating_avg', book_list({'ordering': '-rating_avg'}),
+         {'books_rating_avg_idx', 'reviews_user_book_uniq'}),
+        ('book list ?ordering=rating_count', book_list({'ordering': 'rating_count'}),
+         {'books_rating_count_idx', 'reviews_user_book_uniq'}),
+        ('book list ?ordering=-rating_count', book_list({'ordering': '-rating_count'}),
+         {'books_rating_count_idx', 'reviews_user_book_uniq'}),
+        ('book list ?cursor=', book_list_cursor,
+         {'books_pkey', 'reviews_user_book_uniq'}),
+        # Favorite genres are popular ones, whose books the planner may
+        # rather walk in id order than through books_genre_id_idx
+        ('suggest-by-genre', lambda: get_books_by_affinity(user_id, UserAffinity.DIMENSION_GENRE),
+         {'reviews_user_book_uniq'}),
+        ('suggest-by-author', lambda: get_books_by_affinity(user_id, UserAffinity.DIMENSION_AUTHOR),
+         {'books_author_id_idx', 'reviews_user_book_uniq'}),
+        # Reviews of the liked books may be hash joined instead of looked up
+        # in reviews_book_rating_idx, depending on how many there are
+        ('suggest-by-related-users', lambda: get_related_users_books(user_id),
+         {'reviews_user_rating_idx', 'reviews_user_book_uniq'}),
+        ('top-rated ?genre=', lambda: fetch_all(ranked_books_query(BookRanking.RANKING_TOP_RATED, genre)),
+         {'book_rankings_unique', 'books_pkey'}),
+        ('trending', lambda: fetch_all(ranked_books_query(BookRanking.RANKING_TRENDING)),
+         {'book_rankings_unique', 'books_pkey'}),
+        ('suggest-by-genre fallback',
+         lambda: get_ranked_books_for_user(BookRanking.RANKING_TOP_RATED, user_id),
+         {'book_rankings_unique', 'books_pkey', 'reviews_user_book_uniq'}),
+    ]
+
+
+def get_probe_arguments(user_id=None):
+    """
+    Return the ``(user_id, genres, authors)`` to probe with: the given user
+    or the top reviewer, and the rarest genres and authors, for which an
+    index beats walking books in id order.
+    """
+    with connection.cursor() as cursor:
+        if user_id is None:
+            cursor.execute("""
+                SELECT user_id FROM reviews GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1
+            """)
+            row = cursor.fetchone()
+            user_id = row[0] if row else 0
+        cursor.execute("SELECT genre FROM books GROUP BY genre ORDER BY COUNT(*), genre LIMIT 2")
+        genres = [row[0] for row in cursor.fetchall()] or ['']
+        cursor.execute("SELECT author FROM books GROUP BY author ORDER BY COUNT(*), author LIMIT 2")
+        authors = [row[0] for row in cursor.fetchall()] or ['']
+    return user_id, genres, authors
+
+
+def check_probes(user_id=None):
+    """
+    Yield ``(label, indexes_used, issues)`` for each probe. Sequential scans
+    are disabled while explaining, so a remaining ``Seq Scan`` or an
+    expected index that is not used means the index is missing or
+    unusable, independently of how much data the tables hold.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()")
+        existing = {row[0] for row in cursor.fetchall()}
+    for label, run, expected in get_probes(*get_probe_arguments(user_id)):
+        collector = PlanCollector()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            with connection.execute_wrapper(collector):
+                run()
+            transaction.set_rollback(True)
+
+        used, seq_scans = scans(collector.plans)
+        issues = [f"missing index {name}" for name in sorted(expected - existing)]
+        issues += [f"index {name} not used" for name in sorted((expected & existing) - used)]
+        issues += [f"sequential scan on {table}" for table in sorted(seq_scans & INDEXED_TABLES)]
+        yield label, used, issues
+
+
+class Command(BaseCommand):
+    """
+    Check that every view query can be answered with the indexes it depends
+    on (see ``check_probes``). ``library.tests`` runs the same checks on a
+    seeded test database.
+    """
+    help = "Flag missing indexes by comparing EXPLAIN plans of the view queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int,
+                            help="User to explain the queries for (defaults to the top reviewer).")
+
+    def handle(self, *args, **options):
+        problems = 0
+        for label, used, issues in check_probes(options['user_id']):
+            if issues:
+                problems += len(issues)
+                self.stdout.write(self.style.ERROR(f"{label}: {'; '.join(issues)}"))
+            else:
+                self.stdout.write(f"{label}: ok ({', '.join(sorted(used))})")
+
+        if problems:
+            raise CommandError(f"{problems} index problems found")
+        self.stdout.write(self.style.SUCCESS("All view queries use their indexes"))
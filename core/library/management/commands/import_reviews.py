@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from library.ingest import import_reviews, parse_csv, parse_ndjson
+
+PARSERS = {
+    'ndjson': parse_ndjson,
+    'csv': parse_csv,
+}
+
+
+class Command(BaseCommand):
+    """
+    Stream reviews from an NDJSON or CSV file into the reviews table.
+    """
+    help = "Import reviews (user_id, book_id, rating) from NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - for stdin.")
+        parser.add_argument('--format', choices=PARSERS,
+                            help="Input format (defaults to the file extension).")
+        parser.add_argument('--batch-size', type=int,
+                            help="Rows per transaction (defaults to LIBRARY_IMPORT_BATCH_SIZE).")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if fmt not in PARSERS:
+            raise CommandError("Cannot tell the input format, pass --format")
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        totals = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'rejected': 0}
+        try:
+            for report in import_reviews(PARSERS[fmt](stream), options['batch_size']):
+                for key in totals:
+                    totals[key] += report[key]
+                self.stdout.write(
+                    f"batch {report['batch']}: inserted {report['inserted']}  "
+                    f"updated {report['updated']}  unchanged {report['unchanged']}  "
+                    f"rejected {report['rejected']}")
+                for error in report['errors']:
+                    self.stderr.write(f"  line {error['line']}: {error['error']}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"inserted {totals['inserted']}  updated {totals['updated']}  "
+            f"unchanged {totals['unchanged']}  rejected {totals['rejected']}"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from library.neighbors import rebuild_book_neighbors
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the book_neighbors co-rating graph from the reviews table.
+    """
+    help = "Recompute the top-K books co-rated 4 or higher by the same users."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int,
+            help="Neighbours kept per book (defaults to LIBRARY_BOOK_NEIGHBORS_TOP_K).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = rebuild_book_neighbors(options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} neighbour rows"))
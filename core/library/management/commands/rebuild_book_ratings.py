@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from library.ratings import rebuild_book_ratings
+
+
+class Command(BaseCommand):
+    """
+    Reconcile the books' rating aggregates with the reviews table.
+    """
+    help = "Recompute every book's rating count, sum, average and histogram. Blocks review writes meanwhile."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            books = rebuild_book_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Corrected the rating aggregates of {books} books"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from library.affinity import rebuild_user_affinity
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the user_affinity table from the reviews table.
+    """
+    help = "Recompute every user's genre and author affinity from their reviews."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = rebuild_user_affinity()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} affinity rows"))
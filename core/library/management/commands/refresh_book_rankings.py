@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from library.models import BookRanking
+from library.rankings import refresh_book_rankings
+
+
+class Command(BaseCommand):
+    """
+    Recompute the precomputed rankings served by the top-rated and trending
+    endpoints. With ``--loop`` it keeps refreshing every
+    ``LIBRARY_RANKINGS_REFRESH_INTERVAL`` seconds, as a background worker.
+    """
+    help = "Recompute the top-rated and trending book rankings, once or on a schedule."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ranking', action='append', choices=[ranking for ranking, _ in BookRanking.RANKING_CHOICES],
+            help="Ranking to refresh (repeatable; default: all).")
+        parser.add_argument('--loop', action='store_true', help="Refresh forever on a schedule.")
+        parser.add_argument(
+            '--interval', type=int, default=settings.LIBRARY_RANKINGS_REFRESH_INTERVAL,
+            help="Seconds between refreshes with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.monotonic()
+            counts = refresh_book_rankings(options['ranking'])
+            elapsed = time.monotonic() - start
+            self.stdout.write(self.style.SUCCESS(
+                f"Refreshed rankings in {elapsed:.2f}s: "
+                + '  '.join(f"{ranking} {count}" for ranking, count in counts.items())))
+            if not options['loop']:
+                break
+            # Long-running: drop the connection between refreshes like a request would
+            close_old_connections()
+            time.sleep(max(options['interval'] - elapsed, 0))
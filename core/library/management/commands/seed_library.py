@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from library.seeding import SEED_PASSWORD, SEED_USERNAME_PREFIX, flush_library, seed_library
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with a synthetic, Zipf-skewed library for load tests.
+    """
+    help = "Generate users, books and reviews with a Zipf-skewed distribution."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Number of users to create.")
+        parser.add_argument('--books', type=int, default=10000, help="Number of books to create.")
+        parser.add_argument('--genres', type=int, default=30, help="Number of distinct genres.")
+        parser.add_argument('--authors', type=int, default=2000, help="Number of distinct authors.")
+        parser.add_argument('--reviews-per-user', type=int, default=50,
+                            help="Mean number of reviews per user.")
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help="Zipf exponent of book, genre and author popularity.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed.")
+        parser.add_argument('--flush', action='store_true',
+                            help="Delete all books, reviews and previously seeded users first.")
+
+    def handle(self, *args, **options):
+        for name in ('users', 'books', 'genres', 'authors'):
+            if options[name] < 1:
+                raise CommandError(f"--{name} must be positive")
+        if options['flush']:
+            flush_library()
+        counts = seed_library(
+            options['users'], options['books'], options['genres'], options['authors'],
+            options['reviews_per_user'], options['skew'], options['seed'])
+        self.stdout.write(self.style.SUCCESS(
+            '  '.join(f"{table} {count}" for table, count in counts.items())))
+        self.stdout.write(
+            f"Seeded users are named {SEED_USERNAME_PREFIX}<n> with password {SEED_PASSWORD!r}")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from library.suggestion_cache import get_suggestion_cache_stats
+
+
+class Command(BaseCommand):
+    """
+    Print the suggestion cache hit/miss counters.
+    """
+    help = "Show suggestion cache hits, misses and hit ratio."
+
+    def handle(self, *args, **options):
+        stats = get_suggestion_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f"hits {stats['hits']}  misses {stats['misses']}  hit ratio {ratio:.1%}")
@@ -0,0 +1,132 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('library.sql')
+
+# Characters of the slowest statement kept in logs
+MAX_SQL_LENGTH = 500
+
+# Recorder of the current request, for statements run outside Django's
+# connection (see library.adb)
+current_recorder = ContextVar('library_sql_recorder', default=None)
+
+
+class QueryRecorder:
+    """
+    ``connection.execute_wrapper`` hook recording the number of statements,
+    total database time, rows returned or affected and the slowest statement.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.slowest_sql = None
+        self.slowest_duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - start, context['cursor'].rowcount)
+
+    def record(self, sql, duration, rowcount):
+        self.queries += 1
+        self.duration += duration
+        # Named (server-side) cursors report -1 until rows are fetched
+        self.rows += max(rowcount, 0)
+        if duration >= self.slowest_duration:
+            self.slowest_duration = duration
+            self.slowest_sql = ' '.join(sql.split())[:MAX_SQL_LENGTH]
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.duration * 1000, 3),
+            'rows': self.rows,
+            'slowest_ms': round(self.slowest_duration * 1000, 3),
+            'slowest_sql': self.slowest_sql,
+        }
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.duration * 1000:.3f};desc="{self.queries} queries, {self.rows} rows", '
+            f'db-slowest;dur={self.slowest_duration * 1000:.3f}'
+        )
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record the SQL cost of a sample of requests, whatever cursor the view
+    uses, and report it on the ``library.sql`` logger and, with
+    ``LIBRARY_SQL_SERVER_TIMING``, in a ``Server-Timing`` header for DEBUG
+    or ``INTERNAL_IPS`` requests. Requests that run more than
+    ``LIBRARY_SQL_ALERT_QUERIES`` statements or return more than
+    ``LIBRARY_SQL_ALERT_ROWS`` rows are logged as warnings.
+
+    Statements run while a streaming response is consumed happen after the
+    middleware returns and are not recorded. When the middleware runs async,
+    only the statements async views run through ``current_recorder`` are
+    seen; sync views then use the connection of a worker thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.LIBRARY_SQL_SAMPLE_RATE:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.LIBRARY_SQL_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.report(request, response, recorder)
+
+    def report(self, request, response, recorder):
+        if settings.LIBRARY_SQL_SERVER_TIMING and (
+                settings.DEBUG or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS):
+            response['Server-Timing'] = recorder.server_timing()
+        stats = recorder.as_dict()
+        message = (
+            f"{request.method} {request.path} {response.status_code} "
+            f"queries={stats['queries']} db_ms={stats['db_ms']} rows={stats['rows']} "
+            f"slowest_ms={stats['slowest_ms']}"
+        )
+        extra = {'sql': dict(stats, method=request.method, path=request.path,
+                             status=response.status_code)}
+        if (stats['queries'] > settings.LIBRARY_SQL_ALERT_QUERIES
+                or stats['rows'] > settings.LIBRARY_SQL_ALERT_ROWS):
+            logger.warning(f"SQL budget exceeded: {message} slowest_sql={stats['slowest_sql']!r}",
+                           extra=extra)
+        else:
+            logger.info(message, extra=extra)
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAffinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('genre', 'Genre'), ('author', 'Author')], max_length=10)),
+                ('value', models.CharField(max_length=200)),
+                ('high_rating_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_affinity',
+                'indexes': [models.Index(fields=['user', 'dimension', '-high_rating_count'], name='user_affinity_ranked_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='useraffinity',
+            constraint=models.UniqueConstraint(fields=('user', 'dimension', 'value'), name='user_affinity_unique'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0001_user_affinity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_id', models.BigIntegerField()),
+                ('neighbor_id', models.BigIntegerField()),
+                ('weight', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'book_neighbors',
+                'indexes': [models.Index(fields=['book_id', '-weight'], name='book_neighbors_ranked_idx'), models.Index(fields=['neighbor_id'], name='book_neighbors_neighbor_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bookneighbor',
+            constraint=models.UniqueConstraint(fields=('book_id', 'neighbor_id'), name='book_neighbors_unique'),
+        ),
+    ]
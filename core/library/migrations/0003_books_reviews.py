@@ -0,0 +1,115 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The books and reviews tables predate these models and may already exist,
+# so the database side is written to be idempotent and only fills in what is
+# missing. Reversing drops the indexes but never the tables and their data.
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS books (
+    id bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    title varchar(200) NOT NULL,
+    author varchar(200) NOT NULL,
+    genre varchar(50) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    id bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    rating smallint NOT NULL CHECK (rating >= 0),
+    book_id bigint NOT NULL
+        REFERENCES books (id) DEFERRABLE INITIALLY DEFERRED,
+    user_id bigint NOT NULL
+        REFERENCES account_user (id) DEFERRABLE INITIALLY DEFERRED
+);
+CREATE INDEX IF NOT EXISTS books_genre_id_idx ON books (genre, id);
+CREATE INDEX IF NOT EXISTS books_author_id_idx ON books (author, id);
+CREATE INDEX IF NOT EXISTS reviews_book_rating_idx ON reviews (book_id, rating);
+CREATE INDEX IF NOT EXISTS reviews_user_rating_idx ON reviews (user_id, rating);
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'reviews_user_book_uniq') THEN
+        ALTER TABLE reviews ADD CONSTRAINT reviews_user_book_uniq UNIQUE (user_id, book_id);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'reviews_rating_range') THEN
+        ALTER TABLE reviews ADD CONSTRAINT reviews_rating_range CHECK (rating >= 1 AND rating <= 5);
+    END IF;
+END
+$$;
+"""
+
+DROP_SQL = """
+ALTER TABLE reviews DROP CONSTRAINT IF EXISTS reviews_rating_range;
+ALTER TABLE reviews DROP CONSTRAINT IF EXISTS reviews_user_book_uniq;
+DROP INDEX IF EXISTS reviews_user_rating_idx;
+DROP INDEX IF EXISTS reviews_book_rating_idx;
+DROP INDEX IF EXISTS books_author_id_idx;
+DROP INDEX IF EXISTS books_genre_id_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('library', '0002_book_neighbors'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_SQL, reverse_sql=DROP_SQL),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='Book',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('title', models.CharField(max_length=200)),
+                        ('author', models.CharField(max_length=200)),
+                        ('genre', models.CharField(max_length=50)),
+                    ],
+                    options={
+                        'db_table': 'books',
+                    },
+                ),
+                migrations.CreateModel(
+                    name='Review',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('rating', models.PositiveSmallIntegerField()),
+                        ('book', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='library.book')),
+                        ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'reviews',
+                    },
+                ),
+                migrations.AddIndex(
+                    model_name='book',
+                    index=models.Index(fields=['genre', 'id'], name='books_genre_id_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='book',
+                    index=models.Index(fields=['author', 'id'], name='books_author_id_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='review',
+                    index=models.Index(fields=['book', 'rating'], name='reviews_book_rating_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='review',
+                    index=models.Index(fields=['user', 'rating'], name='reviews_user_rating_idx'),
+                ),
+                migrations.AddConstraint(
+                    model_name='review',
+                    constraint=models.UniqueConstraint(fields=('user', 'book'), name='reviews_user_book_uniq'),
+                ),
+                migrations.AddConstraint(
+                    model_name='review',
+                    constraint=models.CheckConstraint(check=models.Q(('rating__gte', 1), ('rating__lte', 5)), name='reviews_rating_range'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_books_reviews'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bookneighbor',
+            name='book_neighbors_neighbor_idx',
+        ),
+    ]
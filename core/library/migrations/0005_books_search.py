@@ -0,0 +1,19 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:29
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_drop_book_neighbors_neighbor_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('title', 'author', config='simple'), name='books_search_idx'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+INTEGER_COLUMNS = ['rating_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+# Django 4.2 only applies defaults in Python, but books are also inserted
+# with raw SQL (seeding's COPY), which must start from zero aggregates
+SET_DEFAULTS_SQL = 'ALTER TABLE books ' + ', '.join(
+    f'ALTER COLUMN {column} SET DEFAULT 0' for column in INTEGER_COLUMNS)
+DROP_DEFAULTS_SQL = 'ALTER TABLE books ' + ', '.join(
+    f'ALTER COLUMN {column} DROP DEFAULT' for column in INTEGER_COLUMNS)
+
+# Fills the aggregates of existing reviews before the indexes are built
+BACKFILL_SQL = """
+    UPDATE books
+    SET rating_count = aggregates.rating_count,
+        rating_sum = aggregates.rating_sum,
+        rating_avg = aggregates.rating_sum::float8 / aggregates.rating_count,
+        rating_1 = aggregates.rating_1,
+        rating_2 = aggregates.rating_2,
+        rating_3 = aggregates.rating_3,
+        rating_4 = aggregates.rating_4,
+        rating_5 = aggregates.rating_5
+    FROM (
+        SELECT book_id, COUNT(*) AS rating_count, SUM(rating) AS rating_sum,
+               COUNT(*) FILTER (WHERE rating = 1) AS rating_1,
+               COUNT(*) FILTER (WHERE rating = 2) AS rating_2,
+               COUNT(*) FILTER (WHERE rating = 3) AS rating_3,
+               COUNT(*) FILTER (WHERE rating = 4) AS rating_4,
+               COUNT(*) FILTER (WHERE rating = 5) AS rating_5
+        FROM reviews
+        GROUP BY book_id
+    ) aggregates
+    WHERE books.id = aggregates.book_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_books_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_avg',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(SET_DEFAULTS_SQL, reverse_sql=DROP_DEFAULTS_SQL),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(models.OrderBy(models.F('rating_avg'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='books_rating_avg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['rating_count', 'id'], name='books_rating_count_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# Django 4.2 only applies defaults in Python, but reviews are also written
+# with raw SQL (the review views, imports, seeding's COPY), which must record
+# the time of the write. Existing reviews get the time of the migration.
+SET_DEFAULT_SQL = 'ALTER TABLE reviews ALTER COLUMN created_at SET DEFAULT now()'
+DROP_DEFAULT_SQL = 'ALTER TABLE reviews ALTER COLUMN created_at DROP DEFAULT'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_books_ratings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking', models.CharField(choices=[('top_rated', 'Top rated'), ('trending', 'Trending')], max_length=20)),
+                ('genre', models.CharField(blank=True, max_length=50)),
+                ('position', models.PositiveIntegerField()),
+                ('book_id', models.BigIntegerField()),
+                ('score', models.FloatField()),
+            ],
+            options={
+                'db_table': 'book_rankings',
+            },
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunSQL(SET_DEFAULT_SQL, reverse_sql=DROP_DEFAULT_SQL),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at'], name='reviews_created_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookranking',
+            constraint=models.UniqueConstraint(fields=('ranking', 'genre', 'position'), name='book_rankings_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_book_rankings_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionBuildVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'suggestion_build_version',
+            },
+        ),
+    ]
@@ -1,3 +1,192 @@
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
-# Create your models here.
+
+class Book(models.Model):
+    """
+    A book in the catalog. The views query this table with raw SQL.
+
+    The ``rating_*`` aggregates of the book's reviews are kept up to date by
+    the review writes (see ``library.ratings``) so lists can return and sort
+    by them without aggregating ``reviews``.
+    """
+    title = models.CharField(max_length=200)
+    author = models.CharField(max_length=200)
+    genre = models.CharField(max_length=50)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(null=True)  # NULL without reviews
+    # Number of reviews per rating
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'books'
+        indexes = [
+            models.Index(fields=['genre', 'id'], name='books_genre_id_idx'),
+            models.Index(fields=['author', 'id'], name='books_author_id_idx'),
+            # Answers the book list's ``q`` search (see BOOK_SEARCH_VECTOR)
+            GinIndex(SearchVector('title', 'author', config='simple'), name='books_search_idx'),
+            # Book list ``ordering``; ties follow the same direction so each
+            # index also serves the reverse order
+            models.Index(F('rating_avg').desc(nulls_last=True), F('id').desc(), name='books_rating_avg_idx'),
+            models.Index(fields=['rating_count', 'id'], name='books_rating_count_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class Review(models.Model):
+    """
+    A user's 1-5 rating of a book. The views query this table with raw SQL.
+    """
+    # Both foreign keys are covered by the composite indexes below
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, db_index=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    rating = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'reviews'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book'], name='reviews_user_book_uniq'),
+            models.CheckConstraint(
+                check=models.Q(rating__gte=1, rating__lte=5), name='reviews_rating_range'),
+        ]
+        indexes = [
+            models.Index(fields=['book', 'rating'], name='reviews_book_rating_idx'),
+            models.Index(fields=['user', 'rating'], name='reviews_user_rating_idx'),
+            # Trending ranking's window of recent reviews
+            models.Index(fields=['created_at'], name='reviews_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} rated {self.book_id}: {self.rating}"
+
+
+class UserAffinity(models.Model):
+    """
+    Number of books a user rated 4 or higher, per genre and per author.
+    Kept up to date by the review write views so the suggestion endpoints
+    can read a ranked list instead of aggregating the user's reviews.
+    """
+    DIMENSION_GENRE = 'genre'
+    DIMENSION_AUTHOR = 'author'
+    DIMENSION_CHOICES = (
+        (DIMENSION_GENRE, 'Genre'),
+        (DIMENSION_AUTHOR, 'Author'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=200)
+    high_rating_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'user_affinity'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'dimension', 'value'], name='user_affinity_unique'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'dimension', '-high_rating_count'],
+                name='user_affinity_ranked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.dimension}={self.value} ({self.high_rating_count})"
+
+
+class BookNeighbor(models.Model):
+    """
+    Sparse item-to-item graph: ``weight`` is the number of users who rated
+    both books 4 or higher. Only the top-K neighbours of each book are kept.
+    """
+    book_id = models.BigIntegerField()
+    neighbor_id = models.BigIntegerField()
+    weight = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'book_neighbors'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['book_id', 'neighbor_id'], name='book_neighbors_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['book_id', '-weight'], name='book_neighbors_ranked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.neighbor_id} ({self.weight})"
+
+
+class BookRanking(models.Model):
+    """
+    Precomputed ranked book lists, overall and per genre, replaced as a
+    whole by ``refresh_book_rankings`` so the top-rated and trending
+    endpoints read ``position`` order instead of aggregating reviews.
+    """
+    RANKING_TOP_RATED = 'top_rated'
+    RANKING_TRENDING = 'trending'
+    RANKING_CHOICES = (
+        (RANKING_TOP_RATED, 'Top rated'),
+        (RANKING_TRENDING, 'Trending'),
+    )
+
+    ranking = models.CharField(max_length=20, choices=RANKING_CHOICES)
+    genre = models.CharField(max_length=50, blank=True)  # Empty for the overall ranking
+    position = models.PositiveIntegerField()
+    book_id = models.BigIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        db_table = 'book_rankings'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ranking', 'genre', 'position'], name='book_rankings_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.ranking}[{self.genre}] #{self.position}: {self.book_id} ({self.score})"
+
+
+class RankingsVersion(models.Model):
+    """
+    Single row counting the refreshes of the stored rankings, incremented
+    by ``refresh_book_rankings`` in its transaction. It versions the cached
+    rankings and their ETags, and lives in the database rather than the
+    cache because the refresh runs in its own process.
+    """
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'book_rankings_version'
+
+    def __str__(self):
+        return f"Rankings version {self.version}"
+
+
+class SuggestionBuildVersion(models.Model):
+    """
+    Single row counting the rebuilds of the ``book_neighbors`` graph and of
+    the precomputed related-user suggestions, incremented by
+    ``rebuild_book_neighbors`` and ``build_related_users_suggestions``. It
+    versions the related-user suggestions cached from them and their ETags,
+    and lives in the database because the builds run in their own process.
+    """
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'suggestion_build_version'
+
+    def __str__(self):
+        return f"Suggestion build version {self.version}"
@@ -0,0 +1,136 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+from library.affinity import HIGH_RATING, is_high_rating
+from library.suggestion_cache import bump_suggestion_builds_version
+
+
+def get_neighbor_deltas(changes, high_rated):
+    """
+    Return the co-rating weight change of every ordered book pair touched by
+    ``changes``, given each writer's highly rated books after the writes.
+    """
+    gained, lost = defaultdict(set), defaultdict(set)
+    for user_id, book_id, old_rating, new_rating in changes:
+        if is_high_rating(new_rating) and not is_high_rating(old_rating):
+            gained[user_id].add(book_id)
+        elif is_high_rating(old_rating) and not is_high_rating(new_rating):
+            lost[user_id].add(book_id)
+
+    deltas = Counter()
+    for user_id in gained.keys() | lost.keys():
+        new = high_rated[user_id]
+        old = (new - gained[user_id]) | lost[user_id]
+        changed = gained[user_id] | lost[user_id]
+        for book_id in changed:
+            for other_id in old | new:
+                # Visit each unordered pair of changed books once
+                if other_id == book_id or (other_id in changed and other_id < book_id):
+                    continue
+                delta = (int(book_id in new and other_id in new)
+                         - int(book_id in old and other_id in old))
+                if delta:
+                    deltas[(book_id, other_id)] += delta
+                    deltas[(other_id, book_id)] += delta
+    return {pair: delta for pair, delta in deltas.items() if delta}
+
+
+def update_book_neighbors(cursor, changes):
+    """
+    Patch the co-rating graph after review writes, given as ``(user_id,
+    book_id, old_rating, new_rating)`` tuples (ratings are None when a review
+    is created or deleted). Must run in the same transaction as the writes.
+
+    Pairs pruned out of a book's top-K restart from zero when patched, so
+    weights drift slightly until the next ``rebuild_book_neighbors``.
+    """
+    users = {
+        user_id for user_id, _, old_rating, new_rating in changes
+        if is_high_rating(old_rating) != is_high_rating(new_rating)
+    }
+    if not users:
+        return
+    cursor.execute("""
+        SELECT user_id, book_id FROM reviews
+        WHERE user_id = ANY(%s) AND rating >= %s
+    """, [list(users), HIGH_RATING])
+    high_rated = defaultdict(set)
+    for user_id, book_id in cursor.fetchall():
+        high_rated[user_id].add(book_id)
+
+    deltas = get_neighbor_deltas(changes, high_rated)
+    if not deltas:
+        return
+    for positive in (True, False):
+        pairs = [(pair, delta) for pair, delta in deltas.items() if (delta > 0) == positive]
+        if not pairs:
+            continue
+        params = [[book_id for (book_id, _), _ in pairs],
+                  [neighbor_id for (_, neighbor_id), _ in pairs],
+                  [delta for _, delta in pairs]]
+        if positive:
+            cursor.execute("""
+                INSERT INTO book_neighbors (book_id, neighbor_id, weight)
+                SELECT * FROM unnest(%s::bigint[], %s::bigint[], %s::int[])
+                ON CONFLICT (book_id, neighbor_id) DO UPDATE
+                SET weight = book_neighbors.weight + EXCLUDED.weight
+            """, params)
+        else:
+            # Pairs missing from the graph were already pruned; skip them
+            cursor.execute("""
+                UPDATE book_neighbors
+                SET weight = GREATEST(book_neighbors.weight + deltas.delta, 0)
+                FROM unnest(%s::bigint[], %s::bigint[], %s::int[])
+                    AS deltas (book_id, neighbor_id, delta)
+                WHERE book_neighbors.book_id = deltas.book_id
+                AND book_neighbors.neighbor_id = deltas.neighbor_id
+            """, params)
+
+    # Drop emptied pairs and keep every touched book at its top-K neighbours
+    touched = list({book_id for book_id, _ in deltas})
+    cursor.execute("""
+        DELETE FROM book_neighbors WHERE book_id = ANY(%s) AND weight = 0
+    """, [touched])
+    cursor.execute("""
+        DELETE FROM book_neighbors
+        WHERE (book_id, neighbor_id) IN (
+            SELECT book_id, neighbor_id FROM (
+                SELECT book_id, neighbor_id, ROW_NUMBER() OVER (
+                    PARTITION BY book_id ORDER BY weight DESC, neighbor_id
+                ) AS rank
+                FROM book_neighbors
+                WHERE book_id = ANY(%s)
+            ) ranked
+            WHERE rank > %s
+        )
+    """, [touched, settings.LIBRARY_BOOK_NEIGHBORS_TOP_K])
+
+
+def rebuild_book_neighbors(top_k=None):
+    """
+    Recompute the whole co-rating graph from ``reviews``, keeping ``top_k``
+    neighbours per book, and return the number of rows written. The
+    suggestion builds version is incremented with it.
+    """
+    top_k = top_k or settings.LIBRARY_BOOK_NEIGHBORS_TOP_K
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM book_neighbors")
+        cursor.execute("""
+            INSERT INTO book_neighbors (book_id, neighbor_id, weight)
+            SELECT book_id, neighbor_id, weight
+            FROM (
+                SELECT a.book_id, b.book_id AS neighbor_id, COUNT(*) AS weight,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY a.book_id ORDER BY COUNT(*) DESC, b.book_id
+                       ) AS rank
+                FROM reviews a
+                JOIN reviews b ON a.user_id = b.user_id AND a.book_id != b.book_id
+                WHERE a.rating >= %s AND b.rating >= %s
+                GROUP BY a.book_id, b.book_id
+            ) ranked
+            WHERE rank <= %s
+        """, [HIGH_RATING, HIGH_RATING, top_k])
+        rows = cursor.rowcount
+        bump_suggestion_builds_version(cursor)
+        return rows
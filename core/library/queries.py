@@ -0,0 +1,316 @@
+import re
+
+from django.db import connection
+from library.affinity import HIGH_RATING
+from library.models import UserAffinity
+
+# Book column matched against each affinity dimension
+AFFINITY_COLUMNS = {
+    UserAffinity.DIMENSION_GENRE: 'books.genre',
+    UserAffinity.DIMENSION_AUTHOR: 'books.author',
+}
+
+# Same expression as the books_search_idx GIN index, so the planner uses it
+BOOK_SEARCH_VECTOR = (
+    "to_tsvector('simple'::regconfig, COALESCE(books.title, '') || ' ' || COALESCE(books.author, ''))"
+)
+# Predicate and relevance of a ``book_search_tsquery`` parameter
+BOOK_SEARCH_FILTER = f"{BOOK_SEARCH_VECTOR} @@ to_tsquery('simple', %s)"
+BOOK_SEARCH_RANK = f"ts_rank({BOOK_SEARCH_VECTOR}, to_tsquery('simple', %s))"
+BOOK_SEARCH_TERM = re.compile(r'[^\W_]+')
+
+
+def book_search_tsquery(text, max_terms=8):
+    """
+    Turn free text into a ``to_tsquery`` string matching books whose title
+    or author has a word starting with each term, or None without terms.
+    Only letters and digits are kept, so the result is always valid syntax.
+    """
+    terms = BOOK_SEARCH_TERM.findall(text)[:max_terms]
+    if not terms:
+        return None
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def books_by_affinity_query(user_id, dimension, limit=None):
+    """
+    Build the statement getting unreviewed books in the user's favourite
+    genres or authors, ranked by how many books the user rated highly in
+    each. Returns ``(sql, params)``; ``limit`` keeps only the top books
+    (``LIMIT NULL`` keeps all).
+    """
+    column = AFFINITY_COLUMNS[dimension]
+    return f"""
+        WITH favorites AS (
+            SELECT value, ROW_NUMBER() OVER (
+                ORDER BY high_rating_count DESC, value
+            ) AS rank
+            FROM user_affinity
+            WHERE user_id = %s AND dimension = %s AND high_rating_count > 0
+        )
+        SELECT books.id, books.title, books.author, books.genre
+        FROM favorites
+        JOIN books ON {column} = favorites.value
+        WHERE NOT EXISTS (
+            SELECT 1 FROM reviews
+            WHERE reviews.user_id = %s AND reviews.book_id = books.id
+        )
+        ORDER BY favorites.rank, books.id
+        LIMIT %s
+    """, [user_id, dimension, user_id, limit]
+
+
+def related_users_books_query(user_id, limit=None):
+    """
+    Build the statement getting books rated highly by users who share a
+    highly rated book with the user, ordered by how many of those users rated
+    each one, instead of pasting the intermediate ids back as parameters.
+    ``limit`` keeps only the top books.
+    """
+    return """
+        WITH liked AS (
+            SELECT book_id FROM reviews
+            WHERE user_id = %s AND rating >= %s
+        ), related_users AS (
+            SELECT DISTINCT reviews.user_id
+            FROM reviews
+            JOIN liked ON liked.book_id = reviews.book_id
+            WHERE reviews.rating >= %s AND reviews.user_id != %s
+        )
+        SELECT books.id, books.title, books.author, books.genre, COUNT(reviews.user_id) AS related_user_count
+        FROM related_users
+        JOIN reviews ON reviews.user_id = related_users.user_id
+        JOIN books ON books.id = reviews.book_id
+        WHERE reviews.rating >= %s AND NOT EXISTS (
+            SELECT 1 FROM reviews AS own
+            WHERE own.user_id = %s AND own.book_id = books.id
+        )
+        GROUP BY books.id, books.title, books.author, books.genre
+        ORDER BY related_user_count DESC, books.id
+        LIMIT %s
+    """, [user_id, HIGH_RATING, HIGH_RATING, user_id, HIGH_RATING, user_id, limit]
+
+
+def neighbor_books_query(user_id, limit=None):
+    """
+    Build the statement getting books co-rated highly with the user's highly
+    rated books, ordered by the summed co-rating weight, from the
+    book_neighbors graph. ``limit`` keeps only the top books.
+    """
+    return """
+        SELECT books.id, books.title, books.author, books.genre, SUM(book_neighbors.weight) AS score
+        FROM reviews
+        JOIN book_neighbors ON book_neighbors.book_id = reviews.book_id
+        JOIN books ON books.id = book_neighbors.neighbor_id
+        WHERE reviews.user_id = %s AND reviews.rating >= %s AND NOT EXISTS (
+            SELECT 1 FROM reviews AS own
+            WHERE own.user_id = %s AND own.book_id = books.id
+        )
+        GROUP BY books.id, books.title, books.author, books.genre
+        ORDER BY score DESC, books.id
+        LIMIT %s
+    """, [user_id, HIGH_RATING, user_id, limit]
+
+
+def books_in_order_query(book_ids, user_id):
+    """
+    Build the statement getting the given books, minus any the user has
+    reviewed, in ``book_ids`` order.
+    """
+    return """
+        SELECT books.id, books.title, books.author, books.genre
+        FROM unnest(%s::bigint[]) WITH ORDINALITY AS ranked (book_id, rank)
+        JOIN books ON books.id = ranked.book_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM reviews
+            WHERE reviews.user_id = %s AND reviews.book_id = books.id
+        )
+        ORDER BY ranked.rank
+    """, [list(book_ids), user_id]
+
+
+def ranked_books_query(ranking, genre='', user_id=None, limit=None):
+    """
+    Build the statement getting the books of a stored ranking (see
+    ``library.rankings``), overall or for ``genre``, in ranking order with
+    the score they were ranked by. With ``user_id``, books the user has
+    reviewed are left out. ``limit`` keeps only the top books.
+    """
+    unreviewed = """
+        AND NOT EXISTS (
+            SELECT 1 FROM reviews
+            WHERE reviews.user_id = %s AND reviews.book_id = books.id
+        )
+    """ if user_id is not None else ""
+    return f"""
+        SELECT books.id, books.title, books.author, books.genre, book_rankings.score
+        FROM book_rankings
+        JOIN books ON books.id = book_rankings.book_id
+        WHERE book_rankings.ranking = %s AND book_rankings.genre = %s {unreviewed}
+        ORDER BY book_rankings.position
+        LIMIT %s
+    """, [ranking, genre] + ([user_id] if user_id is not None else []) + [limit]
+
+
+def rankings_version_query():
+    """
+    Build the statement getting the version of the stored rankings (see
+    ``RankingsVersion``), 0 before the first refresh, as text.
+    """
+    return "SELECT COALESCE(MAX(version), 0)::text FROM book_rankings_version", []
+
+
+def suggestion_builds_version_query():
+    """
+    Build the statement getting the version of the suggestion builds (see
+    ``SuggestionBuildVersion``), 0 before the first build, as text.
+    """
+    return "SELECT COALESCE(MAX(version), 0)::text FROM suggestion_build_version", []
+
+
+def fetch_all(query):
+    """
+    Run a ``(sql, params)`` pair built above and return all rows.
+    """
+    sql, params = query
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def get_books_by_affinity(user_id, dimension, limit=None):
+    return fetch_all(books_by_affinity_query(user_id, dimension, limit))
+
+
+def get_related_users_books(user_id, limit=None):
+    return fetch_all(related_users_books_query(user_id, limit))
+
+
+def get_neighbor_books(user_id, limit=None):
+    return fetch_all(neighbor_books_query(user_id, limit))
+
+
+def get_books_in_order(book_ids, user_id):
+    return fetch_all(books_in_order_query(book_ids, user_id))
+
+
+def get_ranked_books_for_user(ranking, user_id, limit=None):
+    return fetch_all(ranked_books_query(ranking, user_id=user_id, limit=limit))
+
+
+# Strategies served by the combined suggestions endpoint
+SUGGESTION_STRATEGIES = ('genre', 'author', 'related')
+# Reciprocal rank fusion constant: a book at position p in a strategy scores
+# weight / (BLEND_RANK_OFFSET + p), so no single list dominates the blend
+BLEND_RANK_OFFSET = 60
+
+
+def _strategy_ctes(strategies):
+    """
+    Return the CTEs ranking the unreviewed books of each strategy as
+    ``<strategy>_ranked``, numbered by ``position``. The user's reviews are
+    read once, into ``own``.
+    """
+    ctes = ["""own AS MATERIALIZED (
+            SELECT book_id, rating FROM reviews WHERE user_id = %(user_id)s
+        )"""]
+    dimensions = [strategy for strategy in strategies if strategy in AFFINITY_COLUMNS]
+    if dimensions:
+        ctes.append("""favorites AS (
+            SELECT dimension, value, ROW_NUMBER() OVER (
+                PARTITION BY dimension ORDER BY high_rating_count DESC, value
+            ) AS rank
+            FROM user_affinity
+            WHERE user_id = %(user_id)s AND dimension = ANY(%(dimensions)s)
+            AND high_rating_count > 0
+        )""")
+    for dimension in dimensions:
+        ctes.append(f"""{dimension}_ranked AS (
+            SELECT books.id, books.title, books.author, books.genre, ROW_NUMBER() OVER (
+                ORDER BY favorites.rank, books.id
+            ) AS position
+            FROM favorites
+            JOIN books ON {AFFINITY_COLUMNS[dimension]} = favorites.value
+            WHERE favorites.dimension = '{dimension}'
+            AND NOT EXISTS (SELECT 1 FROM own WHERE own.book_id = books.id)
+        )""")
+    if 'related' in strategies:
+        ctes.append("""related_users AS (
+            SELECT DISTINCT reviews.user_id
+            FROM own
+            JOIN reviews ON reviews.book_id = own.book_id
+            WHERE own.rating >= %(high_rating)s AND reviews.rating >= %(high_rating)s
+            AND reviews.user_id != %(user_id)s
+        )""")
+        ctes.append("""related_ranked AS (
+            SELECT books.id, books.title, books.author, books.genre, ROW_NUMBER() OVER (
+                ORDER BY COUNT(reviews.user_id) DESC, books.id
+            ) AS position
+            FROM related_users
+            JOIN reviews ON reviews.user_id = related_users.user_id
+            JOIN books ON books.id = reviews.book_id
+            WHERE reviews.rating >= %(high_rating)s
+            AND NOT EXISTS (SELECT 1 FROM own WHERE own.book_id = books.id)
+            GROUP BY books.id, books.title, books.author, books.genre
+        )""")
+    params = {'user_id': None, 'dimensions': dimensions, 'high_rating': HIGH_RATING}
+    return f"WITH {', '.join(ctes)}", params
+
+
+def combined_suggestions_query(user_id, windows, top_k):
+    """
+    Build the statement getting a window of every strategy's suggestions at
+    once. ``windows`` maps each strategy to its ``(offset, limit)``; rows
+    are ``(strategy, id, title, author, genre, position)``, and one extra row
+    per strategy is returned when more follow. Orderings match the
+    single-strategy queries, and as there each list ends after ``top_k``.
+    """
+    with_sql, params = _strategy_ctes(windows)
+    params.update({'user_id': user_id, 'top_k': top_k})
+    selects = []
+    for strategy, (offset, limit) in windows.items():
+        params[f'{strategy}_start'] = offset
+        params[f'{strategy}_end'] = offset + limit + 1
+        selects.append(f"""
+            SELECT '{strategy}' AS strategy, id, title, author, genre, position FROM {strategy}_ranked
+            WHERE position > %({strategy}_start)s AND position <= LEAST(%({strategy}_end)s, %(top_k)s)""")
+    return f"""
+        {with_sql}
+        {' UNION ALL '.join(selects)}
+        ORDER BY strategy, position
+    """, params
+
+
+def blended_suggestions_query(user_id, weights, offset, limit, top_k):
+    """
+    Build the statement blending the strategies in ``weights`` (strategy to
+    weight) into one list by weighted reciprocal rank fusion of their first
+    ``top_k`` books, itself ending after ``top_k``. Rows are ``(id, title,
+    author, genre, score, strategies)``, with one extra row when more follow.
+    """
+    with_sql, params = _strategy_ctes(weights)
+    params.update({
+        'user_id': user_id,
+        'top_k': top_k,
+        'strategies': list(weights),
+        'weights': [float(weight) for weight in weights.values()],
+        'rank_offset': BLEND_RANK_OFFSET,
+        'offset': offset,
+        'limit': limit + 1,
+    })
+    ranked = ' UNION ALL '.join(
+        f"SELECT '{strategy}' AS strategy, id, title, author, genre, position FROM {strategy}_ranked "
+        f"WHERE position <= %(top_k)s"
+        for strategy in weights)
+    return f"""
+        {with_sql}, ranked AS ({ranked})
+        SELECT ranked.id, ranked.title, ranked.author, ranked.genre,
+               SUM(weights.weight / (%(rank_offset)s + ranked.position)) AS score,
+               array_agg(ranked.strategy ORDER BY ranked.position, ranked.strategy) AS strategies
+        FROM ranked
+        JOIN unnest(%(strategies)s::text[], %(weights)s::float8[])
+            AS weights (strategy, weight) ON weights.strategy = ranked.strategy
+        GROUP BY ranked.id, ranked.title, ranked.author, ranked.genre
+        ORDER BY score DESC, ranked.id
+        LIMIT LEAST(%(limit)s, %(top_k)s - %(offset)s) OFFSET %(offset)s
+    """, params
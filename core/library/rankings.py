@@ -0,0 +1,131 @@
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import connection, transaction
+from library import adb
+from library.models import BookRanking
+from library.queries import fetch_all, ranked_books_query
+from library.suggestion_cache import SUGGESTION_KEY_PREFIX, aget_versions, get_cache, get_versions
+
+RANKINGS_KEY_PREFIX = f'{SUGGESTION_KEY_PREFIX}:rankings'
+
+# Scores are stored rounded so they render the same with every JSON encoder
+SCORE_DECIMALS = 4
+
+
+def top_rated_query():
+    """
+    Build the statement inserting the top-rated rankings, overall and per
+    genre, from the books' rating aggregates. Each book scores its Bayesian
+    average: ``LIBRARY_TOP_RATED_PRIOR_WEIGHT`` reviews at the catalog's mean
+    rating are added to its own, so a few 5-star reviews do not outrank
+    hundreds of 4-star ones.
+    """
+    weight = settings.LIBRARY_TOP_RATED_PRIOR_WEIGHT
+    top_k = settings.LIBRARY_RANKING_TOP_K
+    return f"""
+        WITH prior AS (
+            SELECT COALESCE(SUM(rating_sum)::float8 / NULLIF(SUM(rating_count), 0), 0) AS mean
+            FROM books
+        ), ranked AS (
+            SELECT id, genre, score,
+                   ROW_NUMBER() OVER (ORDER BY score DESC, id) AS overall,
+                   ROW_NUMBER() OVER (PARTITION BY genre ORDER BY score DESC, id) AS in_genre
+            FROM (
+                SELECT books.id, books.genre,
+                       (%s * prior.mean + books.rating_sum) / (%s + books.rating_count) AS score
+                FROM books, prior
+                WHERE books.rating_count > 0
+            ) scored
+        )
+        INSERT INTO book_rankings (ranking, genre, position, book_id, score)
+        SELECT %s, '', overall, id, ROUND(score::numeric, {SCORE_DECIMALS})::float8
+        FROM ranked WHERE overall <= %s
+        UNION ALL
+        SELECT %s, genre, in_genre, id, ROUND(score::numeric, {SCORE_DECIMALS})::float8
+        FROM ranked WHERE in_genre <= %s
+    """, [weight, weight, BookRanking.RANKING_TOP_RATED, top_k, BookRanking.RANKING_TOP_RATED, top_k]
+
+
+def trending_query():
+    """
+    Build the statement inserting the trending ranking: each review of the
+    last ``LIBRARY_TRENDING_WINDOW_DAYS`` counts for its book, halved every
+    ``LIBRARY_TRENDING_HALF_LIFE_HOURS`` of age, so the score follows the
+    recent review velocity.
+    """
+    return f"""
+        INSERT INTO book_rankings (ranking, genre, position, book_id, score)
+        SELECT %s, '', ROW_NUMBER() OVER (ORDER BY score DESC, book_id), book_id,
+               ROUND(score::numeric, {SCORE_DECIMALS})::float8
+        FROM (
+            SELECT book_id, SUM(power(
+                0.5, GREATEST(EXTRACT(EPOCH FROM now() - created_at)::float8, 0) / %s
+            )) AS score
+            FROM reviews
+            WHERE created_at > now() - %s * interval '1 day'
+            GROUP BY book_id
+        ) scored
+        ORDER BY score DESC, book_id
+        LIMIT %s
+    """, [BookRanking.RANKING_TRENDING, settings.LIBRARY_TRENDING_HALF_LIFE_HOURS * 3600,
+          settings.LIBRARY_TRENDING_WINDOW_DAYS, settings.LIBRARY_RANKING_TOP_K]
+
+
+RANKING_QUERIES = {
+    BookRanking.RANKING_TOP_RATED: top_rated_query,
+    BookRanking.RANKING_TRENDING: trending_query,
+}
+
+
+def refresh_book_rankings(rankings=None):
+    """
+    Replace the stored ``rankings`` (all by default) with freshly computed
+    ones in a single transaction, so readers see either the old or the new
+    lists, and return the number of rows stored per ranking. The rankings
+    version is incremented in the same transaction, so every process sees
+    it change with the lists.
+    """
+    counts = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for ranking in rankings or RANKING_QUERIES:
+            cursor.execute("DELETE FROM book_rankings WHERE ranking = %s", [ranking])
+            cursor.execute(*RANKING_QUERIES[ranking]())
+            counts[ranking] = cursor.rowcount
+        cursor.execute("""
+            INSERT INTO book_rankings_version (id, version) VALUES (1, 1)
+            ON CONFLICT (id) DO UPDATE SET version = book_rankings_version.version + 1
+        """)
+    return counts
+
+
+def _ranked_books_key(versions, ranking, genre):
+    # Genres are free text, so they are quoted to stay valid cache keys
+    return f"{RANKINGS_KEY_PREFIX}:{versions[0]}:{versions[2]}:{ranking}:{quote(genre)}"
+
+
+def get_ranked_books(ranking, genre=''):
+    """
+    Return the rows of a stored ranking (see ``ranked_books_query``), overall
+    or for ``genre``, cached until the catalog or the rankings change.
+    """
+    cache = get_cache()
+    key = _ranked_books_key(get_versions(None, ('rankings',)), ranking, genre)
+    rows = cache.get(key)
+    if rows is None:
+        rows = fetch_all(ranked_books_query(ranking, genre))
+        cache.set(key, rows, settings.LIBRARY_SUGGESTION_CACHE_TIMEOUT)
+    return rows
+
+
+async def aget_ranked_books(ranking, genre=''):
+    """
+    Async ``get_ranked_books``, sharing its cache entries.
+    """
+    cache = get_cache()
+    key = _ranked_books_key(await aget_versions(None, ('rankings',)), ranking, genre)
+    rows = await cache.aget(key)
+    if rows is None:
+        rows = await adb.fetch_all(ranked_books_query(ranking, genre))
+        await cache.aset(key, rows, settings.LIBRARY_SUGGESTION_CACHE_TIMEOUT)
+    return rows
@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from library.suggestion_cache import bump_ratings_versions
+
+RATINGS = range(1, 6)
+
+# Columns of ``books`` holding the aggregates, in SELECT order
+RATING_COLUMNS = ('rating_count', 'rating_avg') + tuple(f'rating_{rating}' for rating in RATINGS)
+
+AGGREGATE_SQL = f"""
+    SELECT books.id AS book_id,
+           COUNT(reviews.rating) AS rating_count,
+           COALESCE(SUM(reviews.rating), 0) AS rating_sum,
+           {', '.join(f'COUNT(*) FILTER (WHERE reviews.rating = {rating}) AS rating_{rating}' for rating in RATINGS)}
+    FROM books
+    LEFT JOIN reviews ON reviews.book_id = books.id
+    GROUP BY books.id
+"""
+
+
+def get_rating_deltas(changes):
+    """
+    Return ``{book_id: [count, sum, rating_1, ..., rating_5]}`` deltas for
+    ``(user_id, book_id, old_rating, new_rating)`` changes, leaving out
+    books whose aggregates do not change.
+    """
+    deltas = defaultdict(lambda: [0] * (2 + len(RATINGS)))
+    for _, book_id, old_rating, new_rating in changes:
+        for rating, sign in ((old_rating, -1), (new_rating, 1)):
+            if rating is not None:
+                delta = deltas[book_id]
+                delta[0] += sign
+                delta[1] += sign * rating
+                delta[1 + rating] += sign
+    return {book_id: delta for book_id, delta in deltas.items() if any(delta)}
+
+
+def update_book_ratings(cursor, changes):
+    """
+    Patch the rating aggregates of the books touched by review writes, given
+    as ``(user_id, book_id, old_rating, new_rating)`` tuples (ratings are
+    None when a review is created or deleted), in one statement. Must run in
+    the same transaction as the writes; the ratings versions of the books'
+    genres are bumped once it commits.
+    """
+    deltas = get_rating_deltas(changes)
+    if not deltas:
+        return
+    # Sorted so concurrent writers lock the books in the same order
+    rows = sorted((book_id, *delta) for book_id, delta in deltas.items())
+    histogram = ', '.join(
+        f"rating_{rating} = GREATEST(books.rating_{rating} + deltas.rating_{rating}, 0)" for rating in RATINGS)
+    cursor.execute(f"""
+        UPDATE books
+        SET rating_count = GREATEST(books.rating_count + deltas.rating_count, 0),
+            rating_sum = GREATEST(books.rating_sum + deltas.rating_sum, 0),
+            rating_avg = (books.rating_sum + deltas.rating_sum)::float8
+                / NULLIF(books.rating_count + deltas.rating_count, 0),
+            {histogram}
+        FROM (
+            SELECT * FROM unnest(%s::bigint[], {', '.join(['%s::int[]'] * (2 + len(RATINGS)))})
+            ORDER BY 1
+        ) AS deltas (book_id, rating_count, rating_sum, {', '.join(f'rating_{rating}' for rating in RATINGS)})
+        WHERE books.id = deltas.book_id
+        RETURNING books.genre
+    """, [list(column) for column in zip(*rows)])
+    genres = {row[0] for row in cursor.fetchall()}
+    transaction.on_commit(lambda: bump_ratings_versions(genres))
+
+
+def rebuild_book_ratings():
+    """
+    Recompute the rating aggregates of every book from ``reviews`` and
+    return the number of books whose stored aggregates were wrong. Must run
+    in a transaction: review writes wait until it ends, so none of their
+    deltas is overwritten by the recomputed values. The ratings versions of
+    the corrected books' genres are bumped once it commits.
+    """
+    columns = ('rating_count', 'rating_sum') + tuple(f'rating_{rating}' for rating in RATINGS)
+    with connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE reviews IN SHARE MODE")
+        cursor.execute(f"""
+            UPDATE books
+            SET {', '.join(f'{column} = aggregates.{column}' for column in columns)},
+                rating_avg = aggregates.rating_sum::float8 / NULLIF(aggregates.rating_count, 0)
+            FROM ({AGGREGATE_SQL}) aggregates
+            WHERE books.id = aggregates.book_id
+            AND ({', '.join(f'books.{column}' for column in columns)}, books.rating_avg)
+                IS DISTINCT FROM
+                ({', '.join(f'aggregates.{column}' for column in columns)},
+                 aggregates.rating_sum::float8 / NULLIF(aggregates.rating_count, 0))
+            RETURNING books.genre
+        """)
+        genres = [row[0] for row in cursor.fetchall()]
+    if genres:
+        transaction.on_commit(lambda: bump_ratings_versions(set(genres)))
+    return len(genres)
@@ -0,0 +1,36 @@
+from library.affinity import is_high_rating, refresh_user_affinity, update_user_affinity
+from library.neighbors import update_book_neighbors
+from library.ratings import update_book_ratings
+from library.suggestion_cache import invalidate_suggestions
+
+
+def on_review_changed(cursor, user_id, book_id, old_rating, new_rating):
+    """
+    Keep the data derived from ``reviews`` in step with a single review write.
+    ``old_rating`` is None for a new review and ``new_rating`` is None for a
+    deleted one. Must run in the same transaction as the write itself.
+    """
+    update_user_affinity(cursor, user_id, book_id, old_rating, new_rating)
+    changes = [(user_id, book_id, old_rating, new_rating)]
+    update_book_ratings(cursor, changes)
+    update_book_neighbors(cursor, changes)
+    invalidate_suggestions(cursor, changes)
+
+
+def on_reviews_changed(cursor, changes):
+    """
+    Bulk counterpart of ``on_review_changed`` for ``(user_id, book_id,
+    old_rating, new_rating)`` tuples written in one batch. Affinity is
+    recomputed per affected user instead of patched per row.
+    """
+    if not changes:
+        return
+    crossed = [
+        change for change in changes
+        if is_high_rating(change[2]) != is_high_rating(change[3])
+    ]
+    if crossed:
+        refresh_user_affinity(cursor, {user_id for user_id, _, _, _ in crossed})
+    update_book_ratings(cursor, changes)
+    update_book_neighbors(cursor, changes)
+    invalidate_suggestions(cursor, changes)
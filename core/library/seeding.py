@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from library.affinity import rebuild_user_affinity
+from library.neighbors import rebuild_book_neighbors
+from library.rankings import refresh_book_rankings
+from library.ratings import rebuild_book_ratings
+from library.suggestion_cache import bump_catalog_version, bump_user_versions
+
+SEED_USERNAME_PREFIX = 'seed-user-'
+SEED_PASSWORD = 'seed-password'
+
+# Share of 1-5 star ratings; reviews skew positive like real catalogs
+RATING_WEIGHTS = (0.05, 0.10, 0.20, 0.35, 0.30)
+# Reviews are spread uniformly over this many days before the seed
+REVIEW_HISTORY_DAYS = 30
+
+
+def zipf_sampler(rng, n, skew):
+    """
+    Return a function drawing ``size`` ranks in ``[0, n)`` where rank ``k``
+    is picked with probability proportional to ``1 / (k + 1) ** skew``.
+    """
+    cdf = np.cumsum(1.0 / np.arange(1, n + 1) ** skew)
+    cdf /= cdf[-1]
+    return lambda size: np.minimum(np.searchsorted(cdf, rng.random(size)), n - 1)
+
+
+def flush_library():
+    """
+    Delete every book and review, the tables derived from them and the
+    users created by a previous seed.
+    """
+    User = get_user_model()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "TRUNCATE reviews, user_affinity, book_neighbors, book_rankings, books RESTART IDENTITY")
+    User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).delete()
+    bump_catalog_version()
+
+
+def seed_library(users, books, genres, authors, reviews_per_user, skew=1.1, seed=0):
+    """
+    Generate a synthetic catalog and return the number of rows created per
+    table.
+
+    Genres and authors are assigned to books, and books to reviews, with a
+    Zipf distribution of exponent ``skew``, so a few popular books collect
+    most reviews as in real data. The number of reviews per user is
+    Poisson-distributed around ``reviews_per_user``. Rows are loaded with
+    COPY and the derived tables, rating aggregates and rankings are rebuilt
+    afterwards.
+    """
+    rng = np.random.default_rng(seed)
+    User = get_user_model()
+
+    with transaction.atomic():
+        # Hash once: the default hasher takes ~100ms per password
+        password = make_password(SEED_PASSWORD)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM books")
+            first_book_id = cursor.fetchone()[0] + 1
+        start = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).count()
+        created = User.objects.bulk_create(
+            User(username=f"{SEED_USERNAME_PREFIX}{start + i}", password=password)
+            for i in range(users)
+        )
+        user_ids = np.array([user.pk for user in created], dtype=np.int64)
+
+        book_genres = zipf_sampler(rng, genres, skew)(books)
+        book_authors = zipf_sampler(rng, authors, skew)(books)
+        with connection.cursor() as cursor:
+            with cursor.copy("COPY books (title, author, genre) FROM STDIN") as copy:
+                for i in range(books):
+                    copy.write_row((f"Book {first_book_id + i}",
+                                    f"Author {book_authors[i]}", f"Genre {book_genres[i]}"))
+            cursor.execute("""
+                SELECT id FROM books WHERE id >= %s ORDER BY id
+            """, [first_book_id])
+            book_ids = np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+
+            # Popularity is independent of the id order, so shuffle the ranks
+            popularity = rng.permutation(books)
+            counts = np.maximum(rng.poisson(reviews_per_user, users), 1)
+            reviewers = np.repeat(np.arange(users), counts)
+            picks = popularity[zipf_sampler(rng, books, skew)(len(reviewers))]
+            # Drawing with replacement can pick a book twice for one user
+            pairs = np.unique(reviewers * books + picks)
+            reviewers, picks = pairs // books, pairs % books
+            ratings = rng.choice(np.arange(1, 6), size=len(pairs), p=RATING_WEIGHTS)
+            ages = rng.random(len(pairs)) * REVIEW_HISTORY_DAYS * 86400
+            now = timezone.now()
+            with cursor.copy("COPY reviews (user_id, book_id, rating, created_at) FROM STDIN") as copy:
+                for user_id, book_id, rating, age in zip(
+                        user_ids[reviewers].tolist(), book_ids[picks].tolist(), ratings.tolist(),
+                        ages.tolist()):
+                    copy.write_row((user_id, book_id, rating, now - timedelta(seconds=age)))
+
+        affinity = rebuild_user_affinity()
+        neighbors = rebuild_book_neighbors()
+        ratings = rebuild_book_ratings()
+        rankings = refresh_book_rankings()
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE books, reviews, user_affinity, book_neighbors, book_rankings")
+    bump_catalog_version()
+    bump_user_versions(user_ids.tolist())
+    return {
+        'users': users,
+        'books': books,
+        'reviews': len(pairs),
+        'user_affinity': affinity,
+        'book_neighbors': neighbors,
+        'book_ratings': ratings,
+        'book_rankings': sum(rankings.values()),
+    }
@@ -0,0 +1,236 @@
+from urllib.parse import quote
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from library import adb
+from library.affinity import HIGH_RATING, is_high_rating
+from library.queries import fetch_all, rankings_version_query, suggestion_builds_version_query
+
+SUGGESTION_KEY_PREFIX = 'library:suggestions'
+CATALOG_VERSION_KEY = f'{SUGGESTION_KEY_PREFIX}:version:catalog'
+RATINGS_VERSION_KEY = f'{SUGGESTION_KEY_PREFIX}:version:ratings'
+# Versions of data shared by every user, for the responses showing it, kept
+# in the database with the data: ``rankings`` (see ``RankingsVersion``) is
+# incremented by every refresh and ``builds`` (see ``SuggestionBuildVersion``)
+# by every suggestion build, which run in their own process
+SCOPE_VERSION_QUERIES = {
+    'rankings': rankings_version_query,
+    'builds': suggestion_builds_version_query,
+}
+STATS_NAMES = ('hits', 'misses')
+
+
+def get_cache():
+    return caches[settings.LIBRARY_SUGGESTION_CACHE_ALIAS]
+
+
+def check_shared_cache():
+    """
+    Raise ImproperlyConfigured when ``LIBRARY_SUGGESTION_CACHE_REQUIRE_SHARED``
+    is set but the suggestion cache is local memory, where the versions
+    bumped by a review write never reach the other processes, which would
+    keep serving stale suggestions and 304s.
+    """
+    if settings.LIBRARY_SUGGESTION_CACHE_REQUIRE_SHARED and isinstance(get_cache(), LocMemCache):
+        raise ImproperlyConfigured(
+            f"The {settings.LIBRARY_SUGGESTION_CACHE_ALIAS!r} cache must be shared between processes "
+            "(e.g. Redis or Memcached): set CACHE_BACKEND and CACHE_LOCATION.")
+
+
+def _version_key(user_id):
+    return f"{SUGGESTION_KEY_PREFIX}:version:{user_id}"
+
+
+def _versions_keys(user_id):
+    return [CATALOG_VERSION_KEY] + ([_version_key(user_id)] if user_id is not None else [])
+
+
+def _get_versions(versions, user_id, scopes, stored, keys):
+    return (versions[CATALOG_VERSION_KEY], versions.get(_version_key(user_id), ''),
+            *(stored[scope] for scope in scopes), *(versions[key] for key in keys))
+
+
+def _stats_key(name):
+    return f"{SUGGESTION_KEY_PREFIX}:stats:{name}"
+
+
+def get_versions(user_id, scopes=(), keys=()):
+    """
+    Return the ``(catalog_version, user_version)`` pair, with an empty user
+    version for anonymous (None) users, followed by the version of each
+    scope in ``scopes`` (see SCOPE_VERSION_QUERIES), each read with a query,
+    and the cached versions under ``keys`` (e.g. ``ratings_version_keys``).
+    Cached versions are read in one round trip; a missing (or evicted) one
+    gets a fresh token so older entries can never match again.
+    """
+    stored = {scope: fetch_all(SCOPE_VERSION_QUERIES[scope]())[0][0] for scope in scopes}
+    cache = get_cache()
+    all_keys = _versions_keys(user_id) + list(keys)
+    versions = cache.get_many(all_keys)
+    missing = [key for key in all_keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid4().hex, None)
+        versions.update(cache.get_many(missing))
+    return _get_versions(versions, user_id, scopes, stored, keys)
+
+
+def bump_catalog_version():
+    """
+    Give the catalog a new version after books change, orphaning every
+    cached suggestion, book count and book list ETag.
+    """
+    get_cache().set(CATALOG_VERSION_KEY, uuid4().hex, None)
+
+
+def ratings_version_keys(genres=None):
+    """
+    Return the cache keys of the rating aggregates versions: that of each
+    genre in ``genres``, or the catalog-wide one when None.
+    """
+    if genres is None:
+        return [RATINGS_VERSION_KEY]
+    # Genres are free text, so they are quoted to stay valid cache keys
+    return [f"{RATINGS_VERSION_KEY}:{quote(genre)}" for genre in sorted(genres)]
+
+
+def bump_ratings_versions(genres):
+    """
+    Give the catalog-wide ratings version and that of every genre in
+    ``genres`` a new version after the rating aggregates of their books
+    change, orphaning the book list ETags showing them.
+    """
+    get_cache().set_many(
+        {key: uuid4().hex for key in ratings_version_keys() + ratings_version_keys(genres)}, None)
+
+
+def bump_suggestion_builds_version(cursor):
+    """
+    Increment the ``builds`` version after rebuilding data the related-user
+    suggestions are read from, in the rebuild's transaction when it has one.
+    """
+    cursor.execute("""
+        INSERT INTO suggestion_build_version (id, version) VALUES (1, 1)
+        ON CONFLICT (id) DO UPDATE SET version = suggestion_build_version.version + 1
+    """)
+
+
+def bump_user_versions(user_ids):
+    """
+    Give every user in ``user_ids`` a new version, orphaning their cached
+    suggestions, in a single cache round trip.
+    """
+    if user_ids:
+        get_cache().set_many(
+            {_version_key(user_id): uuid4().hex for user_id in user_ids}, None)
+
+
+def _incr_stat(name):
+    cache = get_cache()
+    try:
+        cache.incr(_stats_key(name))
+    except ValueError:
+        if not cache.add(_stats_key(name), 1, None):
+            cache.incr(_stats_key(name))
+
+
+def _suggestions_key(user_id, versions, strategy):
+    return f"{SUGGESTION_KEY_PREFIX}:{user_id}:{':'.join(versions)}:{strategy}"
+
+
+def get_cached_suggestions(user_id, strategy, compute, scopes=()):
+    """
+    Return the user's suggestion rows for ``strategy`` from the cache, or
+    call ``compute`` and cache its result under the current catalog and
+    user versions and those of the shared ``scopes`` it reads.
+    """
+    cache = get_cache()
+    key = _suggestions_key(user_id, get_versions(user_id, scopes), strategy)
+    rows = cache.get(key)
+    if rows is not None:
+        _incr_stat('hits')
+        return rows
+    _incr_stat('misses')
+    rows = compute()
+    cache.set(key, rows, settings.LIBRARY_SUGGESTION_CACHE_TIMEOUT)
+    return rows
+
+
+async def aget_versions(user_id, scopes=(), keys=()):
+    stored = {scope: (await adb.fetch_one(SCOPE_VERSION_QUERIES[scope]()))[0] for scope in scopes}
+    cache = get_cache()
+    all_keys = _versions_keys(user_id) + list(keys)
+    versions = await cache.aget_many(all_keys)
+    missing = [key for key in all_keys if key not in versions]
+    if missing:
+        for key in missing:
+            await cache.aadd(key, uuid4().hex, None)
+        versions.update(await cache.aget_many(missing))
+    return _get_versions(versions, user_id, scopes, stored, keys)
+
+
+async def _aincr_stat(name):
+    cache = get_cache()
+    try:
+        await cache.aincr(_stats_key(name))
+    except ValueError:
+        if not await cache.aadd(_stats_key(name), 1, None):
+            await cache.aincr(_stats_key(name))
+
+
+async def aget_cached_suggestions(user_id, strategy, compute, scopes=()):
+    """
+    Async ``get_cached_suggestions``: ``compute`` is awaited on a miss.
+    Both share the same keys, so sync and async views share entries.
+    """
+    cache = get_cache()
+    key = _suggestions_key(user_id, await aget_versions(user_id, scopes), strategy)
+    rows = await cache.aget(key)
+    if rows is not None:
+        await _aincr_stat('hits')
+        return rows
+    await _aincr_stat('misses')
+    rows = await compute()
+    await cache.aset(key, rows, settings.LIBRARY_SUGGESTION_CACHE_TIMEOUT)
+    return rows
+
+
+def get_suggestion_cache_stats():
+    """
+    Return the shared hit/miss counters.
+    """
+    values = get_cache().get_many([_stats_key(name) for name in STATS_NAMES])
+    return {name: values.get(_stats_key(name), 0) for name in STATS_NAMES}
+
+
+def invalidate_suggestions(cursor, changes):
+    """
+    Bump the suggestion versions affected by review writes once the
+    transaction commits. ``changes`` holds ``(user_id, book_id, old_rating,
+    new_rating)`` tuples. Writers are always affected; when a review crosses
+    the high rating threshold, so is every user who shares a highly rated
+    book with its writer, because their related-user suggestions include the
+    writer's ratings.
+    """
+    affected = {user_id for user_id, _, _, _ in changes}
+    crossed = [
+        (user_id, book_id) for user_id, book_id, old_rating, new_rating in changes
+        if is_high_rating(old_rating) != is_high_rating(new_rating)
+    ]
+    if crossed:
+        cursor.execute("""
+            SELECT DISTINCT user_id
+            FROM reviews
+            WHERE rating >= %s AND book_id IN (
+                SELECT book_id FROM reviews WHERE user_id = ANY(%s) AND rating >= %s
+                UNION ALL
+                SELECT unnest(%s::bigint[])
+            )
+        """, [HIGH_RATING, [user_id for user_id, _ in crossed], HIGH_RATING,
+              [book_id for _, book_id in crossed]])
+        affected.update(row[0] for row in cursor.fetchall())
+    transaction.on_commit(lambda: bump_user_versions(affected))
@@ -1,3 +1,553 @@
-from django.test import TestCase
+import asyncio
+from threading import Thread
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import NotAuthenticated, ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.test import APITestCase
+from library import adb
+from library.api.v1.filters import BookFilterCompiler
+from library.backends.postgresql.base import DatabaseWrapper
+from library.cf import compute_related_users_suggestions
+from library.ingest import import_batch, upsert_reviews
+from library.management.commands.check_query_indexes import check_probes
+from library.models import Book
+from library.neighbors import get_neighbor_deltas, rebuild_book_neighbors
+from library.queries import book_search_tsquery
+from library.rankings import refresh_book_rankings
+from library.ratings import rebuild_book_ratings
+from library.seeding import seed_library
+from library.suggestion_cache import bump_catalog_version, check_shared_cache, get_versions
+
+User = get_user_model()
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_wrapper(self, **settings):
+        return DatabaseWrapper({**connection.settings_dict, **settings}, alias='pool-test')
+
+    def tearDown(self):
+        self.make_wrapper().close_pool()
+
+    def test_pool_is_shared_per_connection_parameters(self):
+        self.assertIs(self.make_wrapper().pool, self.make_wrapper().pool)
+
+    def test_pool_follows_settings_changes(self):
+        wrapper = self.make_wrapper()
+        pool = wrapper.pool
+        wrapper.settings_dict['NAME'] = 'renamed'
+
+        self.assertIsNot(wrapper.pool, pool)
+        self.assertTrue(pool.closed)
+
+    def test_close_pool_closes_every_pool_of_the_alias(self):
+        wrapper = self.make_wrapper()
+        pool = wrapper.pool
+        wrapper.close_pool()
+
+        self.assertTrue(pool.closed)
+        self.assertIsNot(wrapper.pool, pool)
+
+
+class ConcurrentReviewWriteTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'password')
+        self.book = Book.objects.create(title='Dune', author='Frank Herbert', genre='Science Fiction')
+        upsert_reviews(self.user.pk, {self.book.pk: 3})
+
+    def write_while_locked(self, hold, write):
+        """
+        Run ``write`` in another connection while ``hold`` runs in an open
+        transaction, committed once ``write`` waits on its locks, and return
+        the result of ``write``.
+        """
+        result = []
+
+        def target():
+            try:
+                result.append(write())
+            finally:
+                connection.close()
+
+        thread = Thread(target=target)
+        with transaction.atomic():
+            hold()
+            thread.start()
+            with connection.cursor() as cursor:
+                while thread.is_alive():
+                    cursor.execute("SELECT count(*) FROM pg_locks WHERE NOT granted")
+                    if cursor.fetchone()[0]:
+                        break
+        thread.join()
+        return result[0]
+
+    def assertRatings(self, **counts):
+        book = Book.objects.get(pk=self.book.pk)
+        ratings = {f'rating_{value}': getattr(book, f'rating_{value}') for value in range(1, 6)}
+        self.assertEqual(ratings, {f'rating_{value}': 0 for value in range(1, 6)} | counts)
+        self.assertEqual(book.rating_count, sum(counts.values()))
+
+    def test_upsert_reads_the_rating_committed_while_it_waited(self):
+        results = self.write_while_locked(
+            lambda: upsert_reviews(self.user.pk, {self.book.pk: 2}),
+            lambda: upsert_reviews(self.user.pk, {self.book.pk: 4}))
+
+        self.assertEqual(results, {self.book.pk: (True, 2, 4)})
+        self.assertRatings(rating_4=1)
+
+    def test_import_updates_a_review_inserted_while_it_waited(self):
+        other = User.objects.create_user('other', 'password')
+        report = self.write_while_locked(
+            lambda: upsert_reviews(other.pk, {self.book.pk: 2}),
+            lambda: import_batch([(1, {'user_id': other.pk, 'book_id': self.book.pk, 'rating': 5})]))
+
+        self.assertEqual((report['inserted'], report['updated']), (0, 1))
+        self.assertRatings(rating_3=1, rating_5=1)
+
+
+class RatingAggregateTests(TestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f'reader{number}', 'password') for number in range(2)]
+        self.books = [Book.objects.create(title=f'Book {number}', author='Author', genre='Fantasy')
+                      for number in range(2)]
+
+    def test_writes_keep_the_aggregates_of_a_rebuild(self):
+        upsert_reviews(self.users[0].pk, {self.books[0].pk: 5, self.books[1].pk: 2})
+        upsert_reviews(self.users[0].pk, {self.books[0].pk: 3})
+        import_batch([
+            (1, {'user_id': self.users[1].pk, 'book_id': self.books[0].pk, 'rating': 4}),
+            (2, {'user_id': self.users[0].pk, 'book_id': self.books[1].pk, 'rating': 2}),
+        ])
+
+        book = Book.objects.get(pk=self.books[0].pk)
+        self.assertEqual((book.rating_count, book.rating_sum, book.rating_3, book.rating_4, book.rating_5),
+                         (2, 7, 1, 1, 0))
+        self.assertEqual(book.rating_avg, 3.5)
+        with transaction.atomic():
+            self.assertEqual(rebuild_book_ratings(), 0)
+
+
+class RankingsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', 'password')
+        self.books = [Book.objects.create(title=f'Book {number}', author='Author', genre='Fantasy')
+                      for number in range(2)]
+        upsert_reviews(self.user.pk, {self.books[0].pk: 5})
+        refresh_book_rankings()
+
+    def get_top_rated(self, **headers):
+        return self.client.get(reverse('library:top-rated'), **headers)
+
+    def test_refreshes_from_another_process_change_the_etag(self):
+        response = self.get_top_rated()
+        self.assertEqual([book['id'] for book in response.json()['results']], [self.books[0].pk])
+
+        upsert_reviews(self.user.pk, {self.books[1].pk: 5})
+        # The refresher process does not share a local memory cache
+        with override_settings(
+                CACHES={**settings.CACHES, 'refresher': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'refresher'}},
+                LIBRARY_SUGGESTION_CACHE_ALIAS='refresher'):
+            refresh_book_rankings()
+
+        response = self.get_top_rated(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class ReviewWriteInvalidationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.writer = User.objects.create_user('writer', 'password')
+        self.reader = User.objects.create_user('reader', 'password')
+        self.fantasy = Book.objects.create(title='The Hobbit', author='J. R. R. Tolkien', genre='Fantasy')
+        self.poetry = Book.objects.create(title='Ariel', author='Sylvia Plath', genre='Poetry')
+
+    def get_book_list(self, genre, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('library:book_list'), {'genre': genre}, **headers)
+
+    def test_book_list_etag_only_changes_with_its_genres(self):
+        etag, all_etag = self.get_book_list('Fantasy')['ETag'], self.get_book_list('')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_reviews(self.writer.pk, {self.poetry.pk: 4})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_book_list('Fantasy', etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.get_book_list('', all_etag).status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_reviews(self.writer.pk, {self.fantasy.pk: 4})
+        response = self.get_book_list('Fantasy', etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'][0]['rating_count'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_writes_only_bump_the_affected_users(self):
+        writer_versions, reader_versions = get_versions(self.writer.pk), get_versions(self.reader.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_reviews(self.writer.pk, {self.poetry.pk: 4})
+
+        self.assertNotEqual(get_versions(self.writer.pk), writer_versions)
+        self.assertEqual(get_versions(self.reader.pk), reader_versions)
+
+
+class SharedCacheTests(SimpleTestCase):
+
+    @override_settings(LIBRARY_SUGGESTION_CACHE_REQUIRE_SHARED=True)
+    def test_local_memory_cache_is_refused_when_required(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_shared_cache()
+
+    @override_settings(
+        LIBRARY_SUGGESTION_CACHE_REQUIRE_SHARED=True,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                            'LOCATION': '/tmp/library-shared-cache-test'}})
+    def test_shared_cache_is_accepted(self):
+        check_shared_cache()
+
+
+class BookFilterCompilerTests(SimpleTestCase):
+
+    def compile(self, user_id=None, **query_params):
+        return BookFilterCompiler(query_params, user_id).compile()
+
+    def test_unrelated_parameters_are_ignored(self):
+        self.assertEqual(self.compile(page='2', q='dune', title='Dune'), ([], []))
+
+    def test_unknown_lookups_are_rejected(self):
+        for name in ['genre__contains', 'rating__lt', 'id__in', 'rated__not']:
+            with self.subTest(name), self.assertRaises(ValidationError):
+                self.compile(user_id=1, **{name: '1'})
+
+    def test_malformed_values_are_rejected(self):
+        cases = {
+            'id__gt': 'abc',
+            'rating__gte': '4.5',
+            'rated': 'maybe',
+            'genre__in': ' , ,',
+            'author__in': ','.join(f'Author {number}' for number in range(51)),
+        }
+        for name, value in cases.items():
+            with self.subTest(name), self.assertRaises(ValidationError):
+                self.compile(user_id=1, **{name: value})
+
+    def test_user_filters_require_a_user(self):
+        for name, value in [('rated', 'true'), ('rating__gte', '4')]:
+            with self.subTest(name), self.assertRaises(NotAuthenticated):
+                self.compile(**{name: value})
+
+    def test_values_are_bound_as_parameters(self):
+        self.assertEqual(self.compile(genre__in='Poetry'), (['books.genre = %s'], ['Poetry']))
+        self.assertEqual(self.compile(author__in='B, A, B'), (['books.author = ANY(%s)'], [['B', 'A']]))
+        self.assertEqual(self.compile(genre="'; DROP TABLE books; --"),
+                         (['books.genre = %s'], ["'; DROP TABLE books; --"]))
+
+    def test_user_filters_are_not_cached(self):
+        compiler = BookFilterCompiler({'genre': 'Poetry', 'page': '2'})
+        self.assertEqual(compiler.get_cache_values(), {'genre': 'Poetry'})
+        self.assertIsNone(BookFilterCompiler({'genre': 'Poetry', 'rated': 'false'}, 1).get_cache_values())
+
+    def test_genres_intersect_the_genre_filters(self):
+        self.assertIsNone(BookFilterCompiler({'author': 'A'}).get_genres())
+        self.assertEqual(BookFilterCompiler({'genre__in': 'Poetry,Fantasy'}).get_genres(), {'Poetry', 'Fantasy'})
+        self.assertEqual(BookFilterCompiler({'genre': 'Poetry', 'genre__in': 'Poetry,Fantasy'}).get_genres(),
+                         {'Poetry'})
+        self.assertEqual(BookFilterCompiler({'genre': 'Drama', 'genre__in': 'Poetry'}).get_genres(), set())
+
+
+class NeighborDeltaTests(SimpleTestCase):
+
+    def test_gained_high_rating_pairs_with_the_other_high_rated_books(self):
+        deltas = get_neighbor_deltas([(1, 30, None, 5)], {1: {10, 20, 30}})
+        self.assertEqual(deltas, {(30, 10): 1, (10, 30): 1, (30, 20): 1, (20, 30): 1})
+
+    def test_lost_high_rating_unpairs_the_book(self):
+        deltas = get_neighbor_deltas([(1, 10, 5, 2), (2, 10, None, 3)], {1: {20}, 2: {20}})
+        self.assertEqual(deltas, {(10, 20): -1, (20, 10): -1})
+
+    def test_pair_of_changed_books_is_counted_once(self):
+        deltas = get_neighbor_deltas([(1, 10, None, 4), (1, 20, 3, 5)], {1: {10, 20}})
+        self.assertEqual(deltas, {(10, 20): 1, (20, 10): 1})
+
+    def test_changes_within_the_same_band_are_ignored(self):
+        self.assertEqual(get_neighbor_deltas([(1, 10, 4, 5), (1, 20, 1, 3)], {1: {10, 30}}), {})
+
+    def test_gain_and_loss_by_different_users_cancel_out(self):
+        deltas = get_neighbor_deltas([(1, 10, None, 5), (2, 10, 5, 1)], {1: {10, 20}, 2: {20}})
+        self.assertEqual(deltas, {})
+
+
+class RelatedUsersScoringTests(SimpleTestCase):
+
+    def suggestions(self, reviews, top_n=10):
+        user_ids, book_ids, ratings = (np.array(column) for column in zip(*reviews))
+        users, indptr, books, scores = compute_related_users_suggestions(user_ids, book_ids, ratings, top_n)
+        return {
+            int(user): [(int(book), int(score)) for book, score in
+                        zip(books[indptr[i]:indptr[i + 1]], scores[indptr[i]:indptr[i + 1]])]
+            for i, user in enumerate(users)
+        }
+
+    def test_books_are_ranked_by_related_users_then_book_id(self):
+        reviews = [
+            (1, 10, 5),
+            (2, 10, 4), (2, 20, 5), (2, 30, 5),
+            (3, 10, 5), (3, 30, 4), (3, 40, 5), (3, 20, 2),
+            (4, 50, 5),
+        ]
+        self.assertEqual(self.suggestions(reviews), {
+            1: [(30, 2), (20, 1), (40, 1)],
+            2: [(40, 1)],
+            3: [],
+            4: [],
+        })
+
+    def test_top_n_keeps_the_best_suggestions(self):
+        reviews = [(1, 10, 5), (2, 10, 5), (2, 20, 4), (3, 10, 4), (3, 30, 5), (3, 20, 5)]
+        self.assertEqual(self.suggestions(reviews, top_n=1)[1], [(20, 2)])
+
+    def test_low_ratings_neither_relate_users_nor_suggest_books(self):
+        reviews = [(1, 10, 3), (2, 10, 3), (2, 20, 5), (3, 10, 5), (3, 30, 3)]
+        self.assertEqual(self.suggestions(reviews), {1: [], 2: [], 3: []})
+
+
+class BookSearchQueryTests(SimpleTestCase):
+
+    def test_terms_are_prefix_matched_and_anded(self):
+        self.assertEqual(book_search_tsquery('Lord of the'), 'Lord:* & of:* & the:*')
+
+    def test_tsquery_syntax_is_stripped(self):
+        self.assertEqual(book_search_tsquery("o'brien & (x | !y) <-> z:*"), 'o:* & brien:* & x:* & y:* & z:*')
+        self.assertEqual(book_search_tsquery('snake_case\\path'), 'snake:* & case:* & path:*')
+
+    def test_letters_and_digits_of_any_script_are_kept(self):
+        self.assertEqual(book_search_tsquery('Café 1984 Дюна'), 'Café:* & 1984:* & Дюна:*')
+
+    def test_text_without_terms_gives_none(self):
+        for text in ['', '   ', "&|!():*'_"]:
+            with self.subTest(text):
+                self.assertIsNone(book_search_tsquery(text))
+
+    def test_terms_are_capped(self):
+        self.assertEqual(book_search_tsquery('a b c d', max_terms=2), 'a:* & b:*')
+        self.assertEqual(book_search_tsquery(' '.join('word' for _ in range(20))).count(':*'), 8)
+
+
+class BookListCursorTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.books = [Book.objects.create(title=f'Book {number}', author='Author', genre='Fantasy')
+                      for number in range(api_settings.PAGE_SIZE + 1)]
+
+    def get_book_list(self, url=None, **params):
+        return self.client.get(url or reverse('library:book_list'), params)
+
+    def test_pages_follow_the_id_order(self):
+        first = self.get_book_list(cursor='').json()
+        second = self.get_book_list(first['next']).json()
+
+        ids = [book['id'] for book in first['results'] + second['results']]
+        self.assertEqual(ids, [book.pk for book in self.books])
+        self.assertIsNone(second['next'])
+        previous = self.get_book_list(second['previous']).json()
+        self.assertEqual(previous['results'], first['results'])
+
+    def test_ordering_is_rejected(self):
+        response = self.get_book_list(cursor='', ordering='-rating_avg')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', response.json())
+
+
+class BookExportTests(TransactionTestCase):
+
+    def test_rows_stream_from_a_cursor_without_hold(self):
+        Book.objects.create(title='Dune', author='Frank Herbert', genre='Science Fiction')
+        response = self.client.get(reverse('library:book_export'), {'format': 'ndjson'})
+        chunks = iter(response.streaming_content)
+        next(chunks)  # Header
+        self.assertIn(b'Dune', next(chunks))
+
+        # Read while the export is suspended inside its transaction
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT is_holdable FROM pg_cursors WHERE name LIKE '_django_curs_%%'")
+            self.assertEqual(cursor.fetchall(), [(False,)])
+        self.assertEqual(list(chunks), [])
+        self.assertFalse(connection.in_atomic_block)
+
+
+class BookCountCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        Book.objects.create(title='Dune', author='Frank Herbert', genre='Science Fiction')
+
+    def get_count(self):
+        return self.client.get(reverse('library:book_list'), {'author': 'Frank Herbert'}).json()['count']
+
+    def test_catalog_changes_forget_the_counts_of_every_filter(self):
+        self.assertEqual(self.get_count(), 1)
+        Book.objects.create(title='Children of Dune', author='Frank Herbert', genre='Science Fiction')
+        self.assertEqual(self.get_count(), 1)
+
+        bump_catalog_version()
+        self.assertEqual(self.get_count(), 2)
+
+
+class BookListEstimatedCountTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        Book.objects.bulk_create([Book(title=f'Book {number}', author='Author', genre='Fantasy')
+                                  for number in range(2 * api_settings.PAGE_SIZE + 1)])
+
+    def get_page(self, estimate, page):
+        with override_settings(LIBRARY_COUNT_EXACT_THRESHOLD=0), \
+                patch('library.counts.estimate_book_count', return_value=estimate):
+            return self.client.get(reverse('library:book_list'), {'genre': 'Fantasy', 'page': page})
+
+    def test_pages_are_not_checked_against_an_estimate(self):
+        for estimate in (1, 1000):
+            with self.subTest(estimate=estimate):
+                response = self.get_page(estimate, 2)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual((response.json()['count'], response.json()['count_exact']), (estimate, False))
+                self.assertIsNotNone(response.json()['next'])
+
+                response = self.get_page(estimate, 3)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.json()['results']), 1)
+                self.assertIsNone(response.json()['next'])
+
+                self.assertEqual(self.get_page(estimate, 4).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SuggestionsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', 'password')
+        books = [Book.objects.create(title=f'Book {number}', author=f'Author {number}', genre='Fantasy')
+                 for number in range(4)]
+        upsert_reviews(self.user.pk, {books[0].pk: 5})
+        self.client.force_authenticate(self.user)
+
+    def get_suggestions(self, **params):
+        return self.client.get(reverse('library:suggestions'), {'strategies': 'genre', **params})
+
+    def test_weights_must_be_finite(self):
+        for weight in ('nan', 'inf', '-inf'):
+            with self.subTest(weight=weight):
+                response = self.get_suggestions(blend='true', weights=f'genre:{weight}')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(LIBRARY_SUGGESTION_TOP_K=2)
+    def test_lists_end_after_top_k(self):
+        for blend in ('false', 'true'):
+            with self.subTest(blend=blend):
+                response = self.get_suggestions(blend=blend, limit=1, page=2)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertIsNone(response.json()['next'])
+
+                response = self.get_suggestions(blend=blend, limit=1, page=3)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RelatedUsersSuggestionTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', 'password')
+        other = User.objects.create_user('other', 'password')
+        books = [Book.objects.create(title=f'Book {number}', author='Author', genre='Fantasy')
+                 for number in range(2)]
+        upsert_reviews(self.user.pk, {books[0].pk: 5})
+        upsert_reviews(other.pk, {books[0].pk: 5, books[1].pk: 5})
+        self.client.force_authenticate(self.user)
+
+    def get_suggestions(self, etag):
+        return self.client.get(reverse('library:suggest-by-related-users'), {'mode': 'neighbors'},
+                               HTTP_IF_NONE_MATCH=etag)
+
+    def test_builds_change_the_etag(self):
+        etag = self.get_suggestions('')['ETag']
+        self.assertEqual(self.get_suggestions(etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with transaction.atomic():
+            rebuild_book_neighbors()
+
+        response = self.get_suggestions(etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_suggestions(response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+@override_settings(LIBRARY_SQL_SAMPLE_RATE=1.0, LIBRARY_SQL_SERVER_TIMING=True, INTERNAL_IPS=['10.0.0.1'])
+class QueryInstrumentationTests(APITestCase):
+
+    def get_book_list(self, remote_addr):
+        return self.client.get(reverse('library:book_list'), REMOTE_ADDR=remote_addr)
+
+    def test_server_timing_is_only_sent_to_internal_requests(self):
+        self.assertIn('db;dur=', self.get_book_list('10.0.0.1')['Server-Timing'])
+        self.assertNotIn('Server-Timing', self.get_book_list('203.0.113.5'))
+
+    @override_settings(DEBUG=True)
+    def test_server_timing_is_sent_to_every_request_under_debug(self):
+        self.assertIn('Server-Timing', self.get_book_list('203.0.113.5'))
+
+
+class AsyncConnectionPoolTests(TransactionTestCase):
+
+    @override_settings(LIBRARY_ASYNC_DB_MAX_SIZE=2)
+    def test_connections_are_capped_per_event_loop(self):
+        async def run():
+            try:
+                return await asyncio.gather(*(
+                    adb.fetch_one(("SELECT pg_backend_pid(), pg_sleep(0.05)", [])) for _ in range(6)))
+            finally:
+                await adb.close_pool()
+
+        rows = asyncio.run(run())
+
+        self.assertEqual(len(rows), 6)
+        self.assertLessEqual(len({pid for pid, _ in rows}), 2)
+
+    def test_pools_are_closed_with_their_event_loop(self):
+        async def run():
+            await adb.fetch_one(("SELECT 1", []))
+            return adb.get_pool()
+
+        runners = {'asyncio.run': lambda: asyncio.run(run()), 'async_to_sync': async_to_sync(run)}
+        for name, run_loop in runners.items():
+            with self.subTest(name):
+                self.assertTrue(run_loop().closed)
+
+
+class QueryIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_library(users=100, books=2000, genres=10, authors=200, reviews_per_user=20, seed=3)
+
+    def test_view_queries_use_their_indexes(self):
+        for label, used, issues in check_probes():
+            with self.subTest(label):
+                self.assertEqual(issues, [])